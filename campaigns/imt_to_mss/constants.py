@@ -7,11 +7,25 @@ CAMPAIGN_STR = f"campaigns/{CAMPAIGN_NAME}"
 CAMPAIGN_DIR = ROOT_DIR / CAMPAIGN_STR
 #CAMPAIGN_DIR = SHARC_SIM_ROOT_DIR / CAMPAIGN_STR
 INPUTS_DIR = CAMPAIGN_DIR / "input/"
+# generate_inputs.DIFF_INPUTS: base document + per scenario diff documents
+INPUTS_DIFF_DIR = CAMPAIGN_DIR / "input_diff/"
 
 SYS_ID_TO_READABLE = {
     "mss.7300MHz.hubType-16": "Hub Type 16 @7300MHz",
 }
 
+# (threshold_dB, CCDF probability) of the system INR, used by the plots,
+# table_resume.py and run.py --adaptive
+PROTECTION_CRITERIA = [
+    (-6.0, 3e-4),
+    (-7.0, 1e-3),
+    (-10.5, 2e-1),
+]
+
+# run.py --adaptive: snapshots per batch and maximum snapshots per scenario
+ADAPTIVE_BATCH_SNAPSHOTS = 10000
+ADAPTIVE_MAX_SNAPSHOTS = 300000
+
 IMT_ID_TO_READABLE = {
     "imt.7300MHz.macrocell": "IMT Macrocell @7300MHz",
     "imt.7300MHz.microcell": "IMT Microcell @7300MHz",
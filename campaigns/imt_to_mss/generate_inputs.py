@@ -1,11 +1,33 @@
+from functools import lru_cache
 from itertools import product
 from pathlib import Path
 from campaigns.utils.parameters_factory import ParametersFactory
-from campaigns.utils.dump_parameters import dump_parameters
-from campaigns.imt_to_mss.constants import CAMPAIGN_STR, CAMPAIGN_NAME, INPUTS_DIR
+from campaigns.utils.dump_parameters import SIDECAR_SUFFIXES
+from campaigns.utils.generation_engine import ScenarioSpec, emit_scenarios
+from campaigns.utils.scenario_manifest import MANIFEST_FILE_NAME
+from campaigns.utils.snapshot_shards import shard_specs
+from campaigns.utils.tracking_proxy import TrackingProxy
+from campaigns.imt_to_mss.constants import CAMPAIGN_STR, CAMPAIGN_NAME, INPUTS_DIFF_DIR, INPUTS_DIR
 
 SEED = 83
 
+# Número de processos usados na geração (None = todos os núcleos, 1 = sequencial)
+GENERATION_WORKERS = None
+
+# Número de simulações em que os snapshots de cada cenário são divididos
+# (1 = sem divisão). Os resultados vão para output_shards/ e são juntados em
+# output/ por snapshot_shards.merge_shards
+N_SHARDS = 1
+
+# Escrever um documento base comum a todos os cenários e, por cenário, só o
+# que difere dele em INPUTS_DIFF_DIR (em vez dos arquivos completos em
+# INPUTS_DIR). Só o runner resumível (run.py) lê esses arquivos
+DIFF_INPUTS = False
+
+# Cópia "json" ou "msgpack" de cada arquivo, lida mais rápido pelo runner
+# (estimativa de custo, diretórios de saída). None = só YAML
+SIDECAR_FORMAT = None
+
 # Configurações
 CLUTTER_TYPES = ['both_ends']
 ALLOWED_CLUTTER_TYPES = {'one_end', 'both_ends'}
@@ -54,13 +76,52 @@ def _p_mode_tag(p):
 
 
 
-def generate_inputs():
+@lru_cache(maxsize=None)
+def _build_base(imt_id: str, mss_id: str) -> TrackingProxy:
+    """Constrói e valida o cenário base uma única vez (por processo)"""
+    base = (
+        ParametersFactory()
+        .load_from_id(imt_id)
+        .load_from_id(mss_id)
+        .load_from_dict({"general": general})
+        .build()
+    )
+
+    # Configurar cenário
+    base.general.enable_adjacent_channel = False
+    base.general.enable_cochannel = True
+    base.imt.interfered_with = False
+    base.imt.imt_dl_intra_sinr_calculation_disabled = True
+
+    # Posição da Estação Terrestre
+    base.single_earth_station.geometry.location.type = "FIXED"
+    base.single_earth_station.geometry.location.fixed.x = 0
+
+    return base
+
+def _build_scenario(spec: ScenarioSpec) -> TrackingProxy:
+    """Variante do cenário base: somente as folhas que mudam"""
+    v = spec.values
+    return _build_base(v["imt_id"], v["mss_id"]).variant({
+        "general.imt_link": v["imt_link"],
+        # Posição da Estação Terrestre
+        "single_earth_station.geometry.location.fixed.y": v["y"],
+        # Carga da BS
+        "imt.bs.load_probability": v["load_pct"] / 100.0,
+        # Configurar parâmetros P.452
+        "single_earth_station.param_p452.percentage_p": v["p_mode"],
+        "single_earth_station.param_p452.clutter_loss": True,
+        "single_earth_station.param_p452.clutter_type": v["clutter_type"],
+        # Configurar caminhos de saída
+        "general.output_dir_prefix": v["output_dir_prefix"],
+    })
+
+def generate_inputs(max_workers: int | None = GENERATION_WORKERS):
     """Gera os arquivos YAML de parâmetros"""
     OUTPUT_START_NAME = f"output_{CAMPAIGN_NAME}_"
     PARAMETER_START_NAME = f"parameter_{CAMPAIGN_NAME}_"
 
     print(f"Gerando arquivos em: {INPUTS_DIR}")
-    factory = ParametersFactory()
     clutter_types = _validate_clutter_types(CLUTTER_TYPES)
 
     # Parâmetros da campanha
@@ -68,76 +129,67 @@ def generate_inputs():
     y_values = [Ro + 1000, Ro + 2000, Ro + 5000, Ro + 10000 ]
     load_probabilities = [50]
     p_modes = [0.2, 20,"RANDOM_GLOBAL"]  # 
-    total = 0
-
-    for imt_link in ["UPLINK", "DOWNLINK"]:
-        general["imt_link"] = imt_link
-        imt_link_tag = imt_link.lower()
-
-        for imt_id in ["imt.7300MHz.macrocell","imt.7300MHz.microcell"]:
-            for mss_id in ["mss.7300MHz.hubType-18"]:
-                for y, load_pct, p_mode, clutter_type in product(
-                    y_values, load_probabilities, p_modes, clutter_types
-                ):
-                    print(f"Gerando: {imt_link} {imt_id}→{mss_id}, y={y}, load={load_pct}%, p={p_mode}, clutter={clutter_type}")
-                    total += 1
-
-                    # Construir objeto de parâmetros
-                    params = (
-                        factory
-                        .load_from_id(imt_id)
-                        .load_from_id(mss_id)
-                        .load_from_dict({"general": general})
-                        .build()
-                    )
-
-                    # Configurar cenário
-                    params.general.enable_adjacent_channel = False
-                    params.general.enable_cochannel = True
-                    params.imt.interfered_with = False
-                    params.imt.imt_dl_intra_sinr_calculation_disabled = True
-
-                    # Posição da Estação Terrestre
-                    params.single_earth_station.geometry.location.type = "FIXED"
-                    params.single_earth_station.geometry.location.fixed.x = 0
-                    params.single_earth_station.geometry.location.fixed.y = y
-
-                    # Carga da BS
-                    params.imt.bs.load_probability = load_pct / 100.0
-
-                    # Configurar parâmetros P.452
-                    p_tag= _p_mode_tag(p_mode) if isinstance(p_mode, (int, float)) else p_mode
-                    params.single_earth_station.param_p452.percentage_p = p_mode
-                    params.single_earth_station.param_p452.clutter_loss = True
-                    params.single_earth_station.param_p452.clutter_type = clutter_type
-
-                    # Gerar nome do arquivo
-                    specific = (
-                        f"{imt_link_tag}_{imt_id}_{mss_id}_y{y}_load{load_pct}"
-                        f"_p-{p_tag}_clt-{clutter_type}"
-                    )
-                    specific = _sanitize_for_filename(specific)
-
-                    # Configurar caminhos de saída
-                    params.general.output_dir_prefix = OUTPUT_START_NAME + specific
-                    output_path = INPUTS_DIR / f"{PARAMETER_START_NAME}{specific}.yaml"
-
-                    # Escrever arquivo YAML
-                    try:
-                        dump_parameters(output_path, params)
-                        print(f"Arquivo gerado: {output_path}")
-                    except Exception as e:
-                        print(f"Falha ao gerar {output_path}: {str(e)}")
-
-    print(f"\nTotal de arquivos gerados: {total}\n")
+    specs = []
+
+    for imt_id in ["imt.7300MHz.macrocell","imt.7300MHz.microcell"]:
+        for mss_id in ["mss.7300MHz.hubType-18"]:
+            for imt_link, y, load_pct, p_mode, clutter_type in product(
+                ["UPLINK", "DOWNLINK"], y_values, load_probabilities, p_modes, clutter_types
+            ):
+                imt_link_tag = imt_link.lower()
+                print(f"Gerando: {imt_link} {imt_id}→{mss_id}, y={y}, load={load_pct}%, p={p_mode}, clutter={clutter_type}")
+
+                # Gerar nome do arquivo
+                p_tag= _p_mode_tag(p_mode) if isinstance(p_mode, (int, float)) else p_mode
+                specific = (
+                    f"{imt_link_tag}_{imt_id}_{mss_id}_y{y}_load{load_pct}"
+                    f"_p-{p_tag}_clt-{clutter_type}"
+                )
+                specific = _sanitize_for_filename(specific)
+
+                specs.append(ScenarioSpec(
+                    key=specific,
+                    parameter_file=INPUTS_DIR / f"{PARAMETER_START_NAME}{specific}.yaml",
+                    values={
+                        "imt_id": imt_id,
+                        "mss_id": mss_id,
+                        "imt_link": imt_link,
+                        "y": y,
+                        "load_pct": load_pct,
+                        "p_mode": p_mode,
+                        "clutter_type": clutter_type,
+                        "output_dir_prefix": OUTPUT_START_NAME + specific,
+                    },
+                    group=(imt_id, mss_id),
+                ))
+
+    # Dividir os snapshots de cada cenário entre N_SHARDS simulações
+    specs = shard_specs(
+        specs, N_SHARDS, SEED, general["num_snapshots"],
+        f"{CAMPAIGN_STR}/output_shards/",
+    )
+
+    # Escrever arquivos YAML (falhas são apenas reportadas)
+    generated = emit_scenarios(
+        specs, _build_scenario, max_workers=max_workers, strict=False,
+        manifest_file=INPUTS_DIR / MANIFEST_FILE_NAME,
+        diff_dir=INPUTS_DIFF_DIR if DIFF_INPUTS else None,
+        sidecar=SIDECAR_FORMAT,
+    )
+
+    print(f"\nTotal de arquivos gerados: {len(generated)}\n")
 
 def clear_inputs():
     """Limpa o diretório de entrada antes da geração"""
-    INPUTS_DIR.mkdir(parents=True, exist_ok=True)
-    print(f"Limpando diretório: {INPUTS_DIR}")
-    for item in INPUTS_DIR.iterdir():
-        if item.is_file() and item.name.endswith(".yaml"):
-            item.unlink()
+    for inputs_dir in [INPUTS_DIR, INPUTS_DIFF_DIR]:
+        inputs_dir.mkdir(parents=True, exist_ok=True)
+        print(f"Limpando diretório: {inputs_dir}")
+        for item in inputs_dir.iterdir():
+            if item.is_file() and item.name.endswith(".yaml"):
+                item.unlink()
+                # sidecars (SIDECAR_FORMAT) dos arquivos removidos
+                for suffix in SIDECAR_SUFFIXES.values():
+                    item.with_suffix(suffix).unlink(missing_ok=True)
 
 if __name__ == "__main__":
     clear_inputs()
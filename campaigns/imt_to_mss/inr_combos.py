@@ -0,0 +1,154 @@
+"""
+Helpers shared by the imt_to_mss INR plot and table scripts: the scenario
+features (cell, link, p-mode, clutter, y) of a results file and the CCDF
+curves and figure name of each combination of features.
+"""
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import Dict, Tuple
+import numpy as np
+
+from campaigns.utils.scenario_manifest import ScenarioManifest
+from campaigns.utils.ccdf_histogram import CcdfHistogram
+from campaigns.utils.ccdf_reduce import reduce_ccdf
+
+# --------------------- Feature tokens ---------------------
+
+def norm_cell_token(s: str) -> str | None:
+    s = s.lower()
+    if "macro" in s:
+        return "macro"
+    if "micro" in s:
+        return "micro"
+    return None
+
+def norm_link_token(s: str) -> str | None:
+    s = s.lower()
+    if "uplink" in s or "ul" in s:
+        return "ul"
+    if "downlink" in s or "dl" in s:
+        return "dl"
+    return None
+
+def norm_pmode_token(s: str) -> str | None:
+    """
+    Reconhece p-modes no caminho:
+      p-20, p_20, p-20pct, p_20pct  -> '20'
+      p-0.2, p_0_2                  -> '0.2'
+      p-random, p_random            -> 'random'
+      p-random_global, p_random-global -> 'random_global'
+    Usa fronteiras flexíveis para separadores de caminhos.
+    """
+    s = s.lower()
+
+    # fronteiras: início/apos [_\-=/] ... fim/antes de [_\-/] ou fim da string
+    sep = r"(?:(?<=^)|(?<=[_\-=/]))"
+    end = r"(?=$|[_\-/])"
+
+    # random_global / random
+    if re.search(sep + r"p[-_]?random[_-]?global" + end, s):
+        return "random_global"
+    if re.search(sep + r"p[-_]?random" + end, s):
+        return "random"
+
+    # número (com opcional 'pct'): 20, 20pct, 0.2, 0_2
+    m = re.search(sep + r"p[-_]?([0-9]+(?:[._][0-9]+)?)(?:pct)?" + end, s)
+    if m:
+        tok = m.group(1).replace("_", ".")  # normaliza 0_2 -> 0.2
+        return tok  # devolve '20' ou '0.2' (sem converter)
+
+    return None
+
+def norm_clutter_token(s: str) -> str | None:
+    s = s.lower().replace("both-end", "both_ends").replace("both_end", "both_ends")
+    if "clt-both_ends" in s or "clt_both_ends" in s:
+        return "both_ends"
+    if "clt-one_end" in s or "clt_one_end" in s:
+        return "one_end"
+    m = re.search(r"clt-([a-z_]+)", s)
+    if m:
+        val = m.group(1).lower().replace("both-end", "both_ends").replace("both_end", "both_ends")
+        if val in {"both_ends", "one_end"}:
+            return val
+    return None
+
+def pmode_to_path_token(x) -> str:
+    """Path token of a p-mode setting, e.g. 0.2 -> 'p-0_2', 20 -> 'p-20'"""
+    # For float values, use direct string representation
+    if isinstance(x, float):
+        x_str = f"{x}".replace(".", "_")  # Convert 0.2 to "0_2"
+    else:
+        x_str = str(x)
+    return f"p-{x_str}"
+
+# --------------------- Results files ---------------------
+
+def parse_features_from_path(path: Path) -> Tuple[str|None, str|None, str|None, str|None]:
+    """Parse (cell, link, pmode, clutter) from path string"""
+    s = str(path).lower()
+    return (
+        norm_cell_token(s),
+        norm_link_token(s),
+        norm_pmode_token(s),
+        norm_clutter_token(s)
+    )
+
+def find_y_tag_upwards(p: Path, max_levels: int = 6) -> int | None:
+    """Find y-distance tag in path or parent directories"""
+    cur = p
+    for _ in range(max_levels):
+        m = re.search(r"(?:(?<=^)|(?<=[_\-\=/]))y(?:=)?(\d+)(?=$|[_\-\/])", cur.name, re.IGNORECASE) or \
+            re.search(r"(?:(?<=^)|(?<=[_\-\=/]))y(?:=)?(\d+)(?=$|[_\-\/])", str(cur), re.IGNORECASE)
+        if m:
+            try:
+                return int(m.group(1))
+            except Exception:
+                pass
+        if cur.parent == cur:
+            break
+        cur = cur.parent
+    return None
+
+def features_for_file(
+    f: Path, manifest: ScenarioManifest | None
+) -> Tuple[str|None, str|None, str|None, str|None, int|None]:
+    """
+    (cell, link, pmode, clutter, y) of the scenario a results file belongs to.
+    Taken from the generator manifest when its output dir is listed there,
+    otherwise parsed from the path.
+    """
+    values = manifest.values_for_output_dir(f.parent) if manifest is not None else None
+    if values is not None:
+        return (
+            norm_cell_token(values["imt_id"]),
+            norm_link_token(values["imt_link"]),
+            norm_pmode_token(pmode_to_path_token(values["p_mode"])),
+            values["clutter_type"],
+            values["y"],
+        )
+    return (*parse_features_from_path(f), find_y_tag_upwards(f.parent))
+
+# --------------------- Combinations ---------------------
+
+def combo_curves(
+    dist_map: Dict[str, CcdfHistogram],
+    floor: float,
+    tail_prob: float,
+    max_rel_error: float,
+) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    (x, CCDF) points to draw for each distance with data, CCDFs clipped at
+    floor and reduced as in ccdf_reduce.reduce_ccdf
+    """
+    return {
+        dtag: reduce_ccdf(*hist.ccdf(floor), tail_prob, max_rel_error)
+        for dtag, hist in dist_map.items()
+        if hist.n > 0
+    }
+
+def combo_out_name(combo: Tuple[str, str, str, str]) -> str:
+    """File name of the figure of a (cell, link, pmode, clutter) combination"""
+    cell, link, pmode, clutter = combo
+    return f"ccdf_inr_{cell}_{link}_p{pmode.replace('.', '_')}_clt{clutter}.png"
@@ -3,7 +3,7 @@ from __future__ import annotations
 
 import re
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
 import numpy as np
 
 try:
@@ -12,6 +12,11 @@ try:
 except Exception:
     _HAS_PANDAS = False
 
+from campaigns.utils.results_cache import ResultsCache
+from campaigns.utils.scenario_manifest import MANIFEST_FILE_NAME, ScenarioManifest
+from campaigns.utils.ccdf_histogram import CcdfHistogram
+from campaigns.utils.ccdf_reduce import reduce_ccdf
+
 # =============== USER SETTINGS =================
 ENGINE = "matplotlib"         # "matplotlib" or "sharc" (stubbed)
 THRESHOLD_DB = -6.0
@@ -19,14 +24,21 @@ TITLE_PREFIX = "IMT victim-side SINR (external interference)"
 XLABEL = "SINR_ext (dB)"
 YLABEL = "CCDF"
 CCDF_FLOOR = 1e-6             # avoid zeros on log-y
+HIST_BIN_DB = 1e-3            # samples are streamed into histograms of this resolution
+CCDF_TAIL_PROB = 1e-3         # CCDF points below this probability are all drawn,
+CCDF_MAX_REL_ERROR = 0.01     # above it only log-spaced ones (None draws every point)
 
 # Paths relative to this file
 BASE_DIR = Path(__file__).resolve().parent
 OUTPUT_ROOT = BASE_DIR / "output"
 PLOTS_DIR = BASE_DIR / "plots"
+# Scenario manifest written by generate_inputs (falls back to parsing paths)
+MANIFEST_FILE = BASE_DIR / "input" / MANIFEST_FILE_NAME
 
 # Filenames to look for
 SINR_FILES = ("imt_dl_sinr_ext.csv", "imt_ul_sinr_ext.csv")
+# Keep all parsed results in one cache store, so later runs only parse new/changed csvs
+USE_RESULTS_CACHE = True
 
 # Bucket order (and exact labels)
 BUCKET_ORDER = [
@@ -86,6 +98,24 @@ def parse_distance_tag(path: Path) -> str | None:
     return f"y{m.group(1)}"
 
 
+def bucket_and_dist(path: Path, manifest: ScenarioManifest | None) -> Tuple[str | None, str | None]:
+    """
+    (bucket, distance tag) of a results file, from the generator manifest
+    when its output dir is listed there, otherwise parsed from the path.
+    """
+    values = manifest.values_for_output_dir(path.parent) if manifest is not None else None
+    if values is None:
+        dist = parse_distance_tag(path.parent) or parse_distance_tag(path.parent.parent)
+        return parse_bucket(path), dist
+
+    cell = "MACRO" if "macrocell" in values["imt_id"].lower() else "MICRO"
+    link = "UL" if values["imt_link"] == "UPLINK" else "DL"
+    pmode = str(values["p_mode"]).upper()
+    if pmode not in {"RANDOM", "RANDOM_GLOBAL"}:
+        return None, None
+    return f"{cell} - {link} ({pmode})", f"y{values['y']}"
+
+
 def _to_float_array(one_col: np.ndarray) -> np.ndarray:
     arr = np.asarray(one_col, dtype="float64").ravel()
     arr = arr[np.isfinite(arr)]
@@ -118,36 +148,30 @@ def load_vector(csv_path: Path) -> np.ndarray:
         return np.array([], dtype=float)
 
 
-def ecdf_to_ccdf(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-    x_sorted = np.sort(np.asarray(x, dtype=float))
-    n = x_sorted.size
-    if n == 0:
-        return x_sorted, x_sorted
-    cdf = np.arange(1, n + 1, dtype=float) / float(n)
-    ccdf = 1.0 - cdf
-    ccdf = np.maximum(ccdf, CCDF_FLOOR)
-    return x_sorted, ccdf
-
-
-def gather_data(files: List[Path]) -> Dict[str, Dict[str, List[np.ndarray]]]:
+def gather_data(
+    files: List[Path],
+    load: Callable[[Path], np.ndarray] | None = None,
+) -> Dict[str, Dict[str, CcdfHistogram]]:
     """
-    returns: { bucket_label: { distance_tag: [arrays...] } }
+    returns: { bucket_label: { distance_tag: histogram of all runs } }
     """
-    data: Dict[str, Dict[str, List[np.ndarray]]] = {b: {} for b in BUCKET_ORDER}
+    if load is None:
+        load = load_vector
+    manifest = ScenarioManifest.load(MANIFEST_FILE)
+    data: Dict[str, Dict[str, CcdfHistogram]] = {b: {} for b in BUCKET_ORDER}
     skipped = 0
     for f in files:
-        bucket = parse_bucket(f)
+        bucket, dist = bucket_and_dist(f, manifest)
         if bucket is None:
             skipped += 1
             continue
-        dist = parse_distance_tag(f.parent) or parse_distance_tag(f.parent.parent)
         if dist is None:
             skipped += 1
             continue
-        vec = load_vector(f)
+        vec = load(f)
         if vec.size == 0:
             continue
-        data[bucket].setdefault(dist, []).append(vec)
+        data[bucket].setdefault(dist, CcdfHistogram(HIST_BIN_DB)).add(vec)
     if skipped:
         print(f"Note: skipped {skipped} files that did not match bucket/dist patterns.")
     return data
@@ -159,7 +183,7 @@ def _slug(s: str) -> str:
 
 def plot_bucket_matplotlib(
     bucket_label: str,
-    dist_map: Dict[str, List[np.ndarray]],
+    dist_map: Dict[str, CcdfHistogram],
     save_dir: Path,
 ) -> None:
     import matplotlib.pyplot as plt
@@ -175,12 +199,13 @@ def plot_bucket_matplotlib(
     any_curve = False
 
     for dtag in dists:
-        arrays = dist_map[dtag]
-        if not arrays:
+        hist = dist_map[dtag]
+        if hist.n == 0:
             continue
         any_curve = True
-        x = np.concatenate(arrays, axis=0)
-        xs, ccdf = ecdf_to_ccdf(x)
+        xs, ccdf = reduce_ccdf(
+            *hist.ccdf(CCDF_FLOOR), CCDF_TAIL_PROB, CCDF_MAX_REL_ERROR
+        )
         # semilog-y
         ax.semilogy(xs, ccdf, drawstyle="steps-post", label=dtag)
 
@@ -210,7 +235,7 @@ def plot_bucket_matplotlib(
 
 def plot_bucket_sharc(
     bucket_label: str,
-    dist_map: Dict[str, List[np.ndarray]],
+    dist_map: Dict[str, CcdfHistogram],
     save_dir: Path,
 ) -> None:
     # Wire your SHARC post-processor here if you have one.
@@ -226,12 +251,17 @@ def main() -> None:
         print("No imt_*_sinr_ext.csv files found. Check OUTPUT_ROOT.")
         return
 
-    data = gather_data(files)
+    if USE_RESULTS_CACHE:
+        # first column parsing differs from other scripts, so it has its own store
+        with ResultsCache(OUTPUT_ROOT, "imt_sinr_ext:first_column", loader=load_vector) as cache:
+            data = gather_data(files, load=cache.load)
+    else:
+        data = gather_data(files)
 
     # summary
     print("Series per bucket:")
     for b in BUCKET_ORDER:
-        total_samples = sum(np.sum([arr.size for arr in arrs]) for arrs in data[b].values())
+        total_samples = sum(hist.n for hist in data[b].values())
         print(f"  {b:30s} -> distances: {len(data[b])}, total samples: {int(total_samples)}")
 
     for b in BUCKET_ORDER:
@@ -2,9 +2,14 @@ import argparse
 import sys
 from sharc.run_multiple_campaigns_mut_thread import run_campaign
 
-from campaigns.imt_to_mss.generate_inputs import clear_inputs, generate_inputs
-from campaigns.imt_to_mss.generate_inputs import clear_inputs, generate_inputs
-from campaigns.imt_to_mss.constants import CAMPAIGN_NAME, INPUTS_DIR
+from campaigns.imt_to_mss.generate_inputs import DIFF_INPUTS, SEED, clear_inputs, generate_inputs
+from campaigns.imt_to_mss.constants import (
+    ADAPTIVE_BATCH_SNAPSHOTS, ADAPTIVE_MAX_SNAPSHOTS, CAMPAIGN_DIR,
+    CAMPAIGN_NAME, INPUTS_DIFF_DIR, INPUTS_DIR, PROTECTION_CRITERIA,
+)
+from campaigns.utils.adaptive_stopping import run_campaign_adaptive
+from campaigns.utils.resumable_runner import run_campaign_resumable
+from campaigns.utils.snapshot_shards import merge_shards
 
 def main():
     parser = argparse.ArgumentParser(description="IMT to MSS campaign runner")
@@ -13,23 +18,65 @@ def main():
         action="store_true",
         help="Skip generating input parameter files before running (default: generate inputs).",
     )
+    parser.add_argument(
+        "-r", "--resume",
+        action="store_true",
+        help="Only run scenarios that are new, changed or not completed in a previous run.",
+    )
+    parser.add_argument(
+        "-a", "--adaptive",
+        action="store_true",
+        help=(
+            "Run each scenario in batches of snapshots until the protection "
+            "criteria are statistically settled (ignores num_snapshots)."
+        ),
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int, default=None,
+        help="Parallel simulations with --resume or --adaptive (default: number of cores).",
+    )
     args = parser.parse_args()
+    inputs_dir = INPUTS_DIFF_DIR if DIFF_INPUTS else INPUTS_DIR
 
     if not args.dont_generate:
         clear_inputs()
         generate_inputs()
     else:
         # Sanity check: if skipping generation, ensure we have inputs
-        if not INPUTS_DIR.exists() or not any(INPUTS_DIR.glob("*.yaml")):
+        if not inputs_dir.exists() or not any(inputs_dir.glob("*.yaml")):
             print(
-                f"[ERROR] No input YAMLs found in '{INPUTS_DIR}'. "
+                f"[ERROR] No input YAMLs found in '{inputs_dir}'. "
                 "Remove --dont-generate or run the generator first."
             )
             return 2
 
     print(f"[INFO] Running campaign: {CAMPAIGN_NAME}")
     try:
-        run_campaign(CAMPAIGN_NAME)
+        if args.adaptive:
+            failed = run_campaign_adaptive(
+                inputs_dir, CAMPAIGN_DIR / "output",
+                max_workers=args.workers,
+                criteria=PROTECTION_CRITERIA,
+                batch_snapshots=ADAPTIVE_BATCH_SNAPSHOTS,
+                max_snapshots=ADAPTIVE_MAX_SNAPSHOTS,
+            )
+            if failed:
+                print(f"[ERROR] {len(failed)} scenario(s) failed")
+                return 1
+        elif args.resume or DIFF_INPUTS:
+            # run_campaign only reads complete parameter files
+            failed = run_campaign_resumable(
+                inputs_dir, CAMPAIGN_DIR / "output",
+                max_workers=args.workers, force=not args.resume,
+            )
+            if failed:
+                print(f"[ERROR] {len(failed)} scenario(s) failed, rerun with --resume to retry them")
+                return 1
+        else:
+            run_campaign(CAMPAIGN_NAME)
+        # no-op unless the inputs were generated with N_SHARDS > 1
+        merge_shards(CAMPAIGN_DIR / "output_shards", CAMPAIGN_DIR / "output", SEED)
     except KeyboardInterrupt:
         print("\n[INFO] Interrupted by user.")
         return 130
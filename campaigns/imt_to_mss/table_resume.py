@@ -2,14 +2,22 @@ from __future__ import annotations
 
 import re
 from pathlib import Path
-from typing import Dict, List, Tuple, Iterable
+from functools import partial
+from typing import Callable, Dict, List, Tuple, Iterable
 import numpy as np
 
-try:
-    import pandas as pd
-    _HAS_PANDAS = True
-except Exception:
-    _HAS_PANDAS = False
+from campaigns.utils.results_loader import load_vector
+from campaigns.utils.results_cache import ResultsCache
+from campaigns.utils.scenario_manifest import MANIFEST_FILE_NAME, ScenarioManifest
+from campaigns.utils.ccdf_histogram import CcdfHistogram
+from campaigns.utils.render_scheduler import RenderJob, fingerprint, render_all
+# Protection criteria lines: (threshold_dB, CCDF probability)
+from campaigns.imt_to_mss.constants import PROTECTION_CRITERIA
+from campaigns.imt_to_mss import inr_combos
+from campaigns.imt_to_mss.inr_combos import (
+    combo_curves, combo_out_name, features_for_file, norm_cell_token, norm_clutter_token,
+    norm_link_token, norm_pmode_token, pmode_to_path_token,
+)
 
 # ===================== USER SETTINGS =====================
 # What to plot (cartesian product of these lists)
@@ -21,19 +29,18 @@ CLUTTERS = ["both_ends"]  # "one_end", "both_ends"
 # Reference distance Ro (meters). Distance label shows Δ = y - Ro, in km.
 RO_METERS = 1600
 
-# Protection criteria lines: (threshold_dB, CCDF probability)
-PROTECTION_CRITERIA: List[Tuple[float, float]] = [
-    (-6.0, 3e-4),
-    (-7.0, 1e-3),
-    (-10.5, 2e-1),
-]
-
 # Plot appearance
 ENGINE = "matplotlib"  # "matplotlib" or "sharc"
 TITLE_PREFIX = "CCDF of INR"
 XLABEL = "INR [dB]"
 YLABEL = "P(X > x)"
 CCDF_FLOOR = 1e-4  # requested floor: 1e-5
+# Samples are streamed into histograms of this resolution instead of kept in memory
+HIST_BIN_DB = 1e-3
+# CCDF points below CCDF_TAIL_PROB are all drawn, above it only log-spaced ones
+# within CCDF_MAX_REL_ERROR of the full curve (None draws every point)
+CCDF_TAIL_PROB = 1e-3
+CCDF_MAX_REL_ERROR = 0.01
 FIGSIZE = (9, 6)
 
 # Paths
@@ -41,8 +48,19 @@ BASE_DIR = Path(__file__).resolve().parent
 OUTPUT_DIR = BASE_DIR / "output"
 PLOTS_DIR = BASE_DIR / "plot"
 
+# Scenario manifest written by generate_inputs (falls back to parsing paths)
+MANIFEST_FILE = BASE_DIR / "input" / MANIFEST_FILE_NAME
+
 # File to search
 INR_FILE = "system_inr.csv"
+# Keep all parsed results in one cache store, so later runs only parse new/changed csvs
+USE_RESULTS_CACHE = True
+# Otherwise, keep parsed results as .npy files next to each csv
+USE_NPY_SIDECARS = True
+
+# Processes used to render figures (None = all cores, 1 = sequential).
+# Figures whose data and script did not change are not rendered again
+RENDER_WORKERS = None
 
 # Debug: print how we parsed the first N files
 DEBUG_SHOW_FIRST = 8
@@ -50,185 +68,35 @@ DEBUG_SHOW_FIRST = 8
 
 # --------------------- Helper Functions ---------------------
 
-def _norm_cell_token(s: str) -> str | None:
-    s = s.lower()
-    if "macro" in s:
-        return "macro"
-    if "micro" in s:
-        return "micro"
-    return None
-
-def _norm_link_token(s: str) -> str | None:
-    s = s.lower()
-    if "uplink" in s or "ul" in s:
-        return "ul"
-    if "downlink" in s or "dl" in s:
-        return "dl"
-    return None
-
-def _norm_pmode_token(s: str) -> str | None:
-    """
-    Reconhece p-modes no caminho:
-      p-20, p_20, p-20pct, p_20pct  -> '20'
-      p-0.2, p_0_2                  -> '0.2'
-      p-random, p_random            -> 'random'
-      p-random_global, p_random-global -> 'random_global'
-    Usa fronteiras flexíveis para separadores de caminhos.
-    """
-    s = s.lower()
-
-    # fronteiras: início/apos [_\-=/] ... fim/antes de [_\-/] ou fim da string
-    sep = r"(?:(?<=^)|(?<=[_\-=/]))"
-    end = r"(?=$|[_\-/])"
-
-    # random_global / random
-    if re.search(sep + r"p[-_]?random[_-]?global" + end, s):
-        return "random_global"
-    if re.search(sep + r"p[-_]?random" + end, s):
-        return "random"
-
-    # número (com opcional 'pct'): 20, 20pct, 0.2, 0_2
-    m = re.search(sep + r"p[-_]?([0-9]+(?:[._][0-9]+)?)(?:pct)?" + end, s)
-    if m:
-        tok = m.group(1).replace("_", ".")  # normaliza 0_2 -> 0.2
-        return tok  # devolve '20' ou '0.2' (sem converter)
-
-    return None
-
-
-def _norm_clutter_token(s: str) -> str | None:
-    s = s.lower().replace("both-end", "both_ends").replace("both_end", "both_ends")
-    if "clt-both_ends" in s or "clt_both_ends" in s:
-        return "both_ends"
-    if "clt-one_end" in s or "clt_one_end" in s:
-        return "one_end"
-    m = re.search(r"clt-([a-z_]+)", s)
-    if m:
-        val = m.group(1).lower().replace("both-end", "both_ends").replace("both_end", "both_ends")
-        if val in {"both_ends", "one_end"}:
-            return val
-    return None
-
 def normalize_selection() -> Tuple[List[str], List[str], List[str], List[str]]:
     cells = []
     for x in CELLS:
-        t = _norm_cell_token(str(x))
+        t = norm_cell_token(str(x))
         if t: cells.append(t)
     
     links = []
     for x in LINKS:
-        t = _norm_link_token(str(x))
+        t = norm_link_token(str(x))
         if t: links.append(t)
     
     pmodes = []
     for x in PMODES:
-        # For float values, use direct string representation
-        if isinstance(x, float):
-            x_str = f"{x}".replace(".", "_")  # Convert 0.2 to "0_2"
-        else:
-            x_str = str(x)
-        t = _norm_pmode_token(f"p-{x_str}")
+        t = norm_pmode_token(pmode_to_path_token(x))
         if t: pmodes.append(t)
     
     clutters = []
     for x in CLUTTERS:
-        t = _norm_clutter_token(f"clt-{x}")
+        t = norm_clutter_token(f"clt-{x}")
         if t: clutters.append(t)
     
     if not (cells and links and pmodes and clutters):
         raise ValueError("One of your selection lists is empty after normalization.")
     return cells, links, pmodes, clutters
 
-def parse_features_from_path(path: Path) -> Tuple[str|None, str|None, str|None, str|None]:
-    """Parse (cell, link, pmode, clutter) from path string"""
-    s = str(path).lower()
-    return (
-        _norm_cell_token(s),
-        _norm_link_token(s),
-        _norm_pmode_token(s),
-        _norm_clutter_token(s)
-    )
-
-def find_y_tag_upwards(p: Path, max_levels: int = 6) -> int | None:
-    """Find y-distance tag in path or parent directories"""
-    cur = p
-    for _ in range(max_levels):
-        m = re.search(r"(?:(?<=^)|(?<=[_\-\=/]))y(?:=)?(\d+)(?=$|[_\-\/])", cur.name, re.IGNORECASE) or \
-            re.search(r"(?:(?<=^)|(?<=[_\-\=/]))y(?:=)?(\d+)(?=$|[_\-\/])", str(cur), re.IGNORECASE)
-        if m:
-            try:
-                return int(m.group(1))
-            except Exception:
-                pass
-        if cur.parent == cur:
-            break
-        cur = cur.parent
-    return None
-
 def y_to_delta_km(y_meters: int) -> float:
     """Convert y-position to km relative to Ro"""
     return (y_meters - RO_METERS) / 1000.0
 
-def load_vector(csv_path: Path) -> np.ndarray:
-    """Load INR values from CSV file, handling multiple formats"""
-    # Try pandas first (robust)
-    if _HAS_PANDAS:
-        try:
-            df = pd.read_csv(csv_path, header=None)
-            vals = []
-            for v in df.values.ravel():
-                try:
-                    s = str(v).strip()
-                    if s.startswith('[') and s.endswith(']'):
-                        s = s[1:-1]
-                    f = float(s)
-                    if np.isfinite(f):
-                        vals.append(f)
-                except (ValueError, TypeError):
-                    continue
-            if vals:
-                return np.asarray(vals, dtype=float)
-        except Exception:
-            pass
-    
-    # Fallback: manual parse
-    try:
-        with open(csv_path, 'r') as f:
-            content = f.read()
-        vals = []
-        for line in content.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('[') and line.endswith(']'):
-                try:
-                    f = float(line[1:-1])
-                    if np.isfinite(f):
-                        vals.append(f)
-                    continue
-                except ValueError:
-                    pass
-            try:
-                f = float(line)
-                if np.isfinite(f):
-                    vals.append(f)
-            except ValueError:
-                continue
-        return np.asarray(vals, dtype=float)
-    except Exception:
-        return np.array([], dtype=float)
-
-def ecdf_to_ccdf(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-    """Convert empirical data to CCDF"""
-    x = np.asarray(x, dtype=float)
-    x = x[np.isfinite(x)]
-    if x.size == 0:
-        return x, x
-    xs = np.sort(x)
-    cdf = np.arange(1, xs.size + 1, dtype=float) / float(xs.size)
-    ccdf = np.maximum(1.0 - cdf, CCDF_FLOOR)
-    return xs, ccdf
-
 # ---------------------- Data Collection ----------------------
 
 def find_all_inr_csvs(root: Path) -> List[Path]:
@@ -240,27 +108,44 @@ def gather_by_combo(
     wanted_cells: List[str],
     wanted_links: List[str],
     wanted_pmodes: List[str],
-    wanted_clutters: List[str]
-) -> Dict[Tuple[str, str, str, str], Dict[str, List[np.ndarray]]]:
+    wanted_clutters: List[str],
+    load: Callable[[Path], np.ndarray] | None = None,
+) -> Dict[Tuple[str, str, str, str], Dict[str, CcdfHistogram]]:
     """
     Organize data by combination of parameters:
     {
         (cell, link, pmode, clutter): {
-            'yXXXX': [arrays...],
+            'yXXXX': histogram of all runs,
             ...
         }, ...
     }
     """
+    if load is None:
+        load = partial(load_vector, use_sidecar=USE_NPY_SIDECARS)
+
+    files = list(files)
+    manifest = ScenarioManifest.load(MANIFEST_FILE)
+    if manifest is None:
+        print(f"Note: no scenario manifest at {MANIFEST_FILE}, parsing features from paths")
+
+    # all files of an output dir belong to the same scenario
+    dir_features = {}
+
+    def features(f: Path):
+        if f.parent not in dir_features:
+            dir_features[f.parent] = features_for_file(f, manifest)
+        return dir_features[f.parent]
+
     data = {}
     miss_feature = miss_dist = 0
 
-    for idx, f in enumerate(list(files)[:DEBUG_SHOW_FIRST]):
-        cell, link, pmode, clutter = parse_features_from_path(f)
+    for idx, f in enumerate(files[:DEBUG_SHOW_FIRST]):
+        cell, link, pmode, clutter, y_m = features(f)
         print(f"[DEBUG PARSE] {idx+1}: {f}")
-        print(f"    -> cell={cell}, link={link}, pmode={pmode}, clutter={clutter}")
+        print(f"    -> cell={cell}, link={link}, pmode={pmode}, clutter={clutter}, y={y_m}")
 
     for f in files:
-        cell, link, pmode, clutter = parse_features_from_path(f)
+        cell, link, pmode, clutter, y_m = features(f)
         if not all([cell, link, pmode, clutter]):
             miss_feature += 1
             continue
@@ -268,14 +153,15 @@ def gather_by_combo(
             pmode not in wanted_pmodes or clutter not in wanted_clutters):
             continue
 
-        y_m = find_y_tag_upwards(f.parent)
         if y_m is None:
             miss_dist += 1
             continue
 
-        vec = load_vector(f)
+        vec = load(f)
         if vec.size > 0:
-            data.setdefault((cell, link, pmode, clutter), {}).setdefault(f"y{y_m}", []).append(vec)
+            data.setdefault((cell, link, pmode, clutter), {}).setdefault(
+                f"y{y_m}", CcdfHistogram(HIST_BIN_DB)
+            ).add(vec)
 
     if miss_feature or miss_dist:
         print(f"Note: skipped {miss_feature} files (missing features), {miss_dist} files (missing distance)")
@@ -310,24 +196,21 @@ def _dtag_to_label_km(dtag: str) -> str:
 
 def plot_combo_matplotlib(
     combo: Tuple[str, str, str, str],
-    dist_map: Dict[str, List[np.ndarray]],
+    curves: Dict[str, Tuple[np.ndarray, np.ndarray]],
     save_dir: Path
 ) -> None:
-    """Plot CCDF for one parameter combination"""
+    """Plot CCDF for one parameter combination (curves from combo_curves)"""
     import matplotlib.pyplot as plt
     from matplotlib.lines import Line2D
 
-    cell, link, pmode, clutter = combo
-    
     # Verify we have data to plot
-    total_samples = sum(len(arr) for arr_list in dist_map.values() for arr in arr_list)
-    if total_samples == 0:
+    if not curves:
         print(f"[WARN] No data to plot for combo: {combo}")
         return
     
     # Sort distances by actual Δkm
     dists = sorted(
-        dist_map.keys(),
+        curves.keys(),
         key=lambda d: y_to_delta_km(int(re.search(r"y(\d+)", d).group(1)))
     )
     
@@ -335,11 +218,7 @@ def plot_combo_matplotlib(
     
     # Plot each distance
     for dtag in dists:
-        arrays = dist_map[dtag]
-        if not arrays:
-            continue
-        x = np.concatenate(arrays)
-        xs, ccdf = ecdf_to_ccdf(x)
+        xs, ccdf = curves[dtag]
         ax.semilogy(xs, ccdf, drawstyle="steps-post", label=_dtag_to_label_km(dtag))
     
     # --- Protection criteria (cores/estilos fixos) ---
@@ -376,7 +255,7 @@ def plot_combo_matplotlib(
     
     # Save figure
     save_dir.mkdir(parents=True, exist_ok=True)
-    out_name = f"ccdf_inr_{cell}_{link}_p{pmode.replace('.', '_')}_clt{clutter}.png"
+    out_name = combo_out_name(combo)
     fig.tight_layout()
     fig.savefig(save_dir / out_name, dpi=150, bbox_inches="tight")
     plt.close(fig)
@@ -387,14 +266,6 @@ def plot_combo_matplotlib(
 TARGET_PROBS = [p for (_, p) in PROTECTION_CRITERIA]  # [0.0003, 0.001, 0.2]
 TARGET_LBLS  = ["INR @ 0.03%", "INR @ 0.1%", "INR @ 20%"]  # para cabeçalho
 
-def _quantile_at_ccdf(x: np.ndarray, q: float) -> float:
-    """Valor x tal que P(X > x) = q  (i.e., quantil em 1-q da CDF)."""
-    x = np.asarray(x, dtype=float)
-    x = x[np.isfinite(x)]
-    if x.size == 0:
-        return np.nan
-    return float(np.quantile(x, 1.0 - q))  # interp linear padrão
-
 def _dtag_to_distance_str(dtag: str, use_delta: bool) -> str:
     """Converte 'yXXXX' em string de distância (Δ ou absoluto em km)."""
     m = re.search(r"y(\d+)", dtag, re.IGNORECASE)
@@ -409,7 +280,7 @@ def _scenario_name(cell: str, link: str) -> str:
     return f"Urban {'Macro' if cell=='macro' else 'Micro'} {'DL' if link=='dl' else 'UL'}"
 
 def rows_for_combo(combo: Tuple[str, str, str, str],
-                   dist_map: Dict[str, List[np.ndarray]],
+                   dist_map: Dict[str, CcdfHistogram],
                    use_delta_distance: bool = False) -> List[List[str]]:
     """
     Gera linhas de tabela para um combo (cell, link, pmode, clutter).
@@ -424,13 +295,12 @@ def rows_for_combo(combo: Tuple[str, str, str, str],
 
     rows = []
     for dtag in sorted(dist_map.keys(), key=_y_from_dtag):
-        arrays = dist_map[dtag]
-        if not arrays:
+        hist = dist_map[dtag]
+        if hist.n == 0:
             continue
-        x = np.concatenate(arrays)
 
-        # valores e margens
-        inrs = [_quantile_at_ccdf(x, q) for q in TARGET_PROBS]
+        # valores e margens (x tal que P(X > x) = q, com resolução HIST_BIN_DB)
+        inrs = [hist.quantile_at_ccdf(q) for q in TARGET_PROBS]
         margins = [thr - val if np.isfinite(val) else np.nan
                    for (thr, _), val in zip(PROTECTION_CRITERIA, inrs)]
 
@@ -453,7 +323,7 @@ def _write_markdown_table(rows: List[List[str]], cols: List[str], path: Path) ->
             f.write("| " + " | ".join(r) + " |\n")
 
 def build_tables_by_p(
-    data: Dict[Tuple[str,str,str,str], Dict[str, List[np.ndarray]]],
+    data: Dict[Tuple[str,str,str,str], Dict[str, CcdfHistogram]],
     use_delta_distance: bool = False
 ) -> Dict[str, Dict[str, Path]]:
     """
@@ -494,22 +364,11 @@ def build_tables_by_p(
         csv_path = sub / "summary.csv"
         md_path  = sub / "summary.md"
 
-        if _HAS_PANDAS:
-            df = pd.DataFrame(rows, columns=cols)
-            df.to_csv(csv_path, index=False)
-            try:
-                # se tabulate estiver presente
-                with open(md_path, "w", encoding="utf-8") as f:
-                    f.write(df.to_markdown(index=False))
-            except Exception:
-                _write_markdown_table(rows, cols, md_path)
-        else:
-            # fallback sem pandas
-            with open(csv_path, "w", encoding="utf-8") as f:
-                f.write(",".join(cols) + "\n")
-                for r in rows:
-                    f.write(",".join(r) + "\n")
-            _write_markdown_table(rows, cols, md_path)
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write(",".join(cols) + "\n")
+            for r in rows:
+                f.write(",".join(r) + "\n")
+        _write_markdown_table(rows, cols, md_path)
 
         outputs[pmode] = {"csv": csv_path, "md": md_path}
 
@@ -531,7 +390,11 @@ def main() -> None:
     cells, links, pmodes, clutters = normalize_selection()
     print(f"Searching for {INR_FILE} in: {OUTPUT_DIR}")
     files = find_all_inr_csvs(OUTPUT_DIR)
-    data = gather_by_combo(files, cells, links, pmodes, clutters)
+    if USE_RESULTS_CACHE:
+        with ResultsCache(OUTPUT_DIR, INR_FILE) as cache:
+            data = gather_by_combo(files, cells, links, pmodes, clutters, load=cache.load)
+    else:
+        data = gather_by_combo(files, cells, links, pmodes, clutters)
 
     # Print summary
     print("\nData summary per combination:")
@@ -541,22 +404,36 @@ def main() -> None:
                 for clutter in clutters:
                     key = (cell, link, pmode, clutter)
                     dist_map = data.get(key, {})
-                    total = sum(arr.size for arr_list in dist_map.values() for arr in arr_list)
+                    total = sum(hist.n for hist in dist_map.values())
                     print(f"  {cell.upper():5} {link.upper():2} p={pmode:<8} {clutter:<10} -> "
                           f"{len(dist_map):2} distances, {total:6} samples")
 
     # Generate plots
     print("\nGenerating plots...")
-    for cell in cells:
-        for link in links:
-            for pmode in pmodes:
-                for clutter in clutters:
-                    key = (cell, link, pmode, clutter)
-                    if key in data:
-                        if ENGINE.lower() == "matplotlib":
-                            plot_combo_matplotlib(key, data[key], PLOTS_DIR)
-                        else:
-                            print(f"Unsupported engine: {ENGINE}")
+    if ENGINE.lower() != "matplotlib":
+        print(f"Unsupported engine: {ENGINE}")
+    else:
+        # figure also changes with the code and settings of this script and
+        # of the shared helpers, and with the criteria read from constants.py
+        source = [Path(f).read_bytes() for f in (__file__, inr_combos.__file__)]
+        jobs = []
+        for cell in cells:
+            for link in links:
+                for pmode in pmodes:
+                    for clutter in clutters:
+                        key = (cell, link, pmode, clutter)
+                        curves = combo_curves(
+                            data.get(key, {}), CCDF_FLOOR, CCDF_TAIL_PROB, CCDF_MAX_REL_ERROR
+                        )
+                        if not curves:
+                            continue
+                        jobs.append(RenderJob(
+                            out_path=PLOTS_DIR / combo_out_name(key),
+                            fn=plot_combo_matplotlib,
+                            args=(key, curves, PLOTS_DIR),
+                            fingerprint=fingerprint(key, curves, source, PROTECTION_CRITERIA),
+                        ))
+        render_all(jobs, max_workers=RENDER_WORKERS)
 
     # ----- Tabelas por p-mode (separadas) -----
     outputs = build_tables_by_p(data, use_delta_distance=True)  # usa distância absoluta (km)
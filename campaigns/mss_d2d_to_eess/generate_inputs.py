@@ -1,14 +1,25 @@
+from functools import lru_cache
 import numpy as np
 
 from campaigns.utils.parameters_factory import ParametersFactory
-from campaigns.utils.dump_parameters import dump_parameters
-
-from sharc.parameters.antenna.parameters_antenna_s1528 import ParametersAntennaS1528
-from sharc.antenna.antenna_s1528 import AntennaS1528Taylor
+from campaigns.utils.taylor_beam import get_taylor_cell_radius
+from campaigns.utils.generation_engine import ScenarioSpec, emit_scenarios
+from campaigns.utils.scenario_manifest import MANIFEST_FILE_NAME
+from campaigns.utils.snapshot_shards import shard_specs
+from campaigns.utils.tracking_proxy import TrackingProxy
 
 from campaigns.mss_d2d_to_eess.constants import CAMPAIGN_STR, CAMPAIGN_NAME, get_specific_pattern, INPUTS_DIR
 
 SEED = 0xeffec7  # Example seed value, can be changed as needed
+
+# number of processes used to generate inputs (None = all cores, 1 = sequential)
+GENERATION_WORKERS = None
+
+# number of simulations each scenario's snapshots are split into (1 = no split).
+# Shards write to output_shards/ and are merged into output/ by
+# snapshot_shards.merge_shards
+N_SHARDS = 1
+
 general = {
     "seed": SEED,
     ###########################################################################
@@ -26,28 +37,6 @@ general = {
     "imt_link": "DOWNLINK",
 }
 
-def get_taylor_cell_radius(
-    params_s1528: ParametersAntennaS1528,
-    sat_alt_km: float,
-    attempt_max_angle: float = 10.0,
-    attempt_resolution: int = int(1e6)
-):
-    antenna = AntennaS1528Taylor(
-        params_s1528
-    )
-    off_axis = np.linspace(0, attempt_max_angle, attempt_resolution)
-    gains = antenna.calculate_gain(
-        off_axis_angle_vec=off_axis,
-        # theta is set to 0 since it makes no difference
-        # when antenna pattern is circular
-        theta_vec=0,
-    )
-    angle_7dB_i = np.where(gains <= params_s1528.antenna_gain - 7)[0][0]
-    angle_7dB = off_axis[angle_7dB_i]
-    cell_radius = np.tan(np.deg2rad(angle_7dB)) * sat_alt_km * 1e3
-
-    return int(cell_radius)
-
 def estimate_eess_antenna_diameter(
     frequency,
     antenna_gain,
@@ -61,13 +50,167 @@ def estimate_eess_antenna_diameter(
         lmbda * np.sqrt(G / n) / np.pi, decimals=2
     ))
 
-def generate_inputs():
+@lru_cache
+def _build_base(imt_mss_dc_id: str, eess_sys_id: str) -> TrackingProxy:
+    """
+    Builds the scenario shared by every load and mask of a system pair.
+    Cached, so each worker process builds it only once.
+    """
+    print(f"[Building params for {imt_mss_dc_id} -> {eess_sys_id}]")
+
+    params = ParametersFactory().load_from_id(
+        imt_mss_dc_id
+    ).load_from_id(
+        eess_sys_id
+    ).load_from_dict(
+        {"general": general}
+    ).build()
+
+    ##########
+    # Scenario
+
+    params.general.enable_adjacent_channel = True
+    params.general.enable_cochannel = False
+    params.imt.interfered_with = False
+    # NOTE: needed for performance. Discards unnecessary calcs.
+    params.imt.imt_dl_intra_sinr_calculation_disabled = True
+
+    params.imt.adjacent_ch_emissions = "SPECTRAL_MASK"
+
+    params.single_earth_station.frequency = 2200 + params.single_earth_station.bandwidth / 2
+    # NOTE: it seems that ACS was not used in previous iterations
+    params.single_earth_station.adjacent_ch_reception = "ACS"
+
+    # Geometry
+    ## Refernce latitude and longitude taken from Cuiaba station
+    params.imt.topology.central_latitude = -15.3300
+    params.imt.topology.central_longitude = -56.0400
+    params.imt.topology.central_altitude = 165
+
+    # position ES at reference
+    eess_geom = params.single_earth_station.geometry
+    eess_geom.height = 15
+    eess_geom.location.type = "FIXED"
+    eess_geom.location.fixed.x = 0
+    eess_geom.location.fixed.y = 0
+
+    eess_geom.azimuth.type = "UNIFORM_DIST"
+    eess_geom.azimuth.uniform_dist.max = 180.
+    eess_geom.azimuth.uniform_dist.min = -180.
+
+    # Parameters used for P.619
+    # WARNING: Remember to set the lut in propagation/Dataset!
+    params.single_earth_station.season = "SUMMER"
+    # params.single_earth_station.channel_model = "FSPL"
+    params.single_earth_station.channel_model = "P619"
+    # 3dB polarization loss, as suggested by P.619
+    params.single_earth_station.polarization_loss = 3
+
+    params.single_earth_station.param_p619.earth_station_lat_deg = params.imt.topology.central_latitude
+    params.single_earth_station.param_p619.earth_station_alt_m = params.imt.topology.central_altitude
+    # TODO: decide on these params:
+    params.single_earth_station.param_p619.mean_clutter_height = "low"
+    params.single_earth_station.param_p619.below_rooftop = 0
+
+    ##########
+    # MSS DC Parameters
+
+    # Beam pointing
+    params.imt.topology.mss_dc.beam_positioning.type = "SERVICE_GRID"
+    params.imt.topology.mss_dc.beam_positioning.service_grid.country_names = [
+        "Brazil", "Argentina", "Bolivia", "Chile", "Peru", "Paraguay", "Uruguay"
+    ]
+    # this is distance in km so that actual best satellite is used for each grid point
+    angle_dist_between_planes = 360 / params.imt.topology.mss_dc.orbits[0].n_planes
+    margin = -np.ceil((angle_dist_between_planes / 2) * 111)
+    params.imt.topology.mss_dc.beam_positioning.service_grid.eligible_sats_margin_from_border = int(margin)
+
+    # Beam is active if satellite
+    params.imt.topology.mss_dc.sat_is_active_if.conditions = [
+        "LAT_LONG_INSIDE_COUNTRY",
+        "MINIMUM_ELEVATION_FROM_ES",
+    ]
+    params.imt.topology.mss_dc.sat_is_active_if.lat_long_inside_country.country_names = [
+        "Brazil", "Argentina", "Bolivia", "Chile", "Peru", "Paraguay", "Uruguay"
+    ]
+    params.imt.topology.mss_dc.sat_is_active_if.lat_long_inside_country.margin_from_border = \
+        params.imt.topology.mss_dc.beam_positioning.service_grid.eligible_sats_margin_from_border
+
+    # Set adjacent antenna pattern
+    # Editor's note say that 1528 should still be used in adjacent studies
+    # params.imt.bs.antenna.pattern = "ARRAY"
+
+    # Get cell radius based on co-channel antenna pattern
+    params.imt.frequency = 2197.5
+    params.imt.bs.antenna.itu_r_s_1528.frequency = params.imt.frequency
+    params.imt.bs.antenna.set_external_parameters(
+        frequency=params.imt.frequency,
+    )
+    # params.imt.validate("propagating-imt")
+    params.imt.topology.mss_dc.beam_radius = get_taylor_cell_radius(
+        params.imt.bs.antenna.itu_r_s_1528,
+        params.imt.topology.mss_dc.orbits[0].apogee_alt_km,
+    )
+    print(f"A cell radius of {params.imt.topology.mss_dc.beam_radius} will be used for MSS DC")
+
+    ##########
+    # EESS Parameters
+    if params.single_earth_station.antenna.pattern == "ITU-R S.465":
+        antenna_model_param = params.single_earth_station.antenna.itu_r_s_465
+    else:
+        raise ValueError(
+            f"Script cannot deal with antenna pattern {params.single_earth_station.antenna.pattern}"
+        )
+
+    # antenna efficiency
+    n = 0.5
+    diam = estimate_eess_antenna_diameter(
+        params.single_earth_station.frequency,
+        params.single_earth_station.antenna.gain,
+        n
+    )
+
+    print(
+        f"\t- An antenna diameter of {diam} "
+        f"has been assumed for an efficiency of {n}."
+    )
+    antenna_model_param.diameter = diam
+
+    params.imt.spurious_emissions = -13
+
+    # also do uniform dist of elevation angles
+    params.single_earth_station.geometry.elevation.type = "UNIFORM_DIST"
+    params.single_earth_station.geometry.elevation.uniform_dist.min = 5.
+    params.single_earth_station.geometry.elevation.uniform_dist.max = 90.
+
+    return params
+
+
+def _build_scenario(spec: ScenarioSpec) -> TrackingProxy:
+    """The base scenario is built once, each scenario is only an overlay"""
+    v = spec.values
+    overrides = {
+        "imt.bs.load_probability": v["load"],
+    }
+    if v["mask"] == "spurious":
+        # there is no need to simulate both masks since
+        # for this freq only spurious emissions reach eess
+        overrides["imt.spectral_mask"] = "MSS"
+        overrides["imt.frequency"] = 2167.5
+    else:
+        overrides["imt.frequency"] = 2197.5
+        overrides["imt.spectral_mask"] = v["mask"]
+    overrides["general.output_dir_prefix"] = v["output_dir_prefix"]
+
+    return _build_base(*spec.group).variant(overrides)
+
+
+def generate_inputs(max_workers: int | None = GENERATION_WORKERS):
     OUTPUT_START_NAME = f"output_{CAMPAIGN_NAME}_"
     PARAMETER_START_NAME = f"parameter_{CAMPAIGN_NAME}_"
 
     print(f"Inputs going to directory '{INPUTS_DIR}'")
-
-    factory = ParametersFactory()
+    specs = []
 
     for imt_mss_dc_id in [
         "imt.2110-2200MHz.mss-dc.system3-525km",
@@ -77,132 +220,10 @@ def generate_inputs():
             "eess.2200-2290MHz.system-B",
             "eess.2200-2290MHz.system-D",
         ]:
-            print(f"[Building params for {imt_mss_dc_id} -> {eess_sys_id}]")
-
-            params = factory.load_from_id(
-                imt_mss_dc_id
-            ).load_from_id(
-                eess_sys_id
-            ).load_from_dict(
-                {"general": general}
-            ).build()
-
-            ##########
-            # Scenario
-
-            params.general.enable_adjacent_channel = True
-            params.general.enable_cochannel = False
-            params.imt.interfered_with = False
-            # NOTE: needed for performance. Discards unnecessary calcs.
-            params.imt.imt_dl_intra_sinr_calculation_disabled = True
-
-            params.imt.adjacent_ch_emissions = "SPECTRAL_MASK"
-
-            params.single_earth_station.frequency = 2200 + params.single_earth_station.bandwidth / 2
-            # NOTE: it seems that ACS was not used in previous iterations
-            params.single_earth_station.adjacent_ch_reception = "ACS"
-
-            # Geometry
-            ## Refernce latitude and longitude taken from Cuiaba station
-            params.imt.topology.central_latitude = -15.3300
-            params.imt.topology.central_longitude = -56.0400
-            params.imt.topology.central_altitude = 165
-
-            # position ES at reference
-            eess_geom = params.single_earth_station.geometry
-            eess_geom.height = 15
-            eess_geom.location.type = "FIXED"
-            eess_geom.location.fixed.x = 0
-            eess_geom.location.fixed.y = 0
-
-            eess_geom.azimuth.type = "UNIFORM_DIST"
-            eess_geom.azimuth.uniform_dist.max = 180.
-            eess_geom.azimuth.uniform_dist.min = -180.
-
-            # Parameters used for P.619
-            # WARNING: Remember to set the lut in propagation/Dataset!
-            params.single_earth_station.season = "SUMMER"
-            # params.single_earth_station.channel_model = "FSPL"
-            params.single_earth_station.channel_model = "P619"
-            # 3dB polarization loss, as suggested by P.619
-            params.single_earth_station.polarization_loss = 3
-
-            params.single_earth_station.param_p619.earth_station_lat_deg = params.imt.topology.central_latitude
-            params.single_earth_station.param_p619.earth_station_alt_m = params.imt.topology.central_altitude
-            # TODO: decide on these params:
-            params.single_earth_station.param_p619.mean_clutter_height = "low"
-            params.single_earth_station.param_p619.below_rooftop = 0
-
-            ##########
-            # MSS DC Parameters
-
-            # Beam pointing
-            params.imt.topology.mss_dc.beam_positioning.type = "SERVICE_GRID"
-            params.imt.topology.mss_dc.beam_positioning.service_grid.country_names = [
-                "Brazil", "Argentina", "Bolivia", "Chile", "Peru", "Paraguay", "Uruguay"
-            ]
-            # this is distance in km so that actual best satellite is used for each grid point
-            angle_dist_between_planes = 360 / params.imt.topology.mss_dc.orbits[0].n_planes
-            margin = -np.ceil((angle_dist_between_planes / 2) * 111)
-            params.imt.topology.mss_dc.beam_positioning.service_grid.eligible_sats_margin_from_border = int(margin)
-
-            # Beam is active if satellite
-            params.imt.topology.mss_dc.sat_is_active_if.conditions = [
-                "LAT_LONG_INSIDE_COUNTRY",
-                "MINIMUM_ELEVATION_FROM_ES",
-            ]
-            params.imt.topology.mss_dc.sat_is_active_if.lat_long_inside_country.country_names = [
-                "Brazil", "Argentina", "Bolivia", "Chile", "Peru", "Paraguay", "Uruguay"
-            ]
-            params.imt.topology.mss_dc.sat_is_active_if.lat_long_inside_country.margin_from_border = \
-                params.imt.topology.mss_dc.beam_positioning.service_grid.eligible_sats_margin_from_border
-
-            # Set adjacent antenna pattern
-            # Editor's note say that 1528 should still be used in adjacent studies
-            # params.imt.bs.antenna.pattern = "ARRAY"
-
-            # Get cell radius based on co-channel antenna pattern
-            params.imt.frequency = 2197.5
-            params.imt.bs.antenna.itu_r_s_1528.frequency = params.imt.frequency
-            params.imt.bs.antenna.set_external_parameters(
-                frequency=params.imt.frequency,
-            )
-            # params.imt.validate("propagating-imt")
-            params.imt.topology.mss_dc.beam_radius = get_taylor_cell_radius(
-                params.imt.bs.antenna.itu_r_s_1528,
-                params.imt.topology.mss_dc.orbits[0].apogee_alt_km,
-            )
-            print(f"A cell radius of {params.imt.topology.mss_dc.beam_radius} will be used for MSS DC")
-
-            ##########
-            # EESS Parameters
-            if params.single_earth_station.antenna.pattern == "ITU-R S.465":
-                antenna_model_param = params.single_earth_station.antenna.itu_r_s_465
-            else:
-                raise ValueError(
-                    f"Script cannot deal with antenna pattern {params.single_earth_station.antenna.pattern}"
-                )
-
-            # antenna efficiency
-            n = 0.5
-            diam = estimate_eess_antenna_diameter(
-                params.single_earth_station.frequency,
-                params.single_earth_station.antenna.gain,
-                n
-            )
-
-            print(
-                f"\t- An antenna diameter of {diam} "
-                f"has been assumed for an efficiency of {n}."
-            )
-            antenna_model_param.diameter = diam
-
-            params.imt.spurious_emissions = -13
             for load in [
                 0.2,
                 0.5,
             ]:
-                params.imt.bs.load_probability = load
                 for mask in [
                     "MSS",
                     "spurious"
@@ -212,29 +233,31 @@ def generate_inputs():
                         "spurious": "spurious"
                     }[mask]
 
-                    if mask == "spurious":
-                        # there is no need to simulate both masks since
-                        # for this freq only spurious emissions reach eess
-                        params.imt.spectral_mask = "MSS"
-                        params.imt.frequency = 2167.5
-                    else:
-                        params.imt.frequency = 2197.5
-                        params.imt.spectral_mask = mask
-
-                    # also do uniform dist of elevation angles
-                    params.single_earth_station.geometry.elevation.type = "UNIFORM_DIST"
-                    params.single_earth_station.geometry.elevation.uniform_dist.min = 5.
-                    params.single_earth_station.geometry.elevation.uniform_dist.max = 90.
-
                     specific = get_specific_pattern(
                         "uniform", eess_sys_id, imt_mss_dc_id, readable_mask, load
                     )
-                    params.general.output_dir_prefix = OUTPUT_START_NAME + specific
+                    specs.append(ScenarioSpec(
+                        key=specific,
+                        parameter_file=INPUTS_DIR / (PARAMETER_START_NAME + specific + ".yaml"),
+                        values={
+                            "imt_mss_dc_id": imt_mss_dc_id,
+                            "eess_sys_id": eess_sys_id,
+                            "load": load,
+                            "mask": mask,
+                            "output_dir_prefix": OUTPUT_START_NAME + specific,
+                        },
+                        group=(imt_mss_dc_id, eess_sys_id),
+                    ))
+
+    specs = shard_specs(
+        specs, N_SHARDS, SEED, general["num_snapshots"],
+        f"{CAMPAIGN_STR}/output_shards/",
+    )
 
-                    dump_parameters(
-                        INPUTS_DIR / (PARAMETER_START_NAME + specific + ".yaml"),
-                        params,
-                    )
+    emit_scenarios(
+        specs, _build_scenario, max_workers=max_workers,
+        manifest_file=INPUTS_DIR / MANIFEST_FILE_NAME,
+    )
 
 def clear_inputs():
     print(f"Clearing inputs from dir '{INPUTS_DIR}'")
@@ -1,10 +1,17 @@
 import numpy as np
-from sharc.results import Results, SampleList
+from sharc.results import SampleList
 from sharc.post_processor import PostProcessor
 
+from campaigns.utils.plot_export import export_figure
+from campaigns.utils.results_views import load_results_by_plot_type
 from campaigns.mss_d2d_to_eess.constants import CAMPAIGN_DIR, SYS_ID_TO_READABLE, get_specific_pattern, MSS_ID_TO_READABLE
 
 auto_open = True
+# "directory" shares one plotly.min.js between the htmls, "cdn" makes
+# self contained pages
+PLOTLYJS = "directory"
+# also save each plot as a static image, e.g. "png" (needs kaleido)
+IMAGE_FORMAT = None
 
 post_processor = PostProcessor()
 
@@ -21,17 +28,15 @@ samples_for_cdf = [
     "system_inr", "ccdf"
 ]
 
-ccdf_results = Results.load_many_from_dir(
+# samples are read once, each plot type gets its own view of them
+results_by_plot_type = load_results_by_plot_type(
     CAMPAIGN_DIR / "output",
+    {"ccdf": samples_for_ccdf, "cdf": samples_for_cdf},
     # filter_fn=lambda x: "mss_d2d_to_eess" in x,
     only_latest=True,
-    only_samples=samples_for_ccdf)
-
-cdf_results = Results.load_many_from_dir(
-    CAMPAIGN_DIR / "output",
-    # filter_fn=lambda x: "mss_d2d_to_eess" in x,
-    only_latest=True,
-    only_samples=samples_for_cdf)
+)
+ccdf_results = results_by_plot_type["ccdf"]
+cdf_results = results_by_plot_type["cdf"]
 
 for res in ccdf_results:
     # converting dBm to dB
@@ -209,5 +214,10 @@ for attr, plot_type in attributes_to_plot:
             borderwidth=1
         )
     )
-    plot.write_html(file=file, include_plotlyjs="cdn", auto_open=auto_open)
+    export_figure(
+        plot, file,
+        include_plotlyjs=PLOTLYJS,
+        image_format=IMAGE_FORMAT,
+        auto_open=auto_open,
+    )
 
@@ -2,8 +2,10 @@ import argparse
 
 from sharc.run_multiple_campaigns_mut_thread import run_campaign
 
-from campaigns.mss_d2d_to_eess.generate_inputs import clear_inputs, generate_inputs
-from campaigns.mss_d2d_to_eess.constants import CAMPAIGN_NAME
+from campaigns.mss_d2d_to_eess.generate_inputs import SEED, clear_inputs, generate_inputs
+from campaigns.mss_d2d_to_eess.constants import CAMPAIGN_DIR, CAMPAIGN_NAME, INPUTS_DIR
+from campaigns.utils.resumable_runner import run_campaign_resumable
+from campaigns.utils.snapshot_shards import merge_shards
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="MSS D2D to EESS cli")
@@ -14,9 +16,28 @@ if __name__ == "__main__":
         help="Flag to not generate parameters before running (true/false). Default: false",
     )
 
+    parser.add_argument(
+        "-r", "--resume",
+        action="store_true",
+        help="Only run scenarios that are new, changed or not completed in a previous run.",
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int, default=None,
+        help="Parallel simulations with --resume (default: number of cores).",
+    )
+
     args = parser.parse_args()
     if not args.dont_generate:
         clear_inputs()
         generate_inputs()
 
-    run_campaign(CAMPAIGN_NAME)
+    if args.resume:
+        run_campaign_resumable(
+            INPUTS_DIR, CAMPAIGN_DIR / "output", max_workers=args.workers
+        )
+    else:
+        run_campaign(CAMPAIGN_NAME)
+
+    # no-op unless the inputs were generated with N_SHARDS > 1
+    merge_shards(CAMPAIGN_DIR / "output_shards", CAMPAIGN_DIR / "output", SEED)
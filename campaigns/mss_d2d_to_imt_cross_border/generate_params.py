@@ -1,11 +1,10 @@
 from campaigns.utils.parameters_factory import ParametersFactory
 from campaigns.utils.dump_parameters import dump_parameters
+from campaigns.utils.taylor_beam import get_taylor_cell_radius
 from campaigns.mss_d2d_to_imt_cross_border.run import CAMPAIGN_STR, CAMPAIGN_DIR, get_output_dir_start, INPUTS_DIR
 
 from campaigns.mss_d2d_to_imt_cross_border.cmd_parser import get_cmd_parser
 
-from sharc.antenna.antenna_s1528 import AntennaS1528Taylor
-
 import numpy as np
 
 def generate(
@@ -104,20 +103,12 @@ def generate(
         params.mss_d2d.antenna_s1528.frequency = params.mss_d2d.frequency
         # NOTE: max frequency yields smaller cell radius
         # params.mss_d2d.antenna_s1528.frequency = max(ul_imt_freq, dl_imt_freq)
-        antenna = AntennaS1528Taylor(
-            params.mss_d2d.antenna_s1528
-        )
-        off_axis = np.linspace(0, 20, int(1e6))
-        gains = antenna.calculate_gain(
-            off_axis_angle_vec=off_axis,
-            theta_vec=0,
-        )
-        angle_7dB_i = np.where(gains <= params.mss_d2d.antenna_s1528.antenna_gain - 7)[0][0]
-        angle_7dB = off_axis[angle_7dB_i]
-        cell_radius = np.tan(np.deg2rad(angle_7dB)) * params.mss_d2d.orbits[0].apogee_alt_km * 1e3
-
         # apprx. 36675.5
-        params.mss_d2d.cell_radius = int(cell_radius)
+        params.mss_d2d.cell_radius = get_taylor_cell_radius(
+            params.mss_d2d.antenna_s1528,
+            params.mss_d2d.orbits[0].apogee_alt_km,
+            attempt_max_angle=20.0,
+        )
         print(f"[IMT TN {params.general.imt_link}]:")
         print(f"\tCalculated cell radius: ", params.mss_d2d.cell_radius)
 
@@ -9,6 +9,7 @@ from campaigns.mss_d2d_to_imt_cross_border.cmd_parser import get_cmd_parser
 
 from campaigns.mss_d2d_to_imt_cross_border.run import CAMPAIGN_STR, get_output_dir_start
 from campaigns.utils.constants import SHARC_SIM_ROOT_DIR
+from campaigns.utils.plot_export import export_figure
 
 OUTPUT_ROOT_FOLDER = SHARC_SIM_ROOT_DIR / CAMPAIGN_STR
 
@@ -196,7 +197,7 @@ if __name__ == "__main__":
         if plot is None:
             print(f"Warning: No plot found for attribute '{attr}'")
             continue
-        plot.write_html(specific_dir / f"{attr}.html")
+        export_figure(plot, specific_dir / f"{attr}.html")
         # plot.show()
 
 
@@ -1,11 +1,14 @@
+from functools import lru_cache
 from itertools import product
 import numpy as np
 
-from sharc.parameters.antenna.parameters_antenna_s1528 import ParametersAntennaS1528
-from sharc.antenna.antenna_s1528 import AntennaS1528Taylor
-
 from campaigns.utils.parameters_factory import ParametersFactory
-from campaigns.utils.dump_parameters import dump_parameters
+from campaigns.utils.taylor_beam import get_taylor_cell_radius
+from campaigns.utils.acs import calculate_equivalent_acs_array
+from campaigns.utils.generation_engine import ScenarioSpec, emit_scenarios
+from campaigns.utils.scenario_manifest import MANIFEST_FILE_NAME
+from campaigns.utils.snapshot_shards import shard_specs
+from campaigns.utils.tracking_proxy import TrackingProxy
 from campaigns.mss_d2d_to_mss.constants import (
     CAMPAIGN_STR, CAMPAIGN_NAME, INPUTS_DIR,
     IMT_MSS_DC_IDS, MSS_DC_LOAD_FACTORS, SINGLE_ES_MSS_IDS,
@@ -14,6 +17,14 @@ from campaigns.mss_d2d_to_mss.constants import (
 
 SEED = 82
 
+# number of processes used to generate inputs (None = all cores, 1 = sequential)
+GENERATION_WORKERS = None
+
+# number of simulations each scenario's snapshots are split into (1 = no split).
+# Shards write to output_shards/ and are merged into output/ by
+# snapshot_shards.merge_shards
+N_SHARDS = 1
+
 general = {
     "seed": SEED,
     "num_snapshots": 1000,
@@ -24,27 +35,10 @@ general = {
     "imt_link": "DOWNLINK",
 }
 
-def get_taylor_cell_radius(
-    params_s1528: ParametersAntennaS1528,
-    sat_alt_km: float,
-    attempt_max_angle: float = 10.0,
-    attempt_resolution: int = int(1e6)
-):
-    antenna = AntennaS1528Taylor(
-        params_s1528
-    )
-    off_axis = np.linspace(0, attempt_max_angle, attempt_resolution)
-    gains = antenna.calculate_gain(
-        off_axis_angle_vec=off_axis,
-        # theta is set to 0 since it makes no difference
-        # when antenna pattern is circular
-        theta_vec=0,
-    )
-    angle_7dB_i = np.where(gains <= params_s1528.antenna_gain - 7)[0][0]
-    angle_7dB = off_axis[angle_7dB_i]
-    cell_radius = np.tan(np.deg2rad(angle_7dB)) * sat_alt_km * 1e3
-
-    return int(cell_radius)
+# receiver mask used for the equivalent ACS,
+# limits in multiples of the receiver bandwidth from its channel edge
+ACS_MASK_LIMS = [0., 1., 3., np.inf]
+ACS_MASK_VALS_DBC = [15., 25., 30.]
 
 def calculate_equivalent_acs(
     ue_f_MHz,
@@ -57,50 +51,19 @@ def calculate_equivalent_acs(
     """
     # NOTE: this function probably should not be here, but somehow
     # together with from-docs equipment definition
+    acs = calculate_equivalent_acs_array(
+        ue_f_MHz, ue_bw_MHz,
+        other_f_MHz, other_bw_MHz,
+        ACS_MASK_LIMS, ACS_MASK_VALS_DBC,
+    )
 
-    ue_lim_s = ue_f_MHz - ue_bw_MHz / 2
-    ue_lim_e = ue_f_MHz + ue_bw_MHz / 2
-    other_lim_s = other_f_MHz - other_bw_MHz / 2
-    other_lim_e = other_f_MHz + other_bw_MHz / 2
-
-    if (
-        ue_lim_s < other_lim_s < ue_lim_e
-    ) or (
-        ue_lim_s < other_lim_e < ue_lim_e
-    ):
+    if np.isnan(acs):
         # may not be needed?
         raise ValueError(
             "Expected adjacent channel to calculate for ACS"
         )
-    if other_lim_s >= ue_lim_e:
-        df_s = other_lim_s - ue_lim_e
-        df_e = other_lim_e - ue_lim_e
-    elif other_lim_e <= ue_lim_s:
-        df_s = ue_lim_s - other_lim_e
-        df_e = ue_lim_s - other_lim_s
-
-    mask_lims = np.array([
-        0.,
-        ue_bw_MHz,
-        3 * ue_bw_MHz,
-        np.inf,
-    ])
-    mask_vals_dBc = np.array([
-        15., 25., 30.
-    ])
-
-    mask_bins_overlap_MHz = np.zeros_like(mask_vals_dBc)
-    for i in range(len(mask_lims) - 1):
-        win_s = max(mask_lims[i], df_s)
-        win_e = min(mask_lims[i + 1], df_e)
-        mask_bins_overlap_MHz[i] = max(win_e - win_s, 0)
-
-    equivalent_attenuation = -10 * np.log10(
-        np.sum(mask_bins_overlap_MHz * 10 ** (-0.1 * mask_vals_dBc))
-        / other_bw_MHz
-    )
 
-    return float(equivalent_attenuation)
+    return float(acs)
 
 
 def test_calculate_equivalent_acs():
@@ -179,141 +142,195 @@ def test_calculate_equivalent_acs():
     if abs(acs - 20.1786252944) > 1e-5:
         raise Exception(f"{acs} != 20.1786252944")
 
+    # same cases, and mirrored ones, evaluated at once
+    acs = calculate_equivalent_acs_array(
+        2500 - 1.23/2, 1.23,
+        np.array([
+            2500 + 1.23/2, 2500 + 1.23/2 + 1.23, 2500 + 5/2,
+            2500 - 1.23 - 1.23/2, 2500 - 1.23 - 1.23/2 - 1.23, 2500 - 1.23 - 5/2,
+        ]),
+        np.array([1.23, 1.23, 5, 1.23, 1.23, 5]),
+        ACS_MASK_LIMS, ACS_MASK_VALS_DBC,
+    )
+    expected = np.array([15, 25, 20.1786252944] * 2)
+
+    if np.any(np.abs(acs - expected) > 1e-5):
+        raise Exception(f"{acs} != {expected}")
+
+    # overlapping channels are not adjacent
+    acs = calculate_equivalent_acs_array(
+        2500, 1.23,
+        np.array([2500, 2500 + 1.23/2]), 1.23,
+        ACS_MASK_LIMS, ACS_MASK_VALS_DBC,
+    )
 
-def generate_inputs():
+    if not np.all(np.isnan(acs)):
+        raise Exception(f"{acs} should be NaN")
+
+
+@lru_cache(maxsize=None)
+def _build_base(imt_id: str, single_es_id: str) -> TrackingProxy:
+    """
+    Builds the scenario shared by every load factor of a system pair.
+    Cached, so each worker process builds it only once.
+    """
+    print(f"[Building params for {imt_id} -> {single_es_id}]")
+
+    params = ParametersFactory().load_from_id(
+        imt_id
+    ).load_from_id(
+        single_es_id
+    ).load_from_dict(
+        {"general": general}
+    ).build()
+
+    ##########
+    # Scenario
+
+    params.general.enable_adjacent_channel = True
+    params.general.enable_cochannel = False
+    params.imt.interfered_with = False
+    # NOTE: needed for performance. Discards unnecessary calcs.
+    params.imt.imt_dl_intra_sinr_calculation_disabled = True
+
+    params.imt.frequency = 2500 + params.imt.bandwidth / 2
+    params.single_earth_station.frequency = 2500 - params.single_earth_station.bandwidth / 2
+
+    params.imt.adjacent_ch_emissions = "SPECTRAL_MASK"
+    params.single_earth_station.adjacent_ch_reception = "ACS"
+    params.single_earth_station.adjacent_ch_selectivity = calculate_equivalent_acs(
+        params.single_earth_station.frequency,
+        params.single_earth_station.bandwidth,
+        params.imt.frequency,
+        params.imt.bandwidth,
+    )
+
+    params.imt.spurious_emissions = -13
+
+    # Geometry
+    ## Refernce latitude and longitude taken from Cuiaba station
+    params.imt.topology.central_latitude = -15.3300
+    params.imt.topology.central_longitude = -56.0400
+    params.imt.topology.central_altitude = 165
+
+    # Channel Model
+    params.single_earth_station.season = "SUMMER"
+    params.single_earth_station.channel_model = "P619"
+    # 3dB polarization loss, as suggested by P.619
+    params.single_earth_station.polarization_loss = 3
+
+    params.single_earth_station.param_p619.earth_station_lat_deg = params.imt.topology.central_latitude
+    params.single_earth_station.param_p619.earth_station_alt_m = params.imt.topology.central_altitude
+    # NOTE: we chose rural/low cluttered environment since MSS UEs are normally there
+    params.single_earth_station.param_p619.mean_clutter_height = "low"
+    params.single_earth_station.param_p619.below_rooftop = 0
+
+    # position ES at reference
+    es_geom = params.single_earth_station.geometry
+    es_geom.location.type = "FIXED"
+    es_geom.location.fixed.x = 0
+    es_geom.location.fixed.y = 0
+
+    es_geom.azimuth.type = "UNIFORM_DIST"
+    es_geom.azimuth.uniform_dist.max = 180.
+    es_geom.azimuth.uniform_dist.min = -180.
+
+    es_geom.elevation.type = "UNIFORM_DIST"
+    es_geom.elevation.uniform_dist.max = 90.
+    es_geom.elevation.uniform_dist.min = 5.
+
+    ##########
+    # MSS DC Parameters
+
+    # Beam pointing
+    params.imt.topology.mss_dc.beam_positioning.type = "SERVICE_GRID"
+    params.imt.topology.mss_dc.beam_positioning.service_grid.country_names = [
+        "Brazil", "Argentina", "Bolivia", "Chile", "Peru", "Paraguay", "Uruguay"
+    ]
+    # this is distance in km so that actual best satellite is used for each grid point
+    angle_dist_between_planes = 360 / params.imt.topology.mss_dc.orbits[0].n_planes
+    margin = -np.ceil((angle_dist_between_planes / 2) * 111)
+    params.imt.topology.mss_dc.beam_positioning.service_grid.eligible_sats_margin_from_border = int(margin)
+
+    # Beam is active if satellite
+    params.imt.topology.mss_dc.sat_is_active_if.conditions = [
+        "LAT_LONG_INSIDE_COUNTRY",
+        "MINIMUM_ELEVATION_FROM_ES",
+    ]
+    params.imt.topology.mss_dc.sat_is_active_if.lat_long_inside_country.country_names = [
+        "Brazil", "Argentina", "Bolivia", "Chile", "Peru", "Paraguay", "Uruguay"
+    ]
+    params.imt.topology.mss_dc.sat_is_active_if.lat_long_inside_country.margin_from_border = \
+        params.imt.topology.mss_dc.beam_positioning.service_grid.eligible_sats_margin_from_border
+
+    # Set adjacent antenna pattern
+
+    # Get cell radius based on co-channel antenna pattern
+    params.imt.bs.antenna.itu_r_s_1528.frequency = params.imt.frequency
+    params.imt.bs.antenna.set_external_parameters(
+        frequency=params.imt.frequency,
+    )
+    params.imt.topology.mss_dc.beam_radius = get_taylor_cell_radius(
+        params.imt.bs.antenna.itu_r_s_1528,
+        params.imt.topology.mss_dc.orbits[0].apogee_alt_km,
+    )
+    print(f"\tA cell radius of {params.imt.topology.mss_dc.beam_radius} will be used for MSS DC")
+
+    # also do uniform dist of elevation angles
+    params.single_earth_station.geometry.elevation.type = "UNIFORM_DIST"
+    params.single_earth_station.geometry.elevation.uniform_dist.min = 10.
+    params.single_earth_station.geometry.elevation.uniform_dist.max = 90.
+
+    return params
+
+
+def _build_scenario(spec: ScenarioSpec) -> TrackingProxy:
+    """The base scenario is built once, each scenario is only an overlay"""
+    v = spec.values
+    return _build_base(*spec.group).variant({
+        "imt.bs.load_probability": v["mss_dc_load"],
+        "general.output_dir_prefix": v["output_dir_prefix"],
+    })
+
+
+def generate_inputs(max_workers: int | None = GENERATION_WORKERS):
     """Generates all campaign input files"""
     OUTPUT_START_NAME = f"output_{CAMPAIGN_NAME}_"
     PARAMETER_START_NAME = f"parameter_{CAMPAIGN_NAME}_"
 
     print(f"Generating input parameters at:\n\t{INPUTS_DIR}")
-    factory = ParametersFactory()
-    total = 0
+    specs = []
 
     for imt_id, single_es_id in product(IMT_MSS_DC_IDS, SINGLE_ES_MSS_IDS):
-        print(f"[Building params for {imt_id} -> {single_es_id}]")
-
-        params = factory.load_from_id(
-            imt_id
-        ).load_from_id(
-            single_es_id
-        ).load_from_dict(
-            {"general": general}
-        ).build()
-
-        ##########
-        # Scenario
-
-        params.general.enable_adjacent_channel = True
-        params.general.enable_cochannel = False
-        params.imt.interfered_with = False
-        # NOTE: needed for performance. Discards unnecessary calcs.
-        params.imt.imt_dl_intra_sinr_calculation_disabled = True
-
-        params.imt.frequency = 2500 + params.imt.bandwidth / 2
-        params.single_earth_station.frequency = 2500 - params.single_earth_station.bandwidth / 2
-
-        params.imt.adjacent_ch_emissions = "SPECTRAL_MASK"
-        params.single_earth_station.adjacent_ch_reception = "ACS"
-        params.single_earth_station.adjacent_ch_selectivity = calculate_equivalent_acs(
-            params.single_earth_station.frequency,
-            params.single_earth_station.bandwidth,
-            params.imt.frequency,
-            params.imt.bandwidth,
-        )
-
-        params.imt.spurious_emissions = -13
-
-        # Geometry
-        ## Refernce latitude and longitude taken from Cuiaba station
-        params.imt.topology.central_latitude = -15.3300
-        params.imt.topology.central_longitude = -56.0400
-        params.imt.topology.central_altitude = 165
-
-        # Channel Model
-        params.single_earth_station.season = "SUMMER"
-        params.single_earth_station.channel_model = "P619"
-        # 3dB polarization loss, as suggested by P.619
-        params.single_earth_station.polarization_loss = 3
-
-        params.single_earth_station.param_p619.earth_station_lat_deg = params.imt.topology.central_latitude
-        params.single_earth_station.param_p619.earth_station_alt_m = params.imt.topology.central_altitude
-        # NOTE: we chose rural/low cluttered environment since MSS UEs are normally there
-        params.single_earth_station.param_p619.mean_clutter_height = "low"
-        params.single_earth_station.param_p619.below_rooftop = 0
-
-        # position ES at reference
-        es_geom = params.single_earth_station.geometry
-        es_geom.location.type = "FIXED"
-        es_geom.location.fixed.x = 0
-        es_geom.location.fixed.y = 0
-
-        es_geom.azimuth.type = "UNIFORM_DIST"
-        es_geom.azimuth.uniform_dist.max = 180.
-        es_geom.azimuth.uniform_dist.min = -180.
-
-        es_geom.elevation.type = "UNIFORM_DIST"
-        es_geom.elevation.uniform_dist.max = 90.
-        es_geom.elevation.uniform_dist.min = 5.
-
-        ##########
-        # MSS DC Parameters
-
-        # Beam pointing
-        params.imt.topology.mss_dc.beam_positioning.type = "SERVICE_GRID"
-        params.imt.topology.mss_dc.beam_positioning.service_grid.country_names = [
-            "Brazil", "Argentina", "Bolivia", "Chile", "Peru", "Paraguay", "Uruguay"
-        ]
-        # this is distance in km so that actual best satellite is used for each grid point
-        angle_dist_between_planes = 360 / params.imt.topology.mss_dc.orbits[0].n_planes
-        margin = -np.ceil((angle_dist_between_planes / 2) * 111)
-        params.imt.topology.mss_dc.beam_positioning.service_grid.eligible_sats_margin_from_border = int(margin)
-
-        # Beam is active if satellite
-        params.imt.topology.mss_dc.sat_is_active_if.conditions = [
-            "LAT_LONG_INSIDE_COUNTRY",
-            "MINIMUM_ELEVATION_FROM_ES",
-        ]
-        params.imt.topology.mss_dc.sat_is_active_if.lat_long_inside_country.country_names = [
-            "Brazil", "Argentina", "Bolivia", "Chile", "Peru", "Paraguay", "Uruguay"
-        ]
-        params.imt.topology.mss_dc.sat_is_active_if.lat_long_inside_country.margin_from_border = \
-            params.imt.topology.mss_dc.beam_positioning.service_grid.eligible_sats_margin_from_border
-
-        # Set adjacent antenna pattern
-
-        # Get cell radius based on co-channel antenna pattern
-        params.imt.bs.antenna.itu_r_s_1528.frequency = params.imt.frequency
-        params.imt.bs.antenna.set_external_parameters(
-            frequency=params.imt.frequency,
-        )
-        params.imt.topology.mss_dc.beam_radius = get_taylor_cell_radius(
-            params.imt.bs.antenna.itu_r_s_1528,
-            params.imt.topology.mss_dc.orbits[0].apogee_alt_km,
-        )
-        print(f"\tA cell radius of {params.imt.topology.mss_dc.beam_radius} will be used for MSS DC")
-
-        # also do uniform dist of elevation angles
-        params.single_earth_station.geometry.elevation.type = "UNIFORM_DIST"
-        params.single_earth_station.geometry.elevation.uniform_dist.min = 10.
-        params.single_earth_station.geometry.elevation.uniform_dist.max = 90.
-
         for mss_dc_load in (
             MSS_DC_LOAD_FACTORS
         ):
-            params.imt.bs.load_probability = mss_dc_load
             specific = get_specific_pattern(
                 imt_id, single_es_id, mss_dc_load
             )
-            params.general.output_dir_prefix = OUTPUT_START_NAME + specific
-
-            total += 1
-            dump_parameters(
-                INPUTS_DIR / (PARAMETER_START_NAME + specific + ".yaml"),
-                params,
-            )
+            specs.append(ScenarioSpec(
+                key=specific,
+                parameter_file=INPUTS_DIR / (PARAMETER_START_NAME + specific + ".yaml"),
+                values={
+                    "imt_id": imt_id,
+                    "single_es_id": single_es_id,
+                    "mss_dc_load": mss_dc_load,
+                    "output_dir_prefix": OUTPUT_START_NAME + specific,
+                },
+                group=(imt_id, single_es_id),
+            ))
+
+    specs = shard_specs(
+        specs, N_SHARDS, SEED, general["num_snapshots"],
+        f"{CAMPAIGN_STR}/output_shards/",
+    )
 
+    generated = emit_scenarios(
+        specs, _build_scenario, max_workers=max_workers,
+        manifest_file=INPUTS_DIR / MANIFEST_FILE_NAME,
+    )
 
-    print(f"\nFiles generated on this run: {total}\n")
+    print(f"\nFiles generated on this run: {len(generated)}\n")
     if INPUTS_DIR.exists():
         n_of_inputs = np.sum([item.name.endswith(".yaml") for item in INPUTS_DIR.iterdir()])
         print("Total number of input files: ", n_of_inputs)
@@ -1,8 +1,10 @@
 from itertools import product
 import numpy as np
-from sharc.results import Results, SampleList
+from sharc.results import SampleList
 from sharc.post_processor import PostProcessor
 
+from campaigns.utils.plot_export import export_figure
+from campaigns.utils.results_views import load_results_by_plot_type
 from campaigns.mss_d2d_to_mss.constants import (
     CAMPAIGN_DIR, MSS_ES_TO_READABLE, IMT_MSS_DC_ID_TO_READABLE,
     IMT_MSS_DC_IDS, MSS_DC_LOAD_FACTORS, SINGLE_ES_MSS_IDS,
@@ -10,6 +12,11 @@ from campaigns.mss_d2d_to_mss.constants import (
 )
 
 auto_open = False
+# "directory" shares one plotly.min.js between the htmls, "cdn" makes
+# self contained pages
+PLOTLYJS = "directory"
+# also save each plot as a static image, e.g. "png" (needs kaleido)
+IMAGE_FORMAT = None
 
 post_processor = PostProcessor()
 
@@ -26,17 +33,15 @@ attributes_to_plot = [
 samples_for_ccdf = [attr[0] for attr in attributes_to_plot if attr[1] == "ccdf"]
 samples_for_cdf = [attr[0] for attr in attributes_to_plot if attr[1] == "cdf"]
 
-ccdf_results = Results.load_many_from_dir(
+# samples are read once, each plot type gets its own view of them
+results_by_plot_type = load_results_by_plot_type(
     CAMPAIGN_DIR / "output",
+    {"ccdf": samples_for_ccdf, "cdf": samples_for_cdf},
     # filter_fn=lambda x: "mss_d2d_to_eess" in x,
     only_latest=True,
-    only_samples=samples_for_ccdf)
-
-cdf_results = Results.load_many_from_dir(
-    CAMPAIGN_DIR / "output",
-    # filter_fn=lambda x: "mss_d2d_to_eess" in x,
-    only_latest=True,
-    only_samples=samples_for_cdf)
+)
+ccdf_results = results_by_plot_type["ccdf"]
+cdf_results = results_by_plot_type["cdf"]
 
 # for res in cdf_results:
 #     print("res.output_directory", res.output_directory)
@@ -155,5 +160,10 @@ for attr, plot_type in attributes_to_plot:
             borderwidth=1
         )
     )
-    plot.write_html(file=file, include_plotlyjs="cdn", auto_open=auto_open)
+    export_figure(
+        plot, file,
+        include_plotlyjs=PLOTLYJS,
+        image_format=IMAGE_FORMAT,
+        auto_open=auto_open,
+    )
     # plot.show()
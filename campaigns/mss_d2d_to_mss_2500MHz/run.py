@@ -2,8 +2,10 @@ import argparse
 import sys
 from sharc.run_multiple_campaigns_mut_thread import run_campaign
 
-from campaigns.mss_d2d_to_mss_2500MHz.generate_inputs import clear_inputs, generate_inputs, test_calculate_equivalent_acs
-from campaigns.mss_d2d_to_mss_2500MHz.constants import CAMPAIGN_NAME, INPUTS_DIR
+from campaigns.mss_d2d_to_mss_2500MHz.generate_inputs import SEED, clear_inputs, generate_inputs, test_calculate_equivalent_acs
+from campaigns.mss_d2d_to_mss_2500MHz.constants import CAMPAIGN_DIR, CAMPAIGN_NAME, INPUTS_DIR
+from campaigns.utils.resumable_runner import run_campaign_resumable
+from campaigns.utils.snapshot_shards import merge_shards
 
 def main():
     parser = argparse.ArgumentParser(description="MSS D2D to MSS campaign runner")
@@ -12,6 +14,16 @@ def main():
         action="store_true",
         help="Skip generating input parameter files before running (default: generate inputs).",
     )
+    parser.add_argument(
+        "-r", "--resume",
+        action="store_true",
+        help="Only run scenarios that are new, changed or not completed in a previous run.",
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int, default=None,
+        help="Parallel simulations with --resume (default: number of cores).",
+    )
     args = parser.parse_args()
 
     if not args.dont_generate:
@@ -30,7 +42,17 @@ def main():
 
     print(f"[INFO] Running campaign: {CAMPAIGN_NAME}")
     try:
-        run_campaign(CAMPAIGN_NAME)
+        if args.resume:
+            failed = run_campaign_resumable(
+                INPUTS_DIR, CAMPAIGN_DIR / "output", max_workers=args.workers
+            )
+            if failed:
+                print(f"[ERROR] {len(failed)} scenario(s) failed, rerun with --resume to retry them")
+                return 1
+        else:
+            run_campaign(CAMPAIGN_NAME)
+        # no-op unless the inputs were generated with N_SHARDS > 1
+        merge_shards(CAMPAIGN_DIR / "output_shards", CAMPAIGN_DIR / "output", SEED)
     except KeyboardInterrupt:
         print("\n[INFO] Interrupted by user.")
         return 130
@@ -0,0 +1,79 @@
+"""
+Equivalent adjacent channel selectivity (ACS) from a piecewise receiver mask.
+
+The receiver mask is given as attenuation steps (dBc) over frequency
+distance bins measured from the victim channel edge. The equivalent ACS
+is the attenuation of an interferer with flat PSD over its whole band.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+
+def calculate_equivalent_acs_array(
+    ue_f_MHz: npt.ArrayLike,
+    ue_bw_MHz: npt.ArrayLike,
+    other_f_MHz: npt.ArrayLike,
+    other_bw_MHz: npt.ArrayLike,
+    mask_lims: npt.ArrayLike,
+    mask_vals_dBc: npt.ArrayLike,
+    lims_relative_to_bw: bool = True,
+) -> np.ndarray:
+    """
+    Returns the equivalent ACS [dB] for every victim/interferer combination.
+
+    Frequencies and bandwidths are broadcast against each other, so whole
+    grids may be evaluated at once, e.g. ue_f_MHz[:, None] and
+    other_bw_MHz[None, :].
+
+    mask_lims: increasing bin edges of the mask, as distance from the victim
+        channel edge. Must have one more element than mask_vals_dBc.
+        The last edge is usually np.inf.
+    mask_vals_dBc: attenuation of each bin.
+    lims_relative_to_bw: if True, mask_lims are multiples of ue_bw_MHz,
+        otherwise they are in MHz.
+
+    Combinations in which the channels are not adjacent (i.e. overlap)
+    are set to NaN.
+    """
+    ue_f_MHz, ue_bw_MHz, other_f_MHz, other_bw_MHz = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (ue_f_MHz, ue_bw_MHz, other_f_MHz, other_bw_MHz))
+    )
+    mask_lims = np.asarray(mask_lims, dtype=float)
+    mask_vals_dBc = np.asarray(mask_vals_dBc, dtype=float)
+
+    if mask_lims.ndim != 1 or len(mask_lims) != len(mask_vals_dBc) + 1:
+        raise ValueError(
+            "mask_lims should be 1d and have one more element than mask_vals_dBc"
+        )
+    if np.any(np.diff(mask_lims) < 0):
+        raise ValueError("mask_lims should be increasing")
+
+    ue_lim_s = ue_f_MHz - ue_bw_MHz / 2
+    ue_lim_e = ue_f_MHz + ue_bw_MHz / 2
+    other_lim_s = other_f_MHz - other_bw_MHz / 2
+    other_lim_e = other_f_MHz + other_bw_MHz / 2
+
+    is_above = other_lim_s >= ue_lim_e
+    is_below = other_lim_e <= ue_lim_s
+
+    # distance from the victim channel edge to the interferer band
+    df_s = np.where(is_above, other_lim_s - ue_lim_e, ue_lim_s - other_lim_e)
+    df_e = np.where(is_above, other_lim_e - ue_lim_e, ue_lim_s - other_lim_s)
+
+    if lims_relative_to_bw:
+        lims = mask_lims * ue_bw_MHz[..., np.newaxis]
+    else:
+        lims = np.broadcast_to(mask_lims, ue_bw_MHz.shape + mask_lims.shape)
+
+    win_s = np.maximum(lims[..., :-1], df_s[..., np.newaxis])
+    win_e = np.minimum(lims[..., 1:], df_e[..., np.newaxis])
+    mask_bins_overlap_MHz = np.maximum(win_e - win_s, 0)
+
+    with np.errstate(divide="ignore"):
+        equivalent_attenuation = -10 * np.log10(
+            np.sum(mask_bins_overlap_MHz * 10 ** (-0.1 * mask_vals_dBc), axis=-1)
+            / other_bw_MHz
+        )
+
+    return np.where(is_above | is_below, equivalent_attenuation, np.nan)
@@ -0,0 +1,217 @@
+"""
+Adaptive number of snapshots, stopping once the protection criteria are settled.
+
+Instead of a fixed num_snapshots, a scenario is run in batches of
+batch_snapshots, each a SHARC simulation with its own seed (see
+snapshot_shards.shard_seeds). After each batch, a confidence interval of
+the result value at each criterion probability is computed from the
+samples gathered so far. With n samples, the number of samples above the
+value x_q such that P(X > x_q) = q is Binomial(n, q), so the interval is
+given by two order statistics and needs no assumption on the distribution.
+
+A criterion (threshold_dB, q) is settled when the interval is entirely
+below the threshold (pass), entirely above it (fail), or narrower than
+resolution_dB. Batches stop when every criterion is settled or
+max_snapshots is reached, and are then merged into a single result dir
+(see snapshot_shards.merge_shard_dirs).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from campaigns.utils.ccdf_histogram import CcdfHistogram
+from campaigns.utils.dump_parameters import dump_parameter_dict, load_parameter_file
+from campaigns.utils.resumable_runner import run_simulation
+from campaigns.utils.results_loader import load_vector
+from campaigns.utils.scenario_manifest import output_dir_prefix
+from campaigns.utils.snapshot_shards import merge_shard_dirs, shard_seeds
+
+# defaults used by the campaign runners
+ADAPTIVE_CONFIDENCE = 0.95
+ADAPTIVE_RESOLUTION_DB = 0.1
+
+
+def _binomial_cdf(n: int, p: float) -> np.ndarray:
+    """P(B <= k) for k = 0..n, B ~ Binomial(n, p), computed in log space"""
+    k = np.arange(n + 1)
+    log_ratio = np.log(n - k[:-1]) - np.log(k[:-1] + 1) + math.log(p) - math.log1p(-p)
+    log_pmf = np.concatenate(([n * math.log1p(-p)], n * math.log1p(-p) + np.cumsum(log_ratio)))
+    pmf = np.exp(log_pmf - log_pmf.max())
+    return np.cumsum(pmf) / pmf.sum()
+
+
+def quantile_ci_at_ccdf(
+    hist: CcdfHistogram,
+    q: float,
+    confidence: float = ADAPTIVE_CONFIDENCE,
+) -> tuple[float, float]:
+    """
+    Confidence interval of the value x such that P(X > x) = q.
+    Bounds are -inf/inf when there are too few samples to bound it.
+    """
+    n = hist.n
+    if n == 0:
+        return -np.inf, np.inf
+    alpha = 1.0 - confidence
+    # number of samples above the true value
+    cdf = _binomial_cdf(n, q)
+
+    # at least j_low samples are above the true value with prob 1 - alpha/2,
+    # so it is at least the j_low-th largest sample
+    j_low = int(np.searchsorted(cdf, alpha / 2, side="right"))
+    # at most j_high - 1 are above it with prob 1 - alpha/2
+    j_high = int(np.searchsorted(cdf, 1.0 - alpha / 2)) + 1
+
+    # j-th largest sample is the (n - j)-th smallest, 0 based
+    low = hist.value_at_rank(n - j_high)
+    high = hist.value_at_rank(n - j_low) if j_low > 0 else np.inf
+    return low, high
+
+
+@dataclass
+class CriterionStatus:
+    threshold_dB: float
+    prob: float
+    low: float
+    high: float
+    resolution_dB: float
+
+    @property
+    def verdict(self) -> str:
+        """'pass', 'fail', 'resolved' or 'open' (not settled yet)"""
+        if self.high < self.threshold_dB:
+            return "pass"
+        if self.low > self.threshold_dB:
+            return "fail"
+        if self.high - self.low <= self.resolution_dB:
+            return "resolved"
+        return "open"
+
+
+def criteria_status(
+    hist: CcdfHistogram,
+    criteria: list[tuple[float, float]],
+    confidence: float = ADAPTIVE_CONFIDENCE,
+    resolution_dB: float = ADAPTIVE_RESOLUTION_DB,
+) -> list[CriterionStatus]:
+    """criteria: (threshold_dB, CCDF probability) pairs"""
+    return [
+        CriterionStatus(thr, prob, *quantile_ci_at_ccdf(hist, prob, confidence), resolution_dB)
+        for thr, prob in criteria
+    ]
+
+
+def _output_dirs(output_root: Path, prefix: str) -> set[Path]:
+    """SHARC output dirs in output_root created for output_dir_prefix"""
+    if not output_root.is_dir():
+        return set()
+    return {
+        d for d in output_root.iterdir()
+        if d.is_dir() and output_dir_prefix(d.name) == prefix
+    }
+
+
+def run_scenario_adaptive(
+    param_file: Path,
+    output_root: Path,
+    criteria: list[tuple[float, float]],
+    batch_snapshots: int,
+    max_snapshots: int,
+    result_file: str = "system_inr.csv",
+    confidence: float = ADAPTIVE_CONFIDENCE,
+    resolution_dB: float = ADAPTIVE_RESOLUTION_DB,
+) -> Path:
+    """
+    Runs param_file in batches until criteria are settled for result_file,
+    or max_snapshots is reached. Batches write to 'output_shards' next to
+    output_root, and are removed once merged. Returns the merged result dir,
+    created in output_root.
+    """
+    params = load_parameter_file(param_file)
+    general = params["general"]
+    prefix = general["output_dir_prefix"]
+    batches_root = Path(output_root).parent / "output_shards"
+
+    n_batches_max = math.ceil(max_snapshots / batch_snapshots)
+    seeds = shard_seeds(general["seed"], n_batches_max)
+    hist = CcdfHistogram()
+    batch_dirs = []
+
+    with tempfile.TemporaryDirectory(prefix="adaptive-") as tmp_dir:
+        for i in range(n_batches_max):
+            batch_prefix = f"{prefix}_batch{i}"
+            batch_params = dict(params)
+            batch_params["general"] = {
+                **general,
+                "seed": seeds[i],
+                "num_snapshots": min(batch_snapshots, max_snapshots - i * batch_snapshots),
+                "output_dir": (Path(general["output_dir"]).parent / "output_shards").as_posix() + "/",
+                "output_dir_prefix": batch_prefix,
+            }
+            batch_file = Path(tmp_dir) / f"{Path(param_file).stem}_batch{i}.yaml"
+            dump_parameter_dict(batch_file, batch_params)
+
+            # dirs left by earlier runs of the same scenario are not this batch's
+            existing = _output_dirs(batches_root, batch_prefix)
+            run_simulation(batch_file)
+
+            created = _output_dirs(batches_root, batch_prefix) - existing
+            if not created:
+                raise FileNotFoundError(
+                    f"Output of batch {i} of '{Path(param_file).name}' not found in '{batches_root}'"
+                )
+            batch_dir = max(created, key=lambda d: d.stat().st_mtime)
+            batch_dirs.append(batch_dir)
+            hist.add(load_vector(batch_dir / result_file))
+
+            statuses = criteria_status(hist, criteria, confidence, resolution_dB)
+            summary = ", ".join(
+                f"{s.prob:g}: [{s.low:.2f}, {s.high:.2f}] dB {s.verdict}" for s in statuses
+            )
+            print(f"[INFO] '{prefix}' after {hist.n} samples: {summary}")
+            if all(s.verdict != "open" for s in statuses):
+                break
+        else:
+            print(f"[WARN] '{prefix}' reached {max_snapshots} snapshots without settling every criterion")
+
+    merged_dir = merge_shard_dirs(batch_dirs, Path(output_root), prefix, general["seed"])
+    # everything in the batches is in merged_dir now
+    for batch_dir in batch_dirs:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+    return merged_dir
+
+
+def run_campaign_adaptive(
+    inputs_dir: Path,
+    output_root: Path,
+    max_workers: int | None = None,
+    **kwargs,
+) -> list[Path]:
+    """
+    Runs every parameter file in inputs_dir with run_scenario_adaptive,
+    scenarios in parallel. kwargs are passed to it.
+    Returns the parameter files that failed.
+    """
+    param_files = sorted(Path(inputs_dir).glob("*.yaml"))
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    def run_one(param_file: Path) -> Path | None:
+        try:
+            run_scenario_adaptive(param_file, output_root, **kwargs)
+        except Exception as e:
+            print(f"[ERROR] Adaptive run of '{param_file.name}' failed: {type(e).__name__}: {e}")
+            return param_file
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        failed = list(executor.map(run_one, param_files))
+
+    return [f for f in failed if f is not None]
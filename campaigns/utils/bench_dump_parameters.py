@@ -0,0 +1,63 @@
+"""
+Micro-benchmark of parameter file emission and loading.
+
+For every parameter file of an inputs dir, compares yaml.dump with the
+libyaml emitter dump_parameter_dict uses, and reading the yaml back with
+reading its json/msgpack sidecar. test_dump_parameters checks that they
+all load back the same Parameters.
+
+    python -m campaigns.utils.bench_dump_parameters [inputs dir]
+"""
+
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+import yaml
+
+from campaigns.utils.dump_parameters import (
+    SIDECAR_SUFFIXES, _read_parameter_file, dump_parameter_dict, load_parameter_file, msgpack,
+)
+
+DEFAULT_INPUTS_DIR = Path(__file__).parents[1] / "imt_to_mss" / "input"
+
+
+def _timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main(inputs_dir: Path = DEFAULT_INPUTS_DIR):
+    docs = [load_parameter_file(f) for f in sorted(Path(inputs_dir).glob("*.yaml"))]
+    if not docs:
+        print(f"[ERROR] No parameter files in '{inputs_dir}'")
+        return
+    formats = ["json"] + (["msgpack"] if msgpack is not None else [])
+
+    def pure_dump(file, doc):
+        with open(file, "w") as f:
+            yaml.dump(doc, f, sort_keys=False)
+
+    times = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        for i, doc in enumerate(docs):
+            file = tmp_dir / f"p{i}.yaml"
+            times.setdefault("dump yaml.dump", []).append(_timed(pure_dump, file, doc))
+            times.setdefault("dump libyaml", []).append(_timed(dump_parameter_dict, file, doc))
+            times.setdefault("load yaml", []).append(_timed(_read_parameter_file, file))
+
+            for fmt in formats:
+                dump_parameter_dict(file, doc, fmt)
+                times.setdefault(f"load {fmt}", []).append(_timed(_read_parameter_file, file))
+                file.with_suffix(SIDECAR_SUFFIXES[fmt]).unlink()
+
+    print(f"{len(docs)} parameter files, mean per file:")
+    for name, ts in times.items():
+        print(f"\t{name + ':':18} {sum(ts) / len(ts) * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*[Path(a) for a in sys.argv[1:]])
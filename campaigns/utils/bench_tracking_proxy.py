@@ -0,0 +1,152 @@
+"""
+Micro-benchmark of the TrackingProxy recorder.
+
+Compares the cost per assignment of the previous recorder (dotted path
+string rebuilt and walked from the root on every write), of the current
+one (path tuple and cached dict node per proxy), of the current one with
+a checkpoint open (every write journaled) and of a batched
+TrackingProxy.apply, on a parameter-like tree of plain objects.
+
+    python -m campaigns.utils.bench_tracking_proxy
+"""
+
+from types import SimpleNamespace
+import timeit
+
+from campaigns.utils.tracking_proxy import TrackingProxy
+
+N_SCENARIOS = 2000
+REPEAT = 20
+
+
+class _StringPathTrackingProxy:
+    """The recorder TrackingProxy used before, kept as the baseline"""
+
+    def __init__(self, obj, data=None, path=""):
+        self._obj = obj
+        self._path = path
+        self._data = data if data is not None else {}
+
+    def __setattr__(self, name, value):
+        if name in {"_obj", "_path", "_data"}:
+            super().__setattr__(name, value)
+            return
+        setattr(self._obj, name, value)
+        full_path = f"{self._path}.{name}" if self._path else name
+        self._update_data(full_path, value)
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if hasattr(attr, "__dict__") and not callable(attr):
+            proxy = _StringPathTrackingProxy(
+                attr,
+                data=self._data,
+                path=f"{self._path}.{name}" if self._path else name,
+            )
+            object.__setattr__(self, name, proxy)
+            return proxy
+        return attr
+
+    def _update_data(self, path, value):
+        parts = path.split(".")
+        d = self._data
+        for part in parts[:-1]:
+            d = d.setdefault(part, {})
+        d[parts[-1]] = value
+
+
+def _make_tree():
+    ns = SimpleNamespace
+    return ns(
+        general=ns(seed=0, imt_link="UPLINK", output_dir_prefix=""),
+        imt=ns(
+            bs=ns(load_probability=1.0, antenna=ns(array=ns(downtilt=0.0, n_rows=8))),
+            ue=ns(k=3, antenna=ns(array=ns(n_rows=4))),
+            topology=ns(macrocell=ns(intersite_distance=500)),
+        ),
+        single_earth_station=ns(
+            geometry=ns(location=ns(fixed=ns(x=0.0, y=0.0))),
+            param_p452=ns(percentage_p=0.2, clutter_type="one_end", clutter_loss=True),
+        ),
+    )
+
+
+def _assign_attributes(proxy, i):
+    proxy.general.seed = i
+    proxy.general.imt_link = "DOWNLINK"
+    proxy.general.output_dir_prefix = f"output_{i}"
+    proxy.imt.bs.load_probability = 0.5
+    proxy.imt.bs.antenna.array.downtilt = 10.0
+    proxy.imt.ue.k = 1
+    proxy.imt.topology.macrocell.intersite_distance = 600
+    proxy.single_earth_station.geometry.location.fixed.y = 1000.0 + i
+    proxy.single_earth_station.param_p452.percentage_p = 20
+    proxy.single_earth_station.param_p452.clutter_type = "both_ends"
+
+
+def _overrides(i):
+    return {
+        "general.seed": i,
+        "general.imt_link": "DOWNLINK",
+        "general.output_dir_prefix": f"output_{i}",
+        "imt.bs.load_probability": 0.5,
+        "imt.bs.antenna.array.downtilt": 10.0,
+        "imt.ue.k": 1,
+        "imt.topology.macrocell.intersite_distance": 600,
+        "single_earth_station.geometry.location.fixed.y": 1000.0 + i,
+        "single_earth_station.param_p452.percentage_p": 20,
+        "single_earth_station.param_p452.clutter_type": "both_ends",
+    }
+
+
+N_ASSIGNMENTS = len(_overrides(0))
+
+
+def _bench(fns: dict) -> dict[str, float]:
+    """
+    Best time per assignment of each fn, in ns. Runs are interleaved so
+    that load changes on the machine affect every fn alike.
+    """
+    best = dict.fromkeys(fns, float("inf"))
+    for _ in range(REPEAT):
+        for name, fn in fns.items():
+            best[name] = min(best[name], timeit.timeit(fn, number=1))
+    return {name: t / (N_SCENARIOS * N_ASSIGNMENTS) * 1e9 for name, t in best.items()}
+
+
+def main():
+    trees = [_make_tree() for _ in range(N_SCENARIOS)]
+
+    def string_paths():
+        for i, tree in enumerate(trees):
+            _assign_attributes(_StringPathTrackingProxy(tree), i)
+
+    def tuple_paths():
+        for i, tree in enumerate(trees):
+            _assign_attributes(TrackingProxy(tree), i)
+
+    def journaled():
+        for i, tree in enumerate(trees):
+            proxy = TrackingProxy(tree)
+            with proxy.branch():
+                _assign_attributes(proxy, i)
+
+    def batched():
+        for i, tree in enumerate(trees):
+            TrackingProxy(tree).apply(_overrides(i))
+
+    times = _bench({
+        "string paths (previous)": string_paths,
+        "tuple paths": tuple_paths,
+        "checkpoint open": journaled,
+        "apply(overrides)": batched,
+    })
+    baseline = times.pop("string paths (previous)")
+    print(f"{N_SCENARIOS} scenarios x {N_ASSIGNMENTS} nested assignments, per assignment:")
+    print(f"\tstring paths (previous): {baseline:8.0f} ns")
+    for name, t in times.items():
+        print(f"\t{name + ':':24} {t:8.0f} ns ({baseline / t:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Streaming, mergeable CCDF/quantile estimator for dB valued results.
+
+Samples are counted on a fixed grid of bin_dB wide bins (1e-3 dB by
+default), stored sparsely so only occupied bins take memory. Runs can be
+ingested one file (or chunk) at a time and histograms from different runs
+merged, so all samples never need to be held at once. Quantiles and CCDF
+points are exact up to one bin width, including at the distribution tails.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+
+class CcdfHistogram():
+    def __init__(self, bin_dB: float = 1e-3):
+        if bin_dB <= 0:
+            raise ValueError("bin_dB should be positive")
+        self.bin_dB = bin_dB
+        # sorted occupied bin indexes and their counts
+        self._bins = np.array([], dtype=np.int64)
+        self._counts = np.array([], dtype=np.int64)
+        self.n = 0
+
+    def add(self, x: npt.ArrayLike) -> "CcdfHistogram":
+        """Counts the finite values of x"""
+        x = np.asarray(x, dtype=float).ravel()
+        x = x[np.isfinite(x)]
+        if x.size == 0:
+            return self
+
+        bins, counts = np.unique(
+            np.floor(x / self.bin_dB).astype(np.int64),
+            return_counts=True,
+        )
+        self._merge(bins, counts)
+        return self
+
+    def merge(self, other: "CcdfHistogram") -> "CcdfHistogram":
+        """Adds other's counts to this histogram"""
+        if other.bin_dB != self.bin_dB:
+            raise ValueError("Can only merge histograms with the same bin_dB")
+        self._merge(other._bins, other._counts)
+        return self
+
+    def _merge(self, bins: np.ndarray, counts: np.ndarray) -> None:
+        if self._bins.size == 0:
+            self._bins, self._counts = bins.copy(), counts.astype(np.int64)
+        else:
+            all_bins, inverse = np.unique(
+                np.concatenate((self._bins, bins)), return_inverse=True
+            )
+            all_counts = np.zeros(all_bins.size, dtype=np.int64)
+            np.add.at(all_counts, inverse, np.concatenate((self._counts, counts)))
+            self._bins, self._counts = all_bins, all_counts
+        self.n = int(self._counts.sum())
+
+    def ccdf(self, floor: float = 0.0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (x, P(X > x)) at the lower edge of each occupied bin,
+        meant to be plotted with drawstyle="steps-post".
+        """
+        if self.n == 0:
+            return np.array([]), np.array([])
+        xs = self._bins * self.bin_dB
+        ccdf = 1.0 - np.cumsum(self._counts) / self.n
+        return xs, np.maximum(ccdf, floor)
+
+    def value_at_rank(self, k: int) -> float:
+        """
+        k-th smallest sample (0 based), located uniformly within its bin.
+        -inf/inf for ranks below/above the samples.
+        """
+        if k < 0:
+            return -np.inf
+        if k >= self.n:
+            return np.inf
+        cum = np.cumsum(self._counts)
+        b = int(np.searchsorted(cum, k, side="right"))
+        before = cum[b - 1] if b > 0 else 0
+        within = (k - before + 0.5) / self._counts[b]
+        return float((self._bins[b] + within) * self.bin_dB)
+
+    def quantile_at_ccdf(self, q: float) -> float:
+        """
+        Value x such that P(X > x) = q, i.e. the 1 - q quantile,
+        estimated as np.quantile would on the samples (up to one bin).
+        """
+        if self.n == 0:
+            return np.nan
+        # np.quantile interpolates linearly between the order statistics
+        # around this rank, which may lie in bins far apart in the tails
+        rank = (self.n - 1) * (1.0 - q)
+        k = int(np.floor(rank))
+        x_k = self.value_at_rank(k)
+        if rank == k:
+            return x_k
+        x_k1 = self.value_at_rank(k + 1)
+        return x_k + (rank - k) * (x_k1 - x_k)
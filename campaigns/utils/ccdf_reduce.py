@@ -0,0 +1,98 @@
+"""
+Reduction of CCDF/CDF curves to the points that are visible on a plot.
+
+A curve with one point per sample is reduced by keeping:
+    - every point whose probability is at or below tail_prob, so the
+      tail, where protection criteria are checked, is exact
+    - elsewhere, only the first point of each log-spaced probability
+      step of ratio (1 + max_rel_error)
+    - the first and last points
+
+Drawn with drawstyle/line_shape "steps-post", the reduced curve is
+within max_rel_error (relative, in probability) of the full one.
+"""
+
+import numpy as np
+import numpy.typing as npt
+
+# defaults used by the campaign plot scripts
+CCDF_TAIL_PROB = 1e-3
+CCDF_MAX_REL_ERROR = 0.01
+
+
+def reduce_ccdf_indexes(
+    prob: npt.ArrayLike,
+    tail_prob: float = CCDF_TAIL_PROB,
+    max_rel_error: float = CCDF_MAX_REL_ERROR,
+) -> np.ndarray:
+    """
+    Returns the sorted indexes of the points to keep from a monotonic
+    probability curve (CCDF or CDF values, in [0, 1]).
+    """
+    prob = np.asarray(prob, dtype=float)
+    n = prob.size
+    if n <= 2:
+        return np.arange(n)
+    if max_rel_error <= 0:
+        raise ValueError("max_rel_error should be positive")
+
+    with np.errstate(divide="ignore"):
+        step = np.floor(np.log(prob) / np.log1p(max_rel_error))
+
+    keep = prob <= tail_prob
+    keep[0] = keep[-1] = True
+    # first point of every probability step
+    keep[1:] |= step[1:] != step[:-1]
+
+    return np.flatnonzero(keep)
+
+
+def reduce_ccdf(
+    x: npt.ArrayLike,
+    prob: npt.ArrayLike,
+    tail_prob: float = CCDF_TAIL_PROB,
+    max_rel_error: float | None = CCDF_MAX_REL_ERROR,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (x, prob) reduced as described in the module docstring.
+    max_rel_error=None keeps every point.
+    """
+    x = np.asarray(x)
+    prob = np.asarray(prob)
+    if max_rel_error is None:
+        return x, prob
+    idx = reduce_ccdf_indexes(prob, tail_prob, max_rel_error)
+    return x[idx], prob[idx]
+
+
+def reduce_plot_traces(
+    plots: list,
+    tail_prob: float = CCDF_TAIL_PROB,
+    max_rel_error: float | None = CCDF_MAX_REL_ERROR,
+) -> list:
+    """
+    Reduces, in place, every x/y trace of the plotly figures returned by
+    PostProcessor.generate_ccdf_plots_from_results (or the cdf one).
+    Returns plots, to allow chaining.
+    """
+    if max_rel_error is None:
+        return plots
+
+    n_before = n_after = 0
+    for fig in plots:
+        for trace in fig.data:
+            if trace.x is None or trace.y is None:
+                continue
+            x = np.asarray(trace.x)
+            y = np.asarray(trace.y, dtype=float)
+            if x.shape != y.shape:
+                continue
+            idx = reduce_ccdf_indexes(y, tail_prob, max_rel_error)
+            n_before += y.size
+            n_after += idx.size
+            trace.x = x[idx]
+            trace.y = y[idx]
+
+    if n_before:
+        print(f"[INFO] Plot traces reduced from {n_before} to {n_after} points")
+    return plots
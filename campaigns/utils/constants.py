@@ -4,8 +4,11 @@ import sharc
 ROOT_DIR = Path(__file__).parents[2].absolute()
 ROOT_PARAMS_DIR = ROOT_DIR / "from-docs"
 SHARC_SIM_ROOT_DIR = Path(sharc.__file__).parents[0]
+# local, git ignored, directory for caches (e.g. parameter id index)
+CACHE_DIR = ROOT_DIR / ".cache"
 
 if __name__ == "__main__":
     print("ROOT_DIR", ROOT_DIR)
     print("ROOT_PARAMS_DIR", ROOT_PARAMS_DIR)
     print("SHARC_SIM_ROOT_DIR", SHARC_SIM_ROOT_DIR)
+    print("CACHE_DIR", CACHE_DIR)
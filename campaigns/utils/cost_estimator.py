@@ -0,0 +1,146 @@
+"""
+Wall time estimates for SHARC simulations, used to schedule them.
+
+A scenario's cost, in arbitrary units, is estimated from its parameter
+file as
+    num_snapshots * (number of BSs + number of UEs) * propagation weight
+and converted to seconds with a seconds per unit factor calibrated on the
+timings recorded in the run ledger (see resumable_runner). A scenario whose
+exact parameter file already ran uses its recorded time instead.
+
+Scenarios are then run longest first, which keeps the long ones from
+starting last while the other workers sit idle.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+import heapq
+
+import numpy as np
+
+from campaigns.utils.dump_parameters import load_parameter_file
+
+# relative cost of a link for each propagation model of the other system
+CHANNEL_MODEL_WEIGHTS = {
+    "FSPL": 1.0,
+    "SatelliteSimple": 1.5,
+    "P619": 2.0,
+    "P1411": 2.0,
+    "HDFSS": 2.0,
+    "P452": 8.0,
+}
+DEFAULT_CHANNEL_MODEL_WEIGHT = 2.0
+# base stations per cluster of the hexagonal topologies (19 sites, 3 sectors)
+BS_PER_CLUSTER = 57
+# used until there are recorded timings to calibrate from
+DEFAULT_SECONDS_PER_UNIT = 1e-5
+
+
+@dataclass
+class CostEstimate:
+    param_file: Path
+    units: float
+    seconds: float
+    # True when seconds comes from a previous run of the same file
+    from_history: bool = False
+
+
+def _num_bs(imt: dict) -> int:
+    topology = imt.get("topology", {})
+    topology_type = topology.get("type", "")
+    if topology_type in ("MACROCELL", "HOTSPOT"):
+        sub = topology.get(topology_type.lower(), {})
+        return BS_PER_CLUSTER * sub.get("num_clusters", 1)
+    if topology_type == "MSS_DC":
+        return topology.get("mss_dc", {}).get("num_beams", 19)
+    return 1
+
+
+def cost_units(params: dict) -> float:
+    """Cost of a parameter file contents, in arbitrary units"""
+    general = params.get("general", {})
+    imt = params.get("imt", {})
+    num_snapshots = general.get("num_snapshots", 1)
+
+    num_bs = _num_bs(imt)
+    ue = imt.get("ue", {})
+    num_ue = num_bs * ue.get("k", 1) * ue.get("k_m", 1)
+
+    system = params.get(str(general.get("system", "")).lower(), {})
+    weight = CHANNEL_MODEL_WEIGHTS.get(
+        system.get("channel_model"), DEFAULT_CHANNEL_MODEL_WEIGHT
+    )
+
+    return float(num_snapshots * (num_bs + num_ue) * weight)
+
+
+def calibrate_seconds_per_unit(ledger_runs: dict[str, dict]) -> float | None:
+    """
+    Median seconds per cost unit over the ledger runs with a recorded
+    duration. None if there are none.
+    """
+    ratios = [
+        run["duration_s"] / run["cost_units"]
+        for run in ledger_runs.values()
+        if run.get("duration_s") and run.get("cost_units")
+    ]
+    if not ratios:
+        return None
+    return float(np.median(ratios))
+
+
+def estimate_costs(
+    param_files: list[tuple[Path, str]],
+    ledger_runs: dict[str, dict],
+) -> list[CostEstimate]:
+    """
+    param_files: (parameter file, hash) pairs
+    ledger_runs: RunLedger.runs
+    """
+    seconds_per_unit = calibrate_seconds_per_unit(ledger_runs)
+    if seconds_per_unit is None:
+        seconds_per_unit = DEFAULT_SECONDS_PER_UNIT
+
+    estimates = []
+    for param_file, param_hash in param_files:
+        units = cost_units(load_parameter_file(param_file))
+        previous = ledger_runs.get(Path(param_file).name)
+        if previous and previous["hash"] == param_hash and previous.get("duration_s"):
+            estimates.append(CostEstimate(param_file, units, previous["duration_s"], True))
+        else:
+            estimates.append(CostEstimate(param_file, units, units * seconds_per_unit))
+    return estimates
+
+
+def longest_first(estimates: list[CostEstimate]) -> list[CostEstimate]:
+    return sorted(estimates, key=lambda e: e.seconds, reverse=True)
+
+
+def predict_makespan(estimates: list[CostEstimate], max_workers: int) -> float:
+    """
+    Wall time of running estimates, in order, on max_workers workers that
+    take the next scenario as soon as they are free
+    """
+    workers = [0.0] * max(1, max_workers)
+    for est in estimates:
+        heapq.heappush(workers, heapq.heappop(workers) + est.seconds)
+    return max(workers)
+
+
+def print_timing_report(
+    estimates: list[CostEstimate],
+    durations: dict[Path, float],
+    predicted_wall_s: float,
+    actual_wall_s: float,
+) -> None:
+    """durations: actual seconds of each scenario that finished"""
+    print("[INFO] Predicted vs actual time per scenario:")
+    for est in estimates:
+        actual = durations.get(est.param_file)
+        actual_str = "failed" if actual is None else f"{actual:10.1f}s"
+        source = "history" if est.from_history else "model"
+        print(f"    {est.seconds:10.1f}s ({source:7}) {actual_str}  {est.param_file.name}")
+    print(
+        f"[INFO] Campaign wall time: predicted {predicted_wall_s:.1f}s, "
+        f"actual {actual_wall_s:.1f}s"
+    )
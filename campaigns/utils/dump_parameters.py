@@ -1,8 +1,105 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+import copy
+import datetime
+import json
+import os
+
 import yaml
 from sharc.parameters.parameters import Parameters
+from campaigns.utils.parameters_factory import ParameterFileLoader, parameters_from_dict
 from campaigns.utils.tracking_proxy import TrackingProxy
 
-def dump_parameters(filepath, params: Parameters | TrackingProxy):
+# Diff documents only hold what differs from a base document shared by
+# every scenario of a campaign. Their first key points to the base,
+# relative to the diff document. The base is kept in a subdir so that
+# globbing '*.yaml' in the inputs dir only lists scenarios.
+BASE_DOCUMENT_KEY = "base_document"
+BASE_DOCUMENT_PATH = "base/base.yaml"
+
+# Sidecars are machine readable copies of a parameter file written next to
+# it (same name, another suffix), which the loaders below read instead of
+# the yaml when they are at least as recent. SHARC still reads the yaml.
+SIDECAR_SUFFIXES = {"json": ".json", "msgpack": ".msgpack"}
+# values json/msgpack have no type for are encoded as {key: value} in sidecars
+_TUPLE_KEY = "__tuple__"
+_DATETIME_KEY = "__datetime__"
+_DATE_KEY = "__date__"
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# libyaml emitter when available. Same output as yaml.dump, including
+# the !!python/tuple tags (e.g. vertical_beamsteering_range)
+_Dumper = getattr(yaml, "CDumper", yaml.Dumper)
+
+
+def _encode_sidecar_values(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        if not all(isinstance(k, str) for k in obj):
+            raise ValueError("only string keys can be written to a sidecar")
+        return {k: _encode_sidecar_values(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return {_TUPLE_KEY: [_encode_sidecar_values(v) for v in obj]}
+    if isinstance(obj, list):
+        return [_encode_sidecar_values(v) for v in obj]
+    # yaml reads timestamps, e.g. in metadata, as date/datetime
+    if isinstance(obj, datetime.datetime):
+        return {_DATETIME_KEY: obj.isoformat()}
+    if isinstance(obj, datetime.date):
+        return {_DATE_KEY: obj.isoformat()}
+    return obj
+
+
+def _decode_sidecar_value(obj: dict) -> Any:
+    if len(obj) == 1:
+        if _TUPLE_KEY in obj:
+            return tuple(obj[_TUPLE_KEY])
+        if _DATETIME_KEY in obj:
+            return datetime.datetime.fromisoformat(obj[_DATETIME_KEY])
+        if _DATE_KEY in obj:
+            return datetime.date.fromisoformat(obj[_DATE_KEY])
+    return obj
+
+
+def _write_sidecar(filepath, data: dict, sidecar: str) -> None:
+    if sidecar not in SIDECAR_SUFFIXES:
+        raise ValueError(
+            f"Unknown sidecar format '{sidecar}', expected one of {list(SIDECAR_SUFFIXES)}"
+        )
+    if sidecar == "msgpack" and msgpack is None:
+        print(f"[WARN] msgpack is not installed, no sidecar written for '{filepath}'")
+        return
+    try:
+        encoded = _encode_sidecar_values(data)
+        if sidecar == "json":
+            content = json.dumps(encoded).encode("utf-8")
+        else:
+            content = msgpack.packb(encoded)
+    except (TypeError, ValueError) as e:
+        print(f"[WARN] No sidecar written for '{filepath}': {e}")
+        return
+
+    with open(Path(filepath).with_suffix(SIDECAR_SUFFIXES[sidecar]), "wb") as f:
+        f.write(content)
+
+
+def dump_parameter_dict(filepath, data: dict, sidecar: str | None = None) -> None:
+    """
+    Writes a parameters dict as yaml in a single write, plus a sidecar
+    ('json' or 'msgpack') if requested.
+    """
+    text = yaml.dump(data, Dumper=_Dumper, sort_keys=False)
+    with open(filepath, "w") as f:
+        f.write(text)
+    if sidecar is not None:
+        _write_sidecar(filepath, data, sidecar)
+
+
+def dump_parameters(filepath, params: Parameters | TrackingProxy, sidecar: str | None = None):
     """
     Dumps proxied parameters data to a file.
 
@@ -13,5 +110,167 @@ def dump_parameters(filepath, params: Parameters | TrackingProxy):
         raise ValueError(
             "You must pass a proxied object to the dump_parameters method"
         )
-    with open(filepath, "w") as f:
-        yaml.dump(params.get_data_dict(), f, sort_keys=False)
+    dump_parameter_dict(filepath, params.get_data_dict(), sidecar)
+
+
+def _same_value(a: Any, b: Any) -> bool:
+    # 1 == 1.0 == True, but they are not the same parameter value
+    return type(a) is type(b) and a == b
+
+
+def common_base(docs: list[dict]) -> dict:
+    """Nested keys having the same value in every doc"""
+    base = {}
+    first, rest = docs[0], docs[1:]
+    for key, value in first.items():
+        others = [doc.get(key) for doc in rest if key in doc]
+        if len(others) != len(rest):
+            continue
+        if isinstance(value, dict):
+            if all(isinstance(o, dict) for o in others):
+                sub = common_base([value, *others])
+                if sub:
+                    base[key] = sub
+        elif all(_same_value(value, o) for o in others):
+            base[key] = value
+    return base
+
+
+def diff_from_base(doc: dict, base: dict) -> dict:
+    """
+    Nested keys of doc missing from or different in base.
+    base must only have keys doc also has, e.g. from common_base.
+    """
+    diff = {}
+    for key, value in doc.items():
+        if key not in base:
+            diff[key] = value
+        elif isinstance(value, dict) and isinstance(base[key], dict):
+            sub = diff_from_base(value, base[key])
+            if sub:
+                diff[key] = sub
+        elif not _same_value(value, base[key]):
+            diff[key] = value
+    return diff
+
+
+def merge_onto_base(base: dict, diff: dict) -> dict:
+    """Copy of base with the nested keys of diff set on it"""
+    merged = copy.deepcopy(base)
+    for key, value in diff.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_onto_base(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def dump_diff_parameters(
+    diff_dir: Path,
+    docs: dict[str, dict],
+    sidecar: str | None = None,
+) -> list[Path]:
+    """
+    Writes the base document shared by docs (file name -> parameters dict)
+    and one diff document per file name in diff_dir.
+    Returns the diff documents, in docs order.
+    """
+    diff_dir = Path(diff_dir)
+    base = common_base(list(docs.values())) if docs else {}
+
+    base_file = diff_dir / BASE_DOCUMENT_PATH
+    base_file.parent.mkdir(parents=True, exist_ok=True)
+    dump_parameter_dict(base_file, base, sidecar)
+
+    files = []
+    for name, doc in docs.items():
+        file = diff_dir / name
+        dump_parameter_dict(
+            file,
+            {BASE_DOCUMENT_KEY: BASE_DOCUMENT_PATH, **diff_from_base(doc, base)},
+            sidecar,
+        )
+        files.append(file)
+    return files
+
+
+def base_document_file(filepath) -> Path | None:
+    """
+    Base document of a diff document, None for complete parameter files.
+    Only the first line is read, where dump_diff_parameters writes the base.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            key, _, value = line.partition(":")
+            if key != BASE_DOCUMENT_KEY:
+                return None
+            return Path(filepath).parent / value.strip()
+    return None
+
+
+def _read_sidecar(filepath) -> dict | None:
+    """Sidecar of filepath, if there is one written after it"""
+    filepath = Path(filepath)
+    yaml_mtime = os.stat(filepath).st_mtime_ns
+    for sidecar, suffix in SIDECAR_SUFFIXES.items():
+        sidecar_file = filepath.with_suffix(suffix)
+        try:
+            if os.stat(sidecar_file).st_mtime_ns < yaml_mtime:
+                continue
+        except OSError:
+            continue
+        if sidecar == "json":
+            with open(sidecar_file, "r", encoding="utf-8") as f:
+                return json.load(f, object_hook=_decode_sidecar_value)
+        if msgpack is not None:
+            with open(sidecar_file, "rb") as f:
+                return msgpack.unpackb(f.read(), object_hook=_decode_sidecar_value)
+    return None
+
+
+def _read_parameter_file(filepath) -> dict:
+    data = _read_sidecar(filepath)
+    if data is not None:
+        return data
+    with open(filepath, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=ParameterFileLoader)
+
+
+@lru_cache(maxsize=8)
+def _read_base_document(filepath: str, stamp: tuple) -> dict:
+    # stamp (mtime, size) invalidates the cached base when it is rewritten
+    return _read_parameter_file(filepath)
+
+
+def load_parameter_file(filepath) -> dict:
+    """
+    Reads back a file written by dump_parameters (or a diff document
+    written by dump_diff_parameters, merged onto its base) as a plain dict,
+    without building Parameters. Its sidecar is read instead if it is
+    up to date.
+    """
+    data = _read_parameter_file(filepath)
+    if not isinstance(data, dict) or BASE_DOCUMENT_KEY not in data:
+        return data
+
+    base_file = Path(filepath).parent / data.pop(BASE_DOCUMENT_KEY)
+    st = os.stat(base_file)
+    base = _read_base_document(str(base_file.resolve()), (st.st_mtime_ns, st.st_size))
+    return merge_onto_base(base, data)
+
+
+def load_parameters(filepath) -> Parameters:
+    """Builds Parameters from a parameter file or diff document"""
+    return parameters_from_dict(load_parameter_file(filepath))
+
+
+def materialize_parameter_file(filepath, out_file) -> Path:
+    """
+    Writes the complete parameter file of a diff document to out_file,
+    e.g. just before handing it to SHARC
+    """
+    dump_parameter_dict(out_file, load_parameter_file(filepath))
+    return Path(out_file)
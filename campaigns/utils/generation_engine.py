@@ -0,0 +1,206 @@
+"""
+Shared engine to emit campaign scenario files, optionally over a process pool.
+
+Campaigns describe each scenario with a ScenarioSpec and provide a
+module level build function (so it can be pickled) that returns the
+proxied parameters for a spec. The engine builds and dumps every spec,
+keeping file names and reporting order deterministic regardless of
+which worker handled each scenario.
+
+With a diff_dir, workers send the recorded parameters back instead of
+dumping them, and only a base document shared by every scenario plus one
+small diff document per scenario are written (see dump_diff_parameters).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Hashable
+import math
+import os
+import time
+
+from campaigns.utils.dump_parameters import dump_diff_parameters, dump_parameters
+from campaigns.utils.scenario_manifest import write_scenario_manifest
+from campaigns.utils.tracking_proxy import TrackingProxy
+
+
+@dataclass
+class ScenarioSpec:
+    """
+    key: unique scenario name, usually the campaign 'specific' pattern
+    parameter_file: where the scenario parameters are written to
+    values: sweep values the build function needs for this scenario
+    group: scenarios sharing a group are kept together on the same worker,
+        so that an expensive base scenario can be cached per process
+    overrides: dotted parameter paths set on top of what the build function
+        returns, e.g. by snapshot_shards.shard_specs
+    """
+    key: str
+    parameter_file: Path
+    values: dict[str, Any] = field(default_factory=dict)
+    group: Hashable = None
+    overrides: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class WorkerStats:
+    pid: int
+    n_scenarios: int = 0
+    busy_s: float = 0.0
+
+
+def _emit_chunk(
+    build_fn: Callable[[ScenarioSpec], TrackingProxy],
+    specs: list[ScenarioSpec],
+    return_data: bool = False,
+    sidecar: str | None = None,
+) -> tuple[int, float, list[str | None], list[dict | None]]:
+    """
+    Runs on the worker. Returns (pid, elapsed seconds, errors, data), with
+    one error message (or None) per spec. If return_data, nothing is dumped
+    and data has the recorded parameters of each spec instead.
+    """
+    start = time.perf_counter()
+    errors = []
+    data = []
+    for spec in specs:
+        try:
+            params = build_fn(spec)
+            if spec.overrides:
+                params = params.variant(spec.overrides)
+            if return_data:
+                data.append(params.get_data_dict())
+            else:
+                dump_parameters(spec.parameter_file, params, sidecar)
+                data.append(None)
+            errors.append(None)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            data.append(None)
+
+    return os.getpid(), time.perf_counter() - start, errors, data
+
+
+def _make_chunks(
+    specs: list[ScenarioSpec],
+    chunk_size: int,
+) -> list[list[ScenarioSpec]]:
+    """
+    Splits specs into chunks of consecutive specs of the same group,
+    each at most chunk_size long
+    """
+    chunks = []
+    for spec in specs:
+        if (
+            chunks
+            and chunks[-1][-1].group == spec.group
+            and len(chunks[-1]) < chunk_size
+        ):
+            chunks[-1].append(spec)
+        else:
+            chunks.append([spec])
+    return chunks
+
+
+def emit_scenarios(
+    specs: list[ScenarioSpec],
+    build_fn: Callable[[ScenarioSpec], TrackingProxy],
+    max_workers: int | None = None,
+    chunk_size: int | None = None,
+    strict: bool = True,
+    manifest_file: Path | None = None,
+    diff_dir: Path | None = None,
+    sidecar: str | None = None,
+) -> list[Path]:
+    """
+    Builds and dumps every spec, returning the generated parameter files
+    in spec order.
+
+    max_workers: number of processes. None uses all cores, and 1 runs
+        everything in the current process without a pool.
+    chunk_size: max number of specs sent to a worker at once.
+        Defaults to an even split of the specs between workers.
+    strict: if True, raises after emitting everything if any spec failed.
+        Otherwise failures are only reported.
+    manifest_file: if set, a scenario manifest of the generated specs is
+        written there (see scenario_manifest.py).
+    diff_dir: if set, diff documents named as each parameter_file and their
+        base document are written there instead, and those are returned.
+    sidecar: 'json' or 'msgpack' to also write a sidecar of each file,
+        which load_parameter_file reads faster (see dump_parameters.py).
+    """
+    keys = [spec.key for spec in specs]
+    if len(set(keys)) != len(keys):
+        raise ValueError("Scenario keys must be unique")
+    files = [spec.parameter_file for spec in specs]
+    if len(set(files)) != len(files):
+        raise ValueError("Scenario parameter files must be unique")
+    if diff_dir is not None and len({Path(f).name for f in files}) != len(files):
+        raise ValueError("Scenario parameter file names must be unique")
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(specs) or 1))
+
+    if chunk_size is None:
+        # large groups are split so that every worker gets some work,
+        # small ones are kept whole so their base is only built once
+        chunk_size = max(1, math.ceil(len(specs) / max_workers))
+    chunks = _make_chunks(specs, chunk_size)
+
+    start = time.perf_counter()
+    if max_workers == 1:
+        results = [_emit_chunk(build_fn, chunk, diff_dir is not None, sidecar) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_emit_chunk, build_fn, chunk, diff_dir is not None, sidecar)
+                for chunk in chunks
+            ]
+            # collected in submission order to keep reports deterministic
+            results = [future.result() for future in futures]
+    wall_s = time.perf_counter() - start
+
+    stats: dict[int, WorkerStats] = {}
+    generated = []
+    generated_specs = []
+    generated_data = {}
+    failed = []
+    for chunk, (pid, elapsed, errors, data) in zip(chunks, results):
+        worker = stats.setdefault(pid, WorkerStats(pid))
+        worker.n_scenarios += len(chunk)
+        worker.busy_s += elapsed
+        for spec, err, doc in zip(chunk, errors, data):
+            if err is None:
+                generated.append(spec.parameter_file)
+                generated_specs.append(spec)
+                generated_data[Path(spec.parameter_file).name] = doc
+            else:
+                failed.append((spec, err))
+                print(f"[ERROR] Failed to generate '{spec.parameter_file}': {err}")
+
+    if diff_dir is not None:
+        generated = dump_diff_parameters(diff_dir, generated_data, sidecar)
+
+    print(
+        f"[INFO] Generated {len(generated)}/{len(specs)} scenarios "
+        f"in {wall_s:.2f}s using {max_workers} worker(s)"
+    )
+    for worker in sorted(stats.values(), key=lambda w: w.pid):
+        rate = worker.n_scenarios / worker.busy_s if worker.busy_s > 0 else math.inf
+        print(
+            f"\tworker {worker.pid}: {worker.n_scenarios} scenarios, "
+            f"{worker.busy_s:.2f}s busy, {rate:.1f} scenarios/s"
+        )
+
+    if manifest_file is not None:
+        write_scenario_manifest(manifest_file, generated_specs)
+
+    if failed and strict:
+        raise RuntimeError(
+            f"{len(failed)} scenario(s) failed to be generated, "
+            f"first one was '{failed[0][0].key}': {failed[0][1]}"
+        )
+
+    return generated
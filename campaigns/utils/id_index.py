@@ -0,0 +1,118 @@
+"""
+Persistent id -> file index for a parameters catalog (e.g. from-docs).
+
+Each yaml file is indexed by its path relative to the catalog root,
+together with its mtime and size. Only files that are new or changed
+since the index was last saved are opened again.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable
+
+from campaigns.utils.constants import CACHE_DIR
+
+_INDEX_VERSION = 1
+
+
+def _dir_digest(base_dir: Path) -> str:
+    return hashlib.sha1(
+        str(base_dir.resolve()).encode("utf-8")
+    ).hexdigest()[:12]
+
+
+class IdIndex():
+    def __init__(
+        self,
+        base_dir: Path,
+        index_file: Path | None = None,
+    ):
+        self.base_dir = Path(base_dir)
+        if index_file is None:
+            index_file = CACHE_DIR / f"id_index-{_dir_digest(self.base_dir)}.json"
+        self.index_file = Path(index_file)
+        self._entries = self._read()
+        self._dirty = False
+
+    def _read(self) -> dict:
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if (
+            stored.get("version") != _INDEX_VERSION
+            or stored.get("base_dir") != str(self.base_dir.resolve())
+        ):
+            return {}
+
+        return stored.get("entries", {})
+
+    def scan(
+        self, read_id: Callable[[Path], str | None]
+    ) -> list[tuple[Path, str | None]]:
+        """
+        Returns (file_path, id) for every yaml file under base_dir.
+
+        read_id is only called for files whose mtime or size differ from
+        the stored entry, so any validation it does is applied exactly
+        when an entry changes.
+        """
+        found = []
+        seen = set()
+
+        for file_path in sorted(self.base_dir.rglob("*.yaml")):
+            rel = file_path.relative_to(self.base_dir).as_posix()
+            st = file_path.stat()
+            seen.add(rel)
+
+            entry = self._entries.get(rel)
+            if (
+                entry is None
+                or entry["mtime_ns"] != st.st_mtime_ns
+                or entry["size"] != st.st_size
+            ):
+                entry = {
+                    "id": read_id(file_path),
+                    "mtime_ns": st.st_mtime_ns,
+                    "size": st.st_size,
+                }
+                self._entries[rel] = entry
+                self._dirty = True
+
+            found.append((file_path, entry["id"]))
+
+        for rel in self._entries.keys() - seen:
+            del self._entries[rel]
+            self._dirty = True
+
+        return found
+
+    def save(self) -> None:
+        """
+        Writes the index if anything changed. A catalog on a read-only
+        share simply won't get its index persisted.
+        """
+        if not self._dirty:
+            return
+
+        tmp_file = self.index_file.with_name(
+            f"{self.index_file.name}.{os.getpid()}.tmp"
+        )
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": _INDEX_VERSION,
+                    "base_dir": str(self.base_dir.resolve()),
+                    "entries": self._entries,
+                }, f)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            print(f"[WARN] Could not save id index to '{self.index_file}': {e}")
+            return
+
+        self._dirty = False
@@ -3,13 +3,89 @@ This Factory is supposed to be used to create your own parameters
 file
 """
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterable
+import copy
+import os
 import yaml
 import re
 
 from sharc.parameters.parameters import Parameters
+from sharc.parameters.parameters_base import ParametersBase
 from campaigns.utils.constants import ROOT_PARAMS_DIR, ROOT_DIR
 from campaigns.utils.tracking_proxy import TrackingProxy
+from campaigns.utils.id_index import IdIndex
+
+
+class _ParsedDocumentCache():
+    """
+    In-process LRU cache of parsed parameter files.
+    Entries are keyed by file path and only valid for the
+    (mtime, size) stamp the file had when it was parsed.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._docs = OrderedDict()
+
+    def get(self, path: str, stamp: tuple) -> dict | None:
+        entry = self._docs.get(path)
+        if entry is None or entry[0] != stamp:
+            return None
+        self._docs.move_to_end(path)
+        return entry[1]
+
+    def put(self, path: str, stamp: tuple, doc: dict) -> None:
+        self._docs[path] = (stamp, doc)
+        self._docs.move_to_end(path)
+        while len(self._docs) > self.maxsize:
+            self._docs.popitem(last=False)
+
+    def clear(self) -> None:
+        self._docs.clear()
+
+
+# shared by every factory in the process, so that sweeps only
+# parse each distinct parameter file once
+_PARSED_DOCS = _ParsedDocumentCache()
+
+
+class ParameterFileLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    """
+    Safe loader (libyaml based when available) that also reads the
+    tuples yaml.dump writes, e.g. vertical_beamsteering_range
+    """
+
+
+ParameterFileLoader.add_constructor(
+    "tag:yaml.org,2002:python/tuple",
+    lambda loader, node: tuple(loader.construct_sequence(node)),
+)
+
+
+def parameters_from_dict(data: dict) -> Parameters:
+    """
+    Builds Parameters from a parameters dict without going through a file.
+    Each section present in data is loaded and validated the same way
+    Parameters.read_params does, and sections not present keep defaults.
+    """
+    params = Parameters()
+
+    for section in vars(params).values():
+        if not isinstance(section, ParametersBase):
+            continue
+        if section.section_name not in data:
+            continue
+        # copy so that Parameters never aliases the recorded dict
+        section.load_subparameters(
+            section.section_name,
+            copy.deepcopy(data[section.section_name]),
+        )
+        section.validate(section.section_name)
+
+    return params
 
 
 class ParametersFactory():
@@ -20,11 +96,16 @@ class ParametersFactory():
 
     def __init__(
         self,
-        base_dir=ROOT_PARAMS_DIR
+        base_dir=ROOT_PARAMS_DIR,
+        use_id_index=True,
     ):
         if isinstance(base_dir, str):
             base_dir = Path(base_dir)
 
+        # NOTE: the id index avoids opening every catalog file
+        # each time a factory is constructed
+        self._use_id_index = use_id_index
+
         self.set_base_dir(
             base_dir
         )
@@ -70,12 +151,56 @@ class ParametersFactory():
     def _get_param_as_dict(
         self, dir: str
     ) -> dict:
-        with open(dir, "r") as f:
-            data = yaml.safe_load(f)
+        path = str(dir)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        data = _PARSED_DOCS.get(path, stamp)
+        if data is None:
+            with open(path, "r") as f:
+                data = yaml.load(f, Loader=ParameterFileLoader)
 
-        self._validate_param_dict(data)
+            self._validate_param_dict(data)
+            _PARSED_DOCS.put(path, stamp, data)
+
+        # NOTE: load_from_dict pops keys and the TrackingProxy writes
+        # into the nested dicts, so the cached document is never handed out
+        return copy.deepcopy(data)
 
-        return data
+    def _read_id(
+        self, file_path: Path
+    ) -> str | None:
+        """
+        Reads the id of a parameter file, which MUST be its first line
+        """
+        with open(file_path) as f:
+            return self._id_from_lines(f, file_path)
+
+    def _id_from_lines(
+        self, lines: Iterable[str], file_path: Path
+    ) -> str | None:
+        for line in lines:
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                # ignore comments or empty lines at the start
+                continue
+            # if it is not comment, first line must be its id
+            if line.startswith("id:"):
+                _, value = line.split(":", 1)
+                id = value.strip()
+                if not self._VALID_ID_REGEX.fullmatch(id):
+                    raise ValueError(
+                        f"Error when parsing {file_path}:\n"
+                        f"\tInvalid id '{id}'!"
+                    )
+                return id
+            raise ValueError(
+                f"Error when parsing {file_path}:\n"
+                "\tThe first line of each yaml file MUST be its id."
+            )
+
+        # file only has comments or is empty
+        return None
 
     def set_base_dir(
         self,
@@ -84,34 +209,90 @@ class ParametersFactory():
         self.base_dir = base_dir
         self._ids_to_dir = {}
 
-        for file_path in base_dir.rglob("*.yaml"):
-            with open(file_path) as f:
-                for line in f:
-                    line = line.strip()
-                    if line == "" or line.startswith("#"):
-                        # ignore comments or empty lines at the start
-                        continue
-                    # if it is not comment, first line must be its id
-                    if line.startswith("id:"):
-                        _, value = line.split(":", 1)
-                        id = value.strip()
-                        if not self._VALID_ID_REGEX.fullmatch(id):
-                            raise ValueError(
-                                f"Error when parsing {file_path}:\n"
-                                f"\tInvalid id '{id}'!"
-                            )
-                        if id in self._ids_to_dir:
-                            raise ValueError(
-                                f"Error when parsing {file_path}:\n"
-                                f"\t id '{id}' is also used in '{self._ids_to_dir[id]}'\n"
-                            )
-                        self._ids_to_dir[id] = file_path
-                        break
-                    else:
-                        raise ValueError(
-                            f"Error when parsing {file_path}:\n"
-                            "\tThe first line of each yaml file MUST be its id."
-                        )
+        if self._use_id_index:
+            # only new or changed files are opened again
+            index = IdIndex(base_dir)
+            files_and_ids = index.scan(self._read_id)
+        else:
+            index = None
+            files_and_ids = [
+                (file_path, self._read_id(file_path))
+                for file_path in base_dir.rglob("*.yaml")
+            ]
+
+        self._set_ids(files_and_ids)
+
+        if index is not None:
+            index.save()
+
+        return self
+
+    def _set_ids(
+        self, files_and_ids: list[tuple[Path, str | None]]
+    ) -> None:
+        self._ids_to_dir = {}
+        for file_path, id in files_and_ids:
+            if id is None:
+                continue
+            if id in self._ids_to_dir:
+                raise ValueError(
+                    f"Error when parsing {file_path}:\n"
+                    f"\t id '{id}' is also used in '{self._ids_to_dir[id]}'\n"
+                )
+            self._ids_to_dir[id] = file_path
+
+    def _preload_file(
+        self, file_path: Path
+    ) -> str | None:
+        """Reads file_path once to get its id and cache its parsed document"""
+        st = os.stat(file_path)
+        with open(file_path, "r") as f:
+            text = f.read()
+
+        id = self._id_from_lines(text.splitlines(), file_path)
+        if id is not None:
+            # files that fail are not cached, so load_from_id reports
+            # them if they are ever used
+            try:
+                data = yaml.load(text, Loader=ParameterFileLoader)
+                self._validate_param_dict(data)
+            except (yaml.YAMLError, ValueError) as e:
+                print(f"[WARN] Could not preload '{file_path}': {e}")
+                return id
+            _PARSED_DOCS.put(str(file_path), (st.st_mtime_ns, st.st_size), data)
+        return id
+
+    def preload(
+        self, max_workers: int = 1
+    ) -> "ParametersFactory":
+        """
+        Reads and parses every file of the catalog in a single pass,
+        refreshing the ids and caching the documents that load_from_id
+        would otherwise parse one at a time. Files that fail to parse are
+        reported and skipped.
+
+        max_workers: threads reading the files, 1 reads them in this thread
+        """
+        file_paths = sorted(self.base_dir.rglob("*.yaml"))
+        # the cache must hold the whole catalog, otherwise it would evict
+        # what was just parsed and load_from_id would parse it again
+        _PARSED_DOCS.maxsize = max(_PARSED_DOCS.maxsize, len(file_paths))
+
+        if max_workers == 1:
+            ids = [self._preload_file(p) for p in file_paths]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                ids = list(executor.map(self._preload_file, file_paths))
+        ids_by_file = dict(zip(file_paths, ids))
+
+        self._set_ids(list(ids_by_file.items()))
+        if self._use_id_index:
+            # files were just read, so the index is updated from them
+            index = IdIndex(self.base_dir)
+            index.scan(lambda p: ids_by_file[p] if p in ids_by_file else self._read_id(p))
+            index.save()
+
+        return self
 
     def load_from_id(
         self, id: str
@@ -166,16 +347,23 @@ class ParametersFactory():
     # NOTE: a proxy/observer could update Parameters and
     # dict at the same time..?
     def build(
-        self, filepath=".tmp.yaml"
+        self, filepath: str | Path | None = None
     ) -> Parameters:
         """
         Resets factory data, and returns previous accumulated data
+
+        Parameters are built in memory by default. If a filepath is passed,
+        the accumulated data is written there and read back by SHARC
+        instead, which is only meant for debugging.
         """
-        self._write_to_file(filepath)
+        if filepath is None:
+            params = parameters_from_dict(self._data)
+        else:
+            self._write_to_file(filepath)
 
-        params = Parameters()
-        params.set_file_name(filepath)
-        params.read_params()
+            params = Parameters()
+            params.set_file_name(filepath)
+            params.read_params()
 
         starting_data = self._data
         self._reset()
@@ -0,0 +1,76 @@
+"""
+Lightweight export of the PostProcessor plotly figures.
+
+Pages written with include_plotlyjs="cdn" carry every point of every
+trace. Here the traces are reduced before writing (see ccdf_reduce), and a
+trace still longer than max_points, e.g. when a huge number of snapshots
+puts too many points in the exact tail, is reduced in the tail as well.
+With include_plotlyjs="directory" plotly.min.js is written once per
+folder and shared by all the pages in it. A static image of each figure
+can also be saved, which needs kaleido installed.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from campaigns.utils.ccdf_reduce import (
+    CCDF_MAX_REL_ERROR, CCDF_TAIL_PROB, reduce_ccdf_indexes, reduce_plot_traces,
+)
+
+# defaults used by the campaign plot scripts
+EXPORT_MAX_POINTS = 5000
+EXPORT_PLOTLYJS = "directory"
+
+
+def _bound_trace_points(fig, max_points: int, max_rel_error: float) -> None:
+    for trace in fig.data:
+        if trace.x is None or trace.y is None or len(trace.y) <= max_points:
+            continue
+        x = np.asarray(trace.x)
+        y = np.asarray(trace.y, dtype=float)
+        if x.shape != y.shape:
+            continue
+        idx = reduce_ccdf_indexes(y, tail_prob=0.0, max_rel_error=max_rel_error)
+        print(
+            f"[WARN] Trace '{trace.name}' has {y.size} points, "
+            f"reducing its tail too ({idx.size} points left)"
+        )
+        trace.x = x[idx]
+        trace.y = y[idx]
+
+
+def export_figure(
+    fig,
+    file: Path,
+    include_plotlyjs: str | bool = EXPORT_PLOTLYJS,
+    image_format: str | None = None,
+    auto_open: bool = False,
+    tail_prob: float = CCDF_TAIL_PROB,
+    max_rel_error: float | None = CCDF_MAX_REL_ERROR,
+    max_points: int | None = EXPORT_MAX_POINTS,
+) -> None:
+    """
+    Writes fig to file (.html) after reducing its traces.
+
+    include_plotlyjs: as in plotly's write_html. "cdn" gives the previous
+        self contained pages.
+    image_format: if given (e.g. "png", "svg"), the figure is also saved
+        next to the html with that extension.
+    max_rel_error: None writes every point, as before.
+    """
+    file = Path(file)
+    if max_rel_error is not None:
+        reduce_plot_traces([fig], tail_prob, max_rel_error)
+        if max_points is not None:
+            _bound_trace_points(fig, max_points, max_rel_error)
+
+    fig.write_html(file=file, include_plotlyjs=include_plotlyjs, auto_open=auto_open)
+
+    if image_format is not None:
+        image_file = file.with_suffix(f".{image_format}")
+        try:
+            fig.write_image(image_file)
+        except (ImportError, ValueError) as e:
+            # plotly raises ValueError when kaleido is missing
+            print(f"[WARN] Could not save '{image_file}': {e}")
@@ -0,0 +1,220 @@
+"""
+Parallel, incremental rendering of figures.
+
+Each figure is a RenderJob: a module level function (so it can be pickled),
+its arguments and the figure file it writes. Jobs run on a process pool whose
+workers use the Agg backend. Large arrays in the arguments are written once as .npy and
+memory mapped by the workers instead of being pickled to each of them.
+
+A fingerprint of each job's inputs is stored next to the figures, and a
+figure is only rendered again if its fingerprint changed or the file is gone.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+FINGERPRINTS_FILE_NAME = ".render_fingerprints.json"
+# arrays at least this large are passed to workers as memory mapped files
+SHARE_MIN_BYTES = 1 << 20
+
+
+@dataclass
+class RenderJob:
+    """
+    out_path: figure written by fn
+    fn: module level function rendering the figure
+    args: positional arguments of fn
+    fingerprint: identifies the job inputs, see fingerprint()
+    """
+    out_path: Path
+    fn: Callable[..., Any]
+    args: tuple = ()
+    fingerprint: str = field(default="")
+
+
+def fingerprint(*objs: Any) -> str:
+    """
+    Hash of (nested) arrays, dicts, sequences, bytes and plain values.
+    """
+    h = hashlib.sha1()
+
+    def feed(obj):
+        if isinstance(obj, np.ndarray):
+            h.update(f"nd{obj.dtype}{obj.shape}".encode())
+            h.update(np.ascontiguousarray(obj).tobytes())
+        elif isinstance(obj, dict):
+            h.update(b"{")
+            for k in sorted(obj, key=repr):
+                feed(k)
+                feed(obj[k])
+            h.update(b"}")
+        elif isinstance(obj, (list, tuple)):
+            h.update(b"(")
+            for v in obj:
+                feed(v)
+            h.update(b")")
+        elif isinstance(obj, bytes):
+            h.update(obj)
+        else:
+            h.update(repr(obj).encode())
+
+    for obj in objs:
+        feed(obj)
+    return h.hexdigest()
+
+
+class _SharedArray:
+    def __init__(self, path: Path):
+        self.path = path
+
+
+def _share_arrays(obj: Any, tmp_dir: Path, counter: list[int]) -> Any:
+    if isinstance(obj, np.ndarray) and obj.nbytes >= SHARE_MIN_BYTES:
+        path = tmp_dir / f"{counter[0]}.npy"
+        counter[0] += 1
+        np.save(path, obj)
+        return _SharedArray(path)
+    if isinstance(obj, dict):
+        return {k: _share_arrays(v, tmp_dir, counter) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_share_arrays(v, tmp_dir, counter) for v in obj)
+    return obj
+
+
+def _resolve_arrays(obj: Any) -> Any:
+    if isinstance(obj, _SharedArray):
+        return np.load(obj.path, mmap_mode="r")
+    if isinstance(obj, dict):
+        return {k: _resolve_arrays(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_resolve_arrays(v) for v in obj)
+    return obj
+
+
+def _init_worker() -> None:
+    """Pool worker initializer, never run in the caller's process"""
+    try:
+        import matplotlib
+    except ImportError:
+        # jobs may render with something else
+        return
+    matplotlib.use("Agg")
+
+
+def _render(fn: Callable[..., Any], args: tuple) -> None:
+    fn(*_resolve_arrays(args))
+
+
+def _read_fingerprints(path: Path) -> dict[str, str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_fingerprints(path: Path, fingerprints: dict[str, str]) -> None:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(fingerprints, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[WARN] Could not save render fingerprints to '{path}': {e}")
+
+
+def render_all(
+    jobs: list[RenderJob],
+    max_workers: int | None = None,
+    force: bool = False,
+) -> list[Path]:
+    """
+    Renders the jobs whose figure is missing or whose fingerprint changed
+    (or all of them if force). Returns the rendered figures.
+
+    max_workers: number of processes. None uses all cores, and 1 renders
+        in the current process, with its current matplotlib backend.
+    """
+    out_paths = [job.out_path for job in jobs]
+    if len(set(out_paths)) != len(out_paths):
+        raise ValueError("Render jobs must write to different files")
+
+    # fingerprints are kept per output directory
+    stores = {}
+    pending = []
+    for job in jobs:
+        store_path = job.out_path.parent / FINGERPRINTS_FILE_NAME
+        if store_path not in stores:
+            stores[store_path] = _read_fingerprints(store_path)
+        stored = stores[store_path].get(job.out_path.name)
+        if (
+            force
+            or not job.fingerprint
+            or stored != job.fingerprint
+            or not job.out_path.exists()
+        ):
+            pending.append(job)
+
+    print(f"[INFO] Rendering {len(pending)} of {len(jobs)} figure(s), the rest are up to date")
+    if not pending:
+        return []
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(pending)))
+
+    rendered = []
+    failed = []
+    with tempfile.TemporaryDirectory(prefix="render-") as tmp_dir:
+        counter = [0]
+        shared_args = [
+            _share_arrays(job.args, Path(tmp_dir), counter) for job in pending
+        ]
+        if max_workers == 1:
+            # the backend is left as it is: switching it here would switch it
+            # for the whole session (e.g. breaking a later plt.show()), and
+            # every backend can save figures
+            outcomes = []
+            for job, args in zip(pending, shared_args):
+                try:
+                    _render(job.fn, args)
+                    outcomes.append(None)
+                except Exception as e:
+                    outcomes.append(e)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_worker
+            ) as executor:
+                futures = [
+                    executor.submit(_render, job.fn, args)
+                    for job, args in zip(pending, shared_args)
+                ]
+                outcomes = [future.exception() for future in futures]
+
+    for job, err in zip(pending, outcomes):
+        store = stores[job.out_path.parent / FINGERPRINTS_FILE_NAME]
+        if err is None:
+            rendered.append(job.out_path)
+            if job.fingerprint:
+                store[job.out_path.name] = job.fingerprint
+        else:
+            store.pop(job.out_path.name, None)
+            failed.append(job)
+            print(f"[ERROR] Failed to render '{job.out_path}': {type(err).__name__}: {err}")
+
+    for store_path, store in stores.items():
+        store_path.parent.mkdir(parents=True, exist_ok=True)
+        _write_fingerprints(store_path, store)
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} figure(s) failed to render")
+
+    return rendered
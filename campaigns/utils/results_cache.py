@@ -0,0 +1,239 @@
+"""
+Consolidated cache of parsed result vectors for a campaign output tree.
+
+Every parsed csv is stored in a single .npz together with the csv size and
+mtime. On later runs only new or changed csvs are parsed again, the rest is
+read back from the .npz. One store is kept per (output dir, result name),
+e.g. (imt_to_mss/output, system_inr.csv), under the local cache dir.
+
+Vectors parsed during a run are not kept in memory: each one is written
+to a spill file next to the store as soon as it is parsed, and save()
+rebuilds the store from the old one and the spill file, one array at a
+time.
+"""
+
+import hashlib
+import json
+import os
+import zipfile
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from campaigns.utils.constants import CACHE_DIR
+from campaigns.utils.results_loader import load_vector
+
+_CACHE_VERSION = 1
+_MANIFEST_KEY = "__manifest__"
+
+
+class ResultsCache():
+    def __init__(
+        self,
+        output_dir: Path,
+        name: str,
+        loader: Callable[[Path], np.ndarray] = load_vector,
+        cache_file: Path | None = None,
+    ):
+        """
+        output_dir: root of the campaign outputs. Cached csvs are keyed by
+            their path relative to it.
+        name: what is being cached, usually the csv file name. Scripts that
+            parse the same file differently should use different names.
+        loader: parses a csv into a 1d array on a cache miss.
+        """
+        self.output_dir = Path(output_dir).resolve()
+        self.loader = loader
+        if cache_file is None:
+            digest = hashlib.sha1(
+                f"{self.output_dir}|{name}".encode("utf-8")
+            ).hexdigest()[:12]
+            cache_file = CACHE_DIR / f"results-{digest}.npz"
+        self.cache_file = Path(cache_file)
+
+        # relpath -> {"key", "mtime_ns", "size"}, "key" only for stored ones
+        self._manifest: dict[str, dict] = {}
+        self._npz = None
+        # vectors parsed on this run, written as they are parsed
+        self._spill_file = self.cache_file.with_name(
+            f"{self.cache_file.name}.{os.getpid()}.spill"
+        )
+        self._spill: zipfile.ZipFile | None = None
+        # relpath -> member of the spill file
+        self._spilled: dict[str, str] = {}
+        self._n_spilled = 0
+        self._dirty = False
+        self.n_hits = 0
+        self.n_misses = 0
+        self._open()
+
+    def _open(self) -> None:
+        try:
+            npz = np.load(self.cache_file, allow_pickle=False)
+        except (OSError, ValueError):
+            return
+        try:
+            stored = json.loads(str(npz[_MANIFEST_KEY]))
+        except (OSError, ValueError, KeyError):
+            npz.close()
+            return
+
+        if (
+            stored.get("version") != _CACHE_VERSION
+            or stored.get("output_dir") != str(self.output_dir)
+        ):
+            npz.close()
+            return
+
+        self._npz = npz
+        self._manifest = stored["entries"]
+
+    def load(self, csv_path: Path) -> np.ndarray:
+        """
+        Returns the parsed csv, from the cache if the csv is unchanged.
+        """
+        csv_path = Path(csv_path).resolve()
+        rel = csv_path.relative_to(self.output_dir).as_posix()
+        st = csv_path.stat()
+
+        entry = self._manifest.get(rel)
+        if (
+            entry is not None
+            and entry["mtime_ns"] == st.st_mtime_ns
+            and entry["size"] == st.st_size
+        ):
+            self.n_hits += 1
+            return self._read(rel, entry)
+
+        self.n_misses += 1
+        vals = np.asarray(self.loader(csv_path), dtype=float)
+        self._manifest.pop(rel, None)
+        self._spilled.pop(rel, None)
+        if self._write_spill(rel, vals):
+            self._manifest[rel] = {
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+            }
+        self._dirty = True
+        return vals
+
+    def _read(self, rel: str, entry: dict) -> np.ndarray:
+        if rel in self._spilled:
+            with self._spill.open(f"{self._spilled[rel]}.npy") as f:
+                return np.lib.format.read_array(f, allow_pickle=False)
+        return self._npz[entry["key"]]
+
+    def _write_spill(self, rel: str, vals: np.ndarray) -> bool:
+        """Stores vals in the spill file, False (not cached) if it can't"""
+        name = f"new_{self._n_spilled}"
+        try:
+            if self._spill is None:
+                self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+                self._spill = zipfile.ZipFile(self._spill_file, "w")
+            with self._spill.open(f"{name}.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, vals, allow_pickle=False)
+        except OSError as e:
+            print(f"[WARN] Could not write to results cache '{self._spill_file}': {e}")
+            return False
+        self._n_spilled += 1
+        self._spilled[rel] = name
+        return True
+
+    def save(self) -> None:
+        """
+        Rewrites the store if anything was parsed on this run. Entries for
+        csvs that no longer exist are dropped.
+        """
+        for rel in list(self._manifest):
+            if not (self.output_dir / rel).exists():
+                del self._manifest[rel]
+                self._spilled.pop(rel, None)
+                self._dirty = True
+
+        if not self._dirty:
+            return
+
+        entries = {}
+        tmp_file = self.cache_file.with_name(
+            f"{self.cache_file.name}.{os.getpid()}.tmp"
+        )
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            # same layout as np.savez, written one array at a time
+            with zipfile.ZipFile(tmp_file, "w") as zf:
+                for i, (rel, entry) in enumerate(sorted(self._manifest.items())):
+                    key = f"arr_{i}"
+                    _write_member(zf, key, self._read(rel, entry))
+                    entries[rel] = {**entry, "key": key}
+                _write_member(zf, _MANIFEST_KEY, np.array(json.dumps({
+                    "version": _CACHE_VERSION,
+                    "output_dir": str(self.output_dir),
+                    "entries": entries,
+                })))
+            if self._npz is not None:
+                self._npz.close()
+                self._npz = None
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            print(f"[WARN] Could not save results cache to '{self.cache_file}': {e}")
+            self._keep_unsaved()
+            try:
+                tmp_file.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return
+
+        self._npz = np.load(self.cache_file, allow_pickle=False)
+        self._manifest = entries
+        self._close_spill()
+        self._dirty = False
+
+    def _keep_unsaved(self) -> None:
+        """
+        After a failed save, keeps serving what was loaded: parsed vectors
+        stay in the spill file and stored ones are read back from the old
+        store, which os.replace left in place. The store stays dirty, so
+        the next save tries again.
+        """
+        if self._npz is None:
+            try:
+                self._npz = np.load(self.cache_file, allow_pickle=False)
+            except (OSError, ValueError):
+                pass
+        if self._npz is None:
+            # stored vectors are unreachable, parse those csvs again
+            for rel in list(self._manifest):
+                if rel not in self._spilled:
+                    del self._manifest[rel]
+
+    def _close_spill(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+            self._spill_file.unlink(missing_ok=True)
+        self._spilled = {}
+
+    def close(self) -> None:
+        """Closes the store, dropping whatever was not saved"""
+        if self._npz is not None:
+            self._npz.close()
+            self._npz = None
+        self._close_spill()
+
+    def __enter__(self) -> "ResultsCache":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.save()
+            print(
+                f"[INFO] Results cache: {self.n_hits} csv(s) reused, "
+                f"{self.n_misses} parsed"
+            )
+        self.close()
+
+
+def _write_member(zf: zipfile.ZipFile, key: str, arr: np.ndarray) -> None:
+    with zf.open(f"{key}.npy", "w", force_zip64=True) as f:
+        np.lib.format.write_array(f, np.asanyarray(arr), allow_pickle=False)
@@ -0,0 +1,138 @@
+"""
+Fast loader for single vector SHARC result files (e.g. system_inr.csv).
+
+Values may be plain numbers or bracketed ("[-70.81]"), one or more per
+line. Text is tokenized in bulk and converted by numpy at once, instead of
+converting each cell in python.
+
+Optionally, the parsed vector is saved next to the csv as a .npy sidecar
+(e.g. system_inr.csv.npy), which later loads memory map directly.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+# brackets and quotes are dropped, commas and semicolons become separators
+_STRIP_TABLE = str.maketrans({
+    "[": None, "]": None, '"': None, "'": None,
+    ",": " ", ";": " ",
+})
+
+
+def parse_vector_text(text: str) -> np.ndarray:
+    """
+    Returns every finite number found in text, in order.
+    Tokens that are not numbers (e.g. a header) are skipped.
+    """
+    tokens = text.translate(_STRIP_TABLE).split()
+    try:
+        vals = np.array(tokens, dtype=float)
+    except ValueError:
+        # usually only a header line, so retry without the first line
+        first_line, _, rest = text.partition("\n")
+        n_header = len(first_line.translate(_STRIP_TABLE).split())
+        try:
+            vals = np.array(tokens[n_header:], dtype=float)
+        except ValueError:
+            vals = np.array(
+                [float(t) for t in tokens if _is_float(t)],
+                dtype=float,
+            )
+
+    return vals[np.isfinite(vals)]
+
+
+def _is_float(token: str) -> bool:
+    try:
+        float(token)
+        return True
+    except ValueError:
+        return False
+
+
+def sidecar_path(csv_path: Path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".npy")
+
+
+def _sidecar_is_fresh(csv_path: Path, npy_path: Path) -> bool:
+    try:
+        return npy_path.stat().st_mtime_ns >= csv_path.stat().st_mtime_ns
+    except OSError:
+        return False
+
+
+def _save_sidecar(npy_path: Path, vals: np.ndarray) -> None:
+    tmp_path = npy_path.with_name(f"{npy_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, vals)
+        os.replace(tmp_path, npy_path)
+    except OSError as e:
+        print(f"[WARN] Could not write sidecar '{npy_path}': {e}")
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def load_vector(
+    csv_path: Path,
+    use_sidecar: bool = False,
+    mmap: bool = True,
+) -> np.ndarray:
+    """
+    Loads every finite value of a results csv as a 1d float array.
+
+    use_sidecar: if True, a fresh .npy sidecar is loaded instead of the csv,
+        and a missing or stale one is (re)written after parsing.
+    mmap: sidecars are memory mapped (read only) instead of read to memory.
+    """
+    csv_path = Path(csv_path)
+
+    if use_sidecar:
+        npy_path = sidecar_path(csv_path)
+        if _sidecar_is_fresh(csv_path, npy_path):
+            try:
+                return np.load(npy_path, mmap_mode="r" if mmap else None)
+            except (OSError, ValueError):
+                # corrupted sidecar, parse csv again
+                pass
+
+    try:
+        with open(csv_path, "r") as f:
+            vals = parse_vector_text(f.read())
+    except OSError:
+        return np.array([], dtype=float)
+
+    if use_sidecar:
+        _save_sidecar(npy_path, vals)
+
+    return vals
+
+
+def build_sidecars(root_dir: Path, file_name: str) -> int:
+    """
+    Converts every file_name found under root_dir to a .npy sidecar,
+    so that later loads don't parse any text. Returns how many were
+    (re)written.
+    """
+    n = 0
+    for csv_path in sorted(Path(root_dir).rglob(file_name)):
+        if not _sidecar_is_fresh(csv_path, sidecar_path(csv_path)):
+            load_vector(csv_path, use_sidecar=True)
+            n += 1
+    return n
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("usage: python -m campaigns.utils.results_loader <root_dir> <file_name>")
+        sys.exit(1)
+
+    n = build_sidecars(Path(sys.argv[1]), sys.argv[2])
+    print(f"{n} sidecar(s) written")
@@ -0,0 +1,50 @@
+"""
+Loads campaign results once for several plot types.
+
+Plot scripts usually want some samples as CDFs and others as CCDFs. Instead
+of calling Results.load_many_from_dir once per plot type, the union of the
+samples is loaded once and each plot type gets its own view of the results:
+a shallow copy in which samples it did not ask for are empty, so the
+PostProcessor only generates the plots requested for that type.
+"""
+
+import copy
+from pathlib import Path
+
+from sharc.results import Results, SampleList
+
+
+def results_view(results: Results, samples: list[str]) -> Results:
+    """
+    Shallow copy of results keeping only the given samples. Samples are
+    shared with the original, so they should be replaced, not mutated.
+    """
+    view = copy.copy(results)
+    for attr, value in vars(results).items():
+        if isinstance(value, SampleList) and attr not in samples:
+            setattr(view, attr, SampleList())
+    return view
+
+
+def load_results_by_plot_type(
+    output_dir: Path,
+    samples_by_plot_type: dict[str, list[str]],
+    **load_kwargs,
+) -> dict[str, list[Results]]:
+    """
+    e.g. load_results_by_plot_type(dir, {"ccdf": [...], "cdf": [...]},
+    only_latest=True) -> {"ccdf": [Results, ...], "cdf": [Results, ...]}
+
+    load_kwargs are passed to Results.load_many_from_dir.
+    """
+    union = sorted(set().union(*samples_by_plot_type.values()))
+    all_results = Results.load_many_from_dir(
+        output_dir,
+        only_samples=union,
+        **load_kwargs,
+    )
+
+    return {
+        plot_type: [results_view(res, samples) for res in all_results]
+        for plot_type, samples in samples_by_plot_type.items()
+    }
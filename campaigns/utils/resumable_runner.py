@@ -0,0 +1,225 @@
+"""
+Resumable campaign runs.
+
+run_campaign (sharc.run_multiple_campaigns_mut_thread) runs every parameter
+file of a campaign, and since outputs are never overwritten, a rerun
+recomputes everything. Here each parameter file is hashed and, when its
+simulation finishes, the hash and the output dir it created are recorded
+in a ledger kept in the campaign dir. A rerun only dispatches parameter
+files that are new, changed, failed or whose output dir is gone.
+
+Simulations are dispatched the same way run_campaign does, one
+'python main_cli.py -p <file>' process per parameter file on a thread pool,
+but longest first according to cost_estimator, and the predicted and actual
+times are reported at the end.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from campaigns.utils.constants import SHARC_SIM_ROOT_DIR
+from campaigns.utils.cost_estimator import (
+    CostEstimate, estimate_costs, longest_first, predict_makespan, print_timing_report,
+)
+from campaigns.utils.dump_parameters import (
+    base_document_file, load_parameter_file, materialize_parameter_file,
+)
+from campaigns.utils.scenario_manifest import output_dir_prefix
+
+LEDGER_FILE_NAME = "run_ledger.json"
+
+_LEDGER_VERSION = 1
+
+
+def file_hash(path: Path) -> str:
+    """Hash of a parameter file, including its base document if it is a diff document"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        h.update(f.read())
+    base_file = base_document_file(path)
+    if base_file is not None:
+        with open(base_file, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class RunLedger():
+    """
+    Completed runs, by parameter file name:
+        {"hash": ..., "output_dir": ..., "finished_at": ..., "duration_s": ...,
+         "cost_units": ...}
+    Saved after every update, so progress survives a crash.
+    """
+
+    def __init__(self, ledger_file: Path):
+        self.ledger_file = Path(ledger_file)
+        self._lock = threading.Lock()
+        self.runs = self._read()
+
+    def _read(self) -> dict[str, dict]:
+        try:
+            with open(self.ledger_file, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if stored.get("version") != _LEDGER_VERSION:
+            return {}
+        return stored["runs"]
+
+    def _save(self) -> None:
+        tmp_file = self.ledger_file.with_name(f"{self.ledger_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"version": _LEDGER_VERSION, "runs": self.runs}, f, indent=2)
+        os.replace(tmp_file, self.ledger_file)
+
+    def is_done(self, param_file: Path, param_hash: str) -> bool:
+        run = self.runs.get(Path(param_file).name)
+        return (
+            run is not None
+            and run["hash"] == param_hash
+            and run["output_dir"] is not None
+            and Path(run["output_dir"]).is_dir()
+        )
+
+    def record(self, param_file: Path, param_hash: str, output_dir: Path | None, **extra) -> None:
+        with self._lock:
+            self.runs[Path(param_file).name] = {
+                "hash": param_hash,
+                "output_dir": None if output_dir is None else str(output_dir),
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                **extra,
+            }
+            self._save()
+
+
+def _param_output_location(param_file: Path) -> tuple[str | None, str | None]:
+    """(name of general.output_dir, general.output_dir_prefix)"""
+    general = load_parameter_file(param_file).get("general", {})
+    output_dir = general.get("output_dir")
+    return (
+        None if output_dir is None else Path(output_dir).name,
+        general.get("output_dir_prefix"),
+    )
+
+
+def find_output_dir(output_root: Path, prefix: str) -> Path | None:
+    """Latest SHARC output dir created for output_dir_prefix"""
+    if not output_root.is_dir():
+        return None
+    candidates = [
+        d for d in output_root.iterdir()
+        if d.is_dir() and output_dir_prefix(d.name) == prefix
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda d: d.stat().st_mtime)
+
+
+def run_simulation(param_file: Path) -> None:
+    """
+    Runs a single SHARC simulation, raising if it fails.
+    Diff documents are materialized to a temporary complete file first.
+    """
+    if base_document_file(param_file) is None:
+        subprocess.run(
+            [sys.executable, str(SHARC_SIM_ROOT_DIR / "main_cli.py"), "-p", str(param_file)],
+            check=True,
+        )
+        return
+
+    with tempfile.TemporaryDirectory(prefix="sharc-params-") as tmp_dir:
+        # same name, since SHARC copies the parameter file to the output dir
+        run_simulation(materialize_parameter_file(param_file, Path(tmp_dir) / Path(param_file).name))
+
+
+def run_campaign_resumable(
+    inputs_dir: Path,
+    output_root: Path,
+    ledger_file: Path | None = None,
+    max_workers: int | None = None,
+    force: bool = False,
+) -> list[Path]:
+    """
+    Runs the parameter files in inputs_dir that were not completed yet
+    (all of them if force). Returns the parameter files that failed.
+
+    output_root: where the campaign output dirs are created. Parameter
+        files whose general.output_dir has another name (e.g. output_shards)
+        are looked up in the dir of that name next to it.
+    ledger_file: defaults to run_ledger.json next to inputs_dir
+    max_workers: parallel simulations, None uses all cores
+    Scenarios are run longest first, see cost_estimator.
+    """
+    inputs_dir = Path(inputs_dir)
+    output_root = Path(output_root)
+    if ledger_file is None:
+        ledger_file = inputs_dir.parent / LEDGER_FILE_NAME
+    ledger = RunLedger(ledger_file)
+
+    param_files = sorted(inputs_dir.glob("*.yaml"))
+    pending = []
+    for param_file in param_files:
+        param_hash = file_hash(param_file)
+        if force or not ledger.is_done(param_file, param_hash):
+            pending.append((param_file, param_hash))
+
+    print(
+        f"[INFO] {len(pending)} of {len(param_files)} scenario(s) to run, "
+        f"the rest are recorded as completed in '{ledger_file}'"
+    )
+    if not pending:
+        return []
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    estimates = longest_first(estimate_costs(pending, ledger.runs))
+    hashes = dict(pending)
+    predicted_wall_s = predict_makespan(estimates, max_workers)
+    print(f"[INFO] Predicted wall time with {max_workers} worker(s): {predicted_wall_s:.1f}s")
+
+    durations = {}
+
+    def run_one(est: CostEstimate) -> Path | None:
+        param_file = est.param_file
+        start = time.perf_counter()
+        try:
+            run_simulation(param_file)
+        except subprocess.CalledProcessError as e:
+            print(f"[ERROR] Simulation for '{param_file.name}' failed with exit code {e.returncode}")
+            return param_file
+        duration_s = time.perf_counter() - start
+        durations[param_file] = duration_s
+
+        dir_name, prefix = _param_output_location(param_file)
+        # e.g. snapshot shards write to output_shards/, next to output/
+        search_root = output_root if dir_name is None else output_root.parent / dir_name
+        output_dir = None if prefix is None else find_output_dir(search_root, prefix)
+        if output_dir is None:
+            print(f"[WARN] Could not find the output dir of '{param_file.name}', it will run again next time")
+        ledger.record(
+            param_file, hashes[param_file], output_dir,
+            duration_s=round(duration_s, 3),
+            cost_units=est.units,
+        )
+        print(f"[INFO] Finished '{param_file.name}' in {duration_s:.1f}s")
+        return None
+
+    start = time.perf_counter()
+    # the pool takes work in submission order
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_one, est) for est in estimates]
+        failed = [f.result() for f in futures]
+
+    print_timing_report(estimates, durations, predicted_wall_s, time.perf_counter() - start)
+
+    return [f for f in failed if f is not None]
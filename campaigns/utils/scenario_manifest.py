@@ -0,0 +1,82 @@
+"""
+Machine readable description of the scenarios emitted by a generator.
+
+The manifest maps each scenario key to its parameter file, output dir
+prefix and sweep values. SHARC names each run output dir as
+'{output_dir_prefix}_{YYYY-MM-DD}_{NN}', so post processing can get the
+sweep values of a results dir with a single lookup on its name,
+instead of parsing them back from paths.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Iterable
+
+MANIFEST_FILE_NAME = "scenario_manifest.json"
+
+_MANIFEST_VERSION = 1
+# date and counter SHARC appends to output_dir_prefix
+_OUTPUT_SUFFIX_RE = re.compile(r"_\d{4}-\d{2}-\d{2}_\d+$")
+
+
+def output_dir_prefix(dir_name: str) -> str:
+    """Returns the output_dir_prefix a SHARC output dir was created from"""
+    return _OUTPUT_SUFFIX_RE.sub("", dir_name)
+
+
+def write_scenario_manifest(manifest_file: Path, specs: Iterable) -> None:
+    """
+    Writes the manifest for specs (ScenarioSpec). Spec values must be json
+    serializable and should include 'output_dir_prefix'.
+    """
+    manifest_file = Path(manifest_file)
+    scenarios = {}
+    for spec in specs:
+        values = dict(spec.values)
+        scenarios[spec.key] = {
+            "parameter_file": Path(spec.parameter_file).name,
+            "output_dir_prefix": values.pop("output_dir_prefix", None),
+            "values": values,
+        }
+
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": _MANIFEST_VERSION,
+            "scenarios": scenarios,
+        }, f, indent=2)
+
+
+class ScenarioManifest():
+    def __init__(self, scenarios: dict[str, dict]):
+        self.scenarios = scenarios
+        self._by_prefix = {
+            s["output_dir_prefix"]: key
+            for key, s in scenarios.items()
+            if s["output_dir_prefix"] is not None
+        }
+
+    @classmethod
+    def load(cls, manifest_file: Path) -> "ScenarioManifest | None":
+        """Returns None if there is no (valid) manifest"""
+        try:
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if stored.get("version") != _MANIFEST_VERSION:
+            return None
+
+        return cls(stored["scenarios"])
+
+    def key_for_output_dir(self, output_dir: Path | str) -> str | None:
+        return self._by_prefix.get(output_dir_prefix(Path(output_dir).name))
+
+    def values_for_output_dir(self, output_dir: Path | str) -> dict[str, Any] | None:
+        """Sweep values of the scenario whose results are in output_dir"""
+        key = self.key_for_output_dir(output_dir)
+        if key is None:
+            return None
+        return self.scenarios[key]["values"]
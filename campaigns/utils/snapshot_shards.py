@@ -0,0 +1,263 @@
+"""
+Splitting the snapshots of a scenario between several simulations.
+
+shard_specs turns each scenario into n_shards scenarios, each with its
+share of num_snapshots and an independent seed derived from the campaign
+seed (numpy SeedSequence.spawn). Shards write to a separate output dir
+(e.g. output_shards/), so their partial results are never read by the
+plot scripts.
+
+Once every shard of a scenario has finished, merge_shards concatenates the
+shard result files into a single result dir in the campaign output dir,
+named as SHARC would have named the unsharded run, so plot scripts and the
+scenario manifest read it as if it was a single simulation. Its parameter
+file describes the merged run: the total num_snapshots, the scenario's
+output_dir_prefix and the seed the shard seeds were derived from.
+"""
+
+from dataclasses import replace
+from datetime import date
+from pathlib import Path
+import json
+import re
+import shutil
+
+import numpy as np
+import yaml
+
+from campaigns.utils.dump_parameters import dump_parameter_dict, load_parameter_file
+from campaigns.utils.generation_engine import ScenarioSpec
+from campaigns.utils.scenario_manifest import output_dir_prefix
+
+SHARDS_FILE_NAME = ".shards.json"
+
+_SHARD_PREFIX_RE = re.compile(r"^(?P<prefix>.*)_shard(?P<i>\d+)of(?P<n>\d+)$")
+_NUMBER_RE = re.compile(r"^[\s\[\"']*[-+]?(\d|\.\d|nan|inf)", re.IGNORECASE)
+# suffix of the parameter file names of shards and adaptive_stopping batches
+_PART_SUFFIX_RE = re.compile(r"_(shard\d+of\d+|batch\d+)$")
+
+
+def shard_seeds(seed: int, n_shards: int) -> list[int]:
+    """Independent seeds for each shard of a scenario run with seed"""
+    return [
+        int(child.generate_state(1)[0])
+        for child in np.random.SeedSequence(seed).spawn(n_shards)
+    ]
+
+
+def split_snapshots(num_snapshots: int, n_shards: int) -> list[int]:
+    """num_snapshots split as evenly as possible, the first shards get the remainder"""
+    if n_shards < 1 or n_shards > num_snapshots:
+        raise ValueError(
+            f"Cannot split {num_snapshots} snapshots into {n_shards} shards"
+        )
+    q, r = divmod(num_snapshots, n_shards)
+    return [q + (i < r) for i in range(n_shards)]
+
+
+def shard_prefix(prefix: str, i: int, n_shards: int) -> str:
+    return f"{prefix}_shard{i}of{n_shards}"
+
+
+def shard_specs(
+    specs: list[ScenarioSpec],
+    n_shards: int,
+    seed: int,
+    num_snapshots: int,
+    shards_output_dir: str,
+) -> list[ScenarioSpec]:
+    """
+    Returns n_shards specs per spec. Spec values must include
+    'output_dir_prefix', and are kept as they are so the scenario manifest
+    still describes the merged results.
+
+    shards_output_dir: general.output_dir of the shards,
+        e.g. f"{CAMPAIGN_STR}/output_shards/"
+    """
+    if n_shards == 1:
+        return specs
+
+    seeds = shard_seeds(seed, n_shards)
+    snapshots = split_snapshots(num_snapshots, n_shards)
+
+    sharded = []
+    for spec in specs:
+        parameter_file = Path(spec.parameter_file)
+        for i in range(n_shards):
+            sharded.append(replace(
+                spec,
+                key=shard_prefix(spec.key, i, n_shards),
+                parameter_file=parameter_file.with_name(
+                    f"{shard_prefix(parameter_file.stem, i, n_shards)}{parameter_file.suffix}"
+                ),
+                overrides={
+                    **spec.overrides,
+                    "general.seed": seeds[i],
+                    "general.num_snapshots": snapshots[i],
+                    "general.output_dir": shards_output_dir,
+                    "general.output_dir_prefix": shard_prefix(
+                        spec.values["output_dir_prefix"], i, n_shards
+                    ),
+                },
+            ))
+    return sharded
+
+
+def _concat_result_file(src_files: list[Path], dst_file: Path) -> None:
+    """Concatenates text result files, keeping only the first header"""
+    with open(dst_file, "w", encoding="utf-8") as dst:
+        for n, src_file in enumerate(src_files):
+            with open(src_file, "r", encoding="utf-8") as src:
+                text = src.read()
+            if n > 0:
+                first_line, _, rest = text.partition("\n")
+                if not _NUMBER_RE.match(first_line):
+                    text = rest
+            if text and not text.endswith("\n"):
+                text += "\n"
+            dst.write(text)
+
+
+def _next_output_dir(output_root: Path, prefix: str) -> Path:
+    today = date.today().isoformat()
+    i = 1
+    while (output_root / f"{prefix}_{today}_{i:02d}").exists():
+        i += 1
+    return output_root / f"{prefix}_{today}_{i:02d}"
+
+
+def _merged_sources(output_root: Path) -> dict[str, list[str]]:
+    """For each merged dir in output_root, the shard dirs it came from"""
+    merged = {}
+    for d in output_root.glob(f"*/{SHARDS_FILE_NAME}"):
+        try:
+            with open(d, "r", encoding="utf-8") as f:
+                merged[d.parent.name] = json.load(f)["shards"]
+        except (OSError, ValueError, KeyError):
+            pass
+    return merged
+
+
+def _parameter_file(shard_dir: Path) -> tuple[Path, dict] | None:
+    """The parameter file SHARC copied into a result dir, and its contents"""
+    for f in sorted(shard_dir.glob("*.yaml")):
+        try:
+            data = load_parameter_file(f)
+        except (OSError, ValueError, yaml.YAMLError):
+            continue
+        if isinstance(data, dict) and isinstance(data.get("general"), dict):
+            return f, data
+    return None
+
+
+def _write_merged_parameter_file(
+    found: list[tuple[Path, dict]], merged_dir: Path, prefix: str, seed: int
+) -> Path:
+    """Parameter file of the merged run, from the shards' (file, contents)"""
+    first_file, data = found[0]
+    merged = {
+        **data,
+        "general": {
+            **data["general"],
+            "seed": seed,
+            "num_snapshots": sum(d["general"]["num_snapshots"] for _, d in found),
+            "output_dir": merged_dir.parent.as_posix() + "/",
+            "output_dir_prefix": prefix,
+        },
+    }
+    merged_file = merged_dir / f"{_PART_SUFFIX_RE.sub('', first_file.stem)}{first_file.suffix}"
+    dump_parameter_dict(merged_file, merged)
+    return merged_file
+
+
+def merge_shard_dirs(
+    shard_dirs: list[Path], output_root: Path, prefix: str, seed: int
+) -> Path:
+    """
+    Concatenates the result files of shard_dirs, in order, into a new
+    result dir for prefix in output_root. Returns the new dir.
+
+    seed: seed of the scenario the shard seeds were derived from, written
+        to the merged parameter file
+    """
+    merged_dir = _next_output_dir(output_root, prefix)
+    merged_dir.mkdir(parents=True)
+    found = [_parameter_file(d) for d in shard_dirs]
+    for f in sorted(shard_dirs[0].iterdir()):
+        if not f.is_file() or (found[0] is not None and f == found[0][0]):
+            continue
+        if f.suffix == ".csv":
+            src_files = [d / f.name for d in shard_dirs]
+            missing = [s for s in src_files if not s.exists()]
+            if missing:
+                print(f"[WARN] '{f.name}' is missing from {len(missing)} shard(s) of '{prefix}'")
+            _concat_result_file([s for s in src_files if s.exists()], merged_dir / f.name)
+        else:
+            shutil.copy2(f, merged_dir / f.name)
+    if all(p is not None for p in found):
+        _write_merged_parameter_file(found, merged_dir, prefix, seed)
+    elif any(p is not None for p in found):
+        print(f"[WARN] Not every shard of '{prefix}' has a parameter file, the merged dir has none")
+
+    with open(merged_dir / SHARDS_FILE_NAME, "w", encoding="utf-8") as f:
+        json.dump({"shards": [d.name for d in shard_dirs]}, f, indent=2)
+    return merged_dir
+
+
+def merge_shards(shards_root: Path, output_root: Path, seed: int) -> list[Path]:
+    """
+    Merges the latest shard dirs of each scenario in shards_root into a
+    new result dir in output_root. Scenarios missing shards, or whose
+    shards were already merged, are skipped. Returns the merged dirs.
+
+    seed: seed passed to shard_specs
+    """
+    shards_root = Path(shards_root)
+    output_root = Path(output_root)
+    if not shards_root.is_dir():
+        return []
+
+    # shard dirs by scenario prefix
+    found: dict[str, list[tuple[int, int, Path]]] = {}
+    for d in shards_root.iterdir():
+        m = _SHARD_PREFIX_RE.match(output_dir_prefix(d.name)) if d.is_dir() else None
+        if m is not None:
+            found.setdefault(m["prefix"], []).append((int(m["i"]), int(m["n"]), d))
+
+    output_root.mkdir(parents=True, exist_ok=True)
+    already_merged = {tuple(v) for v in _merged_sources(output_root).values()}
+
+    merged_dirs = []
+    for prefix, dirs in sorted(found.items()):
+        n_shards = {n for _, n, _ in dirs}
+        if len(n_shards) != 1:
+            print(f"[WARN] Shards of '{prefix}' were run with different shard counts, skipping them")
+            continue
+        n = n_shards.pop()
+        # latest dir of each shard
+        shards: dict[int, Path] = {}
+        for i, _, d in sorted(dirs, key=lambda x: x[2].stat().st_mtime):
+            shards[i] = d
+        if len(shards) != n:
+            print(f"[WARN] Only {len(shards)} of {n} shards of '{prefix}' finished, not merging it yet")
+            continue
+        shard_dirs = [shards[i] for i in range(n)]
+        sources = tuple(d.name for d in shard_dirs)
+        if sources in already_merged:
+            continue
+
+        merged_dirs.append(merge_shard_dirs(shard_dirs, output_root, prefix, seed))
+
+    print(f"[INFO] Merged shards into {len(merged_dirs)} result dir(s) in '{output_root}'")
+    return merged_dirs
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merge snapshot shard results")
+    parser.add_argument("shards_root", type=Path, help="e.g. campaigns/<name>/output_shards")
+    parser.add_argument("output_root", type=Path, help="e.g. campaigns/<name>/output")
+    parser.add_argument("seed", type=int, help="Campaign seed the shards were generated with")
+    args = parser.parse_args()
+    merge_shards(args.shards_root, args.output_root, args.seed)
@@ -0,0 +1,107 @@
+"""
+Beam edge (-7 dB) solver for the S.1528 Taylor antenna pattern.
+
+The cell radius used by the MSS DC and MSS D2D campaigns is the ground
+distance below the satellite at which the Taylor pattern falls 7 dB
+below its peak gain. Instead of evaluating the pattern on a dense grid,
+a coarse grid brackets the first crossing on the main lobe and bisection
+refines it up to the requested tolerance.
+"""
+
+import numpy as np
+
+from sharc.parameters.antenna.parameters_antenna_s1528 import ParametersAntennaS1528
+from sharc.antenna.antenna_s1528 import AntennaS1528Taylor
+
+from campaigns.utils.tracking_proxy import TrackingProxy
+
+# (antenna params, altitude, ...) -> cell radius [m]
+_RADIUS_CACHE: dict[tuple, float] = {}
+
+
+def _params_key(params_s1528: ParametersAntennaS1528) -> str:
+    if isinstance(params_s1528, TrackingProxy):
+        params_s1528 = params_s1528._obj
+    return repr(sorted(vars(params_s1528).items()))
+
+
+def get_taylor_beam_edge_angle(
+    params_s1528: ParametersAntennaS1528,
+    gain_drop_dB: float = 7.0,
+    attempt_max_angle: float = 10.0,
+    tol_deg: float = 1e-6,
+    coarse_points: int = 128,
+) -> float:
+    """
+    Returns the first off axis angle [deg] at which the gain is
+    gain_drop_dB below params_s1528.antenna_gain, within tol_deg.
+
+    The returned angle is always at or past the crossing, as with the
+    first grid point below the threshold in a dense grid search.
+    """
+    antenna = AntennaS1528Taylor(
+        params_s1528
+    )
+    threshold = params_s1528.antenna_gain - gain_drop_dB
+
+    def gains(off_axis):
+        return antenna.calculate_gain(
+            off_axis_angle_vec=np.atleast_1d(off_axis),
+            # theta is set to 0 since it makes no difference
+            # when antenna pattern is circular
+            theta_vec=0,
+        )
+
+    off_axis = np.linspace(0, attempt_max_angle, coarse_points + 1)
+    below = np.where(gains(off_axis) <= threshold)[0]
+    if len(below) == 0:
+        raise ValueError(
+            f"Taylor pattern never drops {gain_drop_dB} dB "
+            f"below peak gain in [0, {attempt_max_angle}] deg"
+        )
+    if below[0] == 0:
+        raise ValueError(
+            "Taylor pattern is already below threshold at boresight"
+        )
+
+    # main lobe is monotonic between these two points
+    lo = off_axis[below[0] - 1]
+    hi = off_axis[below[0]]
+    while hi - lo > tol_deg:
+        mid = (lo + hi) / 2
+        if gains(mid)[0] <= threshold:
+            hi = mid
+        else:
+            lo = mid
+
+    return float(hi)
+
+
+def get_taylor_cell_radius(
+    params_s1528: ParametersAntennaS1528,
+    sat_alt_km: float,
+    attempt_max_angle: float = 10.0,
+    tol_m: float = 0.1,
+) -> int:
+    """
+    Returns the cell radius [m] for a satellite at sat_alt_km, defined by
+    the -7 dB beam edge of its Taylor antenna.
+
+    Results are cached by antenna parameters and altitude, so the same
+    system is only solved once per process.
+    """
+    key = (_params_key(params_s1528), float(sat_alt_km), attempt_max_angle, tol_m)
+    if key not in _RADIUS_CACHE:
+        # radius tolerance converted to an angle one, using the largest
+        # d(radius)/d(angle) = h * sec^2(angle) on the searched range,
+        # reached at attempt_max_angle, so tol_m is always met
+        max_slope = sat_alt_km * 1e3 / np.cos(np.deg2rad(attempt_max_angle)) ** 2
+        tol_deg = np.rad2deg(tol_m / max_slope)
+        angle_7dB = get_taylor_beam_edge_angle(
+            params_s1528,
+            attempt_max_angle=attempt_max_angle,
+            tol_deg=tol_deg,
+        )
+        _RADIUS_CACHE[key] = np.tan(np.deg2rad(angle_7dB)) * sat_alt_km * 1e3
+
+    return int(_RADIUS_CACHE[key])
@@ -0,0 +1,112 @@
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from campaigns.utils import adaptive_stopping
+from campaigns.utils.adaptive_stopping import (
+    CriterionStatus, quantile_ci_at_ccdf, run_scenario_adaptive,
+)
+from campaigns.utils.ccdf_histogram import CcdfHistogram
+from campaigns.utils.dump_parameters import dump_parameter_dict, load_parameter_file
+
+
+@pytest.mark.parametrize("n, q", [(2000, 1e-2), (20000, 1e-3), (500, 0.2)])
+def test_quantile_ci_covers_the_true_value(n, q):
+    # P(X > x) = exp(-x) for a standard exponential, so x_q = -ln(q)
+    true_value = -np.log(q)
+    rng = np.random.default_rng(1)
+    n_trials = 400
+    covered = 0
+    for _ in range(n_trials):
+        hist = CcdfHistogram().add(rng.exponential(size=n))
+        low, high = quantile_ci_at_ccdf(hist, q, confidence=0.95)
+        covered += low <= true_value <= high
+    # 95% intervals from order statistics are conservative, the slack is
+    # for the 400 trials (standard error ~0.011)
+    assert covered / n_trials >= 0.92
+
+
+def test_quantile_ci_is_unbounded_with_too_few_samples():
+    hist = CcdfHistogram().add(np.arange(10.0))
+    low, high = quantile_ci_at_ccdf(hist, 1e-3)
+    assert np.isfinite(low)
+    assert high == np.inf
+    assert quantile_ci_at_ccdf(CcdfHistogram(), 0.5) == (-np.inf, np.inf)
+
+
+@pytest.mark.parametrize("low, high, verdict", [
+    (-9.0, -7.0, "pass"),
+    (-5.0, -3.0, "fail"),
+    (-6.05, -5.98, "resolved"),
+    (-7.0, -5.0, "open"),
+    (-7.0, np.inf, "open"),
+])
+def test_criterion_verdict(low, high, verdict):
+    status = CriterionStatus(
+        threshold_dB=-6.0, prob=3e-4, low=low, high=high, resolution_dB=0.1
+    )
+    assert status.verdict == verdict
+
+
+def test_batches_only_use_dirs_created_by_this_run(tmp_path, monkeypatch):
+    output_root = tmp_path / "output"
+    param_file = tmp_path / "scenario.yaml"
+    dump_parameter_dict(param_file, {"general": {
+        "seed": 1,
+        "num_snapshots": 100,
+        "output_dir": output_root.as_posix() + "/",
+        "output_dir_prefix": "out",
+    }})
+
+    # dir left by an earlier run with the same prefix as batch 0
+    stale_dir = tmp_path / "output_shards" / "out_batch0_2000-01-01_01"
+    stale_dir.mkdir(parents=True)
+    (stale_dir / "system_inr.csv").write_text("100.0\n")
+
+    rng = np.random.default_rng(0)
+
+    def fake_run_simulation(batch_file: Path) -> None:
+        general = load_parameter_file(batch_file)["general"]
+        out_dir = Path(general["output_dir"]) / (
+            f"{general['output_dir_prefix']}_{date.today().isoformat()}_01"
+        )
+        out_dir.mkdir(parents=True)
+        values = rng.normal(-20.0, 1.0, size=general["num_snapshots"])
+        np.savetxt(out_dir / "system_inr.csv", values)
+
+    monkeypatch.setattr(adaptive_stopping, "run_simulation", fake_run_simulation)
+    merged_dir = run_scenario_adaptive(
+        param_file, output_root, [(-6.0, 0.2)],
+        batch_snapshots=100, max_snapshots=300,
+    )
+
+    merged = np.loadtxt(merged_dir / "system_inr.csv")
+    assert merged.size == 100
+    assert merged.max() < 0.0
+    # merged batches are removed, the stale dir is left alone
+    assert sorted(d.name for d in (tmp_path / "output_shards").iterdir()) == [stale_dir.name]
+
+
+def test_batch_without_output_is_an_error(tmp_path, monkeypatch):
+    output_root = tmp_path / "output"
+    param_file = tmp_path / "scenario.yaml"
+    dump_parameter_dict(param_file, {"general": {
+        "seed": 1,
+        "num_snapshots": 100,
+        "output_dir": output_root.as_posix() + "/",
+        "output_dir_prefix": "out",
+    }})
+    for i in range(3):
+        stale_dir = tmp_path / "output_shards" / f"out_batch{i}_2000-01-01_01"
+        stale_dir.mkdir(parents=True)
+        (stale_dir / "system_inr.csv").write_text("-20.0\n")
+
+    # e.g. SHARC wrote its results somewhere else
+    monkeypatch.setattr(adaptive_stopping, "run_simulation", lambda batch_file: None)
+    with pytest.raises(FileNotFoundError):
+        run_scenario_adaptive(
+            param_file, output_root, [(-6.0, 0.2)],
+            batch_snapshots=100, max_snapshots=300,
+        )
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from campaigns.utils.ccdf_histogram import CcdfHistogram
+
+BIN_DB = 1e-3
+
+
+@pytest.mark.parametrize("n", [2, 10, 1000, 100000])
+@pytest.mark.parametrize("q", [3e-4, 1e-3, 0.2, 0.5, 1.0 - 1e-3])
+def test_quantile_at_ccdf_matches_np_quantile(n, q):
+    for seed in range(20):
+        x = np.random.default_rng(seed).normal(scale=10.0, size=n)
+        hist = CcdfHistogram(BIN_DB).add(x)
+        assert hist.quantile_at_ccdf(q) == pytest.approx(np.quantile(x, 1.0 - q), abs=BIN_DB)
+
+
+def test_quantile_at_ccdf_interpolates_across_sparse_tail():
+    hist = CcdfHistogram(BIN_DB).add([0.0, 0.0, 0.0, 100.0])
+    # rank 2.7: 70% of the way from the 3rd to the 4th smallest sample
+    assert hist.quantile_at_ccdf(0.1) == pytest.approx(70.0, abs=BIN_DB)
+
+
+def test_merged_histograms_match_one_histogram():
+    rng = np.random.default_rng(0)
+    a, b = rng.normal(size=500), rng.normal(loc=3.0, size=50)
+    merged = CcdfHistogram(BIN_DB).add(a).merge(CcdfHistogram(BIN_DB).add(b))
+    whole = CcdfHistogram(BIN_DB).add(np.concatenate((a, b)))
+    assert merged.n == whole.n == 550
+    for q in (1e-3, 0.1, 0.5):
+        assert merged.quantile_at_ccdf(q) == whole.quantile_at_ccdf(q)
+
+
+def test_non_finite_samples_are_ignored():
+    hist = CcdfHistogram(BIN_DB).add([1.0, np.nan, -np.inf, np.inf])
+    assert hist.n == 1
+    assert np.isnan(CcdfHistogram(BIN_DB).quantile_at_ccdf(0.5))
@@ -0,0 +1,91 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+import yaml
+
+from campaigns.utils import dump_parameters
+from campaigns.utils.dump_parameters import (
+    SIDECAR_SUFFIXES, dump_parameter_dict, load_parameter_file, load_parameters,
+)
+
+INPUT_FILES = sorted((Path(__file__).parents[1] / "imt_to_mss" / "input").glob("*.yaml"))
+
+SIDECARS = [
+    None,
+    "json",
+    pytest.param("msgpack", marks=pytest.mark.skipif(
+        dump_parameters.msgpack is None, reason="msgpack is not installed"
+    )),
+]
+
+
+def parameters_diff(a, b, path: str = "params") -> list[str]:
+    """Paths at which a and b (e.g. two Parameters) differ, telling tuples from lists"""
+    if type(a) is not type(b):
+        return [f"{path}: {type(a).__name__} != {type(b).__name__}"]
+    if isinstance(a, np.ndarray):
+        return [] if np.array_equal(a, b) else [f"{path}: arrays differ"]
+    if isinstance(a, dict):
+        if a.keys() != b.keys():
+            return [f"{path}: keys {sorted(a.keys() ^ b.keys())} not in both"]
+        return [d for k in a for d in parameters_diff(a[k], b[k], f"{path}[{k!r}]")]
+    if isinstance(a, (list, tuple)):
+        if len(a) != len(b):
+            return [f"{path}: length {len(a)} != {len(b)}"]
+        return [d for i, (x, y) in enumerate(zip(a, b)) for d in parameters_diff(x, y, f"{path}[{i}]")]
+    if hasattr(a, "__dict__") and not callable(a):
+        return parameters_diff(vars(a), vars(b), path)
+    if a != b and not (a != a and b != b):
+        # NaN values compare unequal to themselves
+        return [f"{path}: {a!r} != {b!r}"]
+    return []
+
+
+def test_libyaml_dump_matches_yaml_dump(tmp_path):
+    data = {"general": {"seed": 1, "name": "x"}, "imt": {"range": (-90.0, 90.0), "ids": [1, 2]}}
+    dump_parameter_dict(tmp_path / "p.yaml", data)
+    assert (tmp_path / "p.yaml").read_text() == yaml.dump(data, sort_keys=False)
+    if hasattr(yaml, "CDumper"):
+        assert dump_parameters._Dumper is yaml.CDumper
+
+
+@pytest.mark.parametrize("sidecar", SIDECARS)
+def test_tuples_round_trip(tmp_path, sidecar):
+    data = {"imt": {"bs": {"antenna": {"vertical_beamsteering_range": (-90.0, 90.0)}}}}
+    file = tmp_path / "p.yaml"
+    dump_parameter_dict(file, data, sidecar)
+    assert "!!python/tuple" in file.read_text()
+    if sidecar is not None:
+        assert file.with_suffix(SIDECAR_SUFFIXES[sidecar]).exists()
+
+    loaded = load_parameter_file(file)
+    assert parameters_diff(data, loaded) == []
+
+
+@pytest.mark.parametrize("sidecar", SIDECARS)
+@pytest.mark.parametrize("param_file", INPUT_FILES, ids=lambda f: f.stem)
+def test_parameter_files_round_trip(tmp_path, param_file, sidecar):
+    expected = load_parameters(param_file)
+    file = tmp_path / param_file.name
+    dump_parameter_dict(file, load_parameter_file(param_file), sidecar)
+    if sidecar is not None:
+        assert file.with_suffix(SIDECAR_SUFFIXES[sidecar]).exists()
+
+    assert parameters_diff(expected, load_parameters(file)) == []
+
+
+@pytest.mark.parametrize("sidecar", SIDECARS[1:])
+def test_stale_sidecar_is_ignored(tmp_path, sidecar):
+    file = tmp_path / "p.yaml"
+    dump_parameter_dict(file, {"general": {"seed": 1}}, sidecar)
+    sidecar_file = file.with_suffix(SIDECAR_SUFFIXES[sidecar])
+    assert load_parameter_file(file) == {"general": {"seed": 1}}
+
+    # the yaml is edited afterwards, leaving the sidecar behind
+    dump_parameter_dict(file, {"general": {"seed": 2}})
+    st = os.stat(file)
+    os.utime(sidecar_file, ns=(st.st_atime_ns, st.st_mtime_ns - 1))
+
+    assert load_parameter_file(file) == {"general": {"seed": 2}}
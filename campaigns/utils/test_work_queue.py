@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from campaigns.utils.work_queue import (
+    CLAIMED, DONE, FAILED, PENDING, InMemoryWorkQueue, run_worker,
+)
+
+
+@pytest.fixture
+def param_files(tmp_path):
+    files = []
+    for i in range(3):
+        f = tmp_path / f"p{i}.yaml"
+        f.write_text(f"general:\n  num_snapshots: {i + 1}\n")
+        files.append(f)
+    return files
+
+
+def test_claims_follow_priority(param_files):
+    queue = InMemoryWorkQueue()
+    assert queue.publish(param_files, [1.0, 3.0, 2.0]) == 3
+    # unchanged files are not queued again
+    assert queue.publish(param_files, [1.0, 3.0, 2.0]) == 0
+
+    claimed = [queue.claim("w").name for _ in param_files]
+    assert claimed == ["p1.yaml", "p2.yaml", "p0.yaml"]
+    assert queue.claim("w") is None
+    assert queue.counts()[CLAIMED] == 3
+
+
+def test_missed_heartbeat_requeues_and_loses_the_claim(param_files):
+    queue = InMemoryWorkQueue()
+    queue.publish(param_files[:1])
+    task = queue.claim("slow")
+    assert queue.heartbeat(task.name, "slow")
+
+    # every claim is stale against a limit in the future
+    assert queue.requeue_stale(stale_after_s=-1.0) == 1
+    assert queue.counts()[PENDING] == 1
+    assert not queue.heartbeat(task.name, "slow")
+    assert not queue.complete(task.name, "slow")
+
+    retry = queue.claim("other")
+    assert (retry.name, retry.attempts) == (task.name, 2)
+    # the slow worker can't complete or fail the other worker's claim
+    assert not queue.complete(task.name, "slow")
+    queue.fail(task.name, "slow", "late")
+    assert queue.counts()[CLAIMED] == 1
+    assert queue.complete(task.name, "other")
+    assert queue.counts()[DONE] == 1
+
+
+def test_fail_stops_after_max_attempts(param_files):
+    queue = InMemoryWorkQueue(max_attempts=2)
+    queue.publish(param_files[:1])
+    for attempt in (1, 2):
+        task = queue.claim("w")
+        assert task.attempts == attempt
+        queue.fail(task.name, "w", "boom")
+    assert queue.counts()[FAILED] == 1
+    assert queue.claim("w") is None
+
+
+def test_worker_runs_every_task_once(param_files):
+    queue = InMemoryWorkQueue()
+    queue.publish(param_files)
+    ran = []
+    n_done = run_worker(queue, "w", run_fn=lambda f: ran.append(f.name), poll_s=0.01)
+    assert n_done == 3
+    assert sorted(ran) == ["p0.yaml", "p1.yaml", "p2.yaml"]
+    assert queue.counts()[DONE] == 3
+
+
+def test_worker_retries_failures_up_to_max_attempts(param_files):
+    queue = InMemoryWorkQueue(max_attempts=2)
+    queue.publish(param_files[:1])
+
+    def run_fn(f):
+        raise RuntimeError("boom")
+
+    assert run_worker(queue, "w", run_fn=run_fn, poll_s=0.01) == 0
+    assert queue.counts()[FAILED] == 1
+
+
+def test_worker_moves_on_once_its_claim_is_lost(param_files):
+    queue = InMemoryWorkQueue()
+    queue.publish(param_files[:1])
+    calls = []
+    release = threading.Event()
+
+    def run_fn(f):
+        calls.append(f.name)
+        if len(calls) == 1:
+            # another host found this claim stale and requeued it
+            queue.requeue_stale(stale_after_s=-1.0)
+            # the abandoned run only ends once the test is over
+            release.wait(5.0)
+
+    start = time.monotonic()
+    n_done = run_worker(queue, "w", run_fn=run_fn, heartbeat_s=0.05, poll_s=0.01)
+    release.set()
+    # the lost run is not counted, and was not waited for
+    assert n_done == 1
+    assert calls == ["p0.yaml", "p0.yaml"]
+    assert time.monotonic() - start < 2.0
+    assert queue.counts()[DONE] == 1
+
+
+def test_run_finished_after_its_claim_was_lost_is_not_counted(param_files):
+    queue = InMemoryWorkQueue()
+    queue.publish(param_files[:1])
+    calls = []
+
+    def run_fn(f):
+        calls.append(f.name)
+        if len(calls) == 1:
+            # requeued while running, finishing before the next heartbeat
+            queue.requeue_stale(stale_after_s=-1.0)
+
+    assert run_worker(queue, "w", run_fn=run_fn, heartbeat_s=10.0, poll_s=0.01) == 1
+    assert len(calls) == 2
+    assert queue.counts()[DONE] == 1
@@ -1,25 +1,82 @@
+from contextlib import contextmanager
 from typing import Any
+import copy
 from sharc.parameters.parameters import Parameters
 
+_OWN_ATTRS = frozenset({
+    "_obj", "_data", "_parts", "_parent", "_node", "_node_epoch", "_journal",
+})
+_MISSING = object()
+
+
+class _Journal():
+    """
+    Undo log of the writes made to a proxy tree while checkpoints are open.
+    Shared by a root proxy and all of its children.
+    """
+
+    def __init__(self):
+        # (obj, node, name, old attribute, old node value), with obj None
+        # for a dict node created under node[name]
+        self.entries: list[tuple] = []
+        # entries position of each open checkpoint
+        self.open: list[int] = []
+        # bumped when a checkpoint is opened or restored. Proxies only use
+        # their cached node while their epoch matches, see _get_node
+        self.epoch = 0
+
+
 class TrackingProxy:
-    def __init__(self, obj: Any, data: dict = None, path: str = ""):
-        self._obj = obj
-        self._path = path
-        self._data = data if data is not None else {}
+    """
+    Wraps a Parameters object and records every value set through it
+    in a nested dict (get_data_dict), mirroring the attribute paths.
+
+    Each proxy keeps its path as a tuple and, once something is written
+    under it, a reference to its own dict node, so assignments write
+    directly into that node instead of walking the dict from the root.
+
+    checkpoint()/restore() branch and unwind in place: while a checkpoint
+    is open, the previous value of every write is kept in an undo log, so
+    nothing is copied up front and restoring only touches what changed.
+    """
+
+    def __init__(
+        self,
+        obj: Any,
+        data: dict = None,
+        path: str | tuple[str, ...] = (),
+        parent: "TrackingProxy | None" = None,
+    ):
+        if isinstance(path, str):
+            path = tuple(path.split(".")) if path else ()
+        if data is None:
+            data = {}
+        # written to __dict__ directly, bypassing __setattr__, since a proxy
+        # is created for every attribute path a scenario goes through
+        attrs = self.__dict__
+        attrs["_obj"] = obj
+        attrs["_data"] = data
+        attrs["_parts"] = path
+        attrs["_parent"] = parent
+        # dict node of this path in _data, only created on the first write
+        # so that reading through a proxy never records anything
+        attrs["_node"] = None if path else data
+        attrs["_node_epoch"] = None if path else 0
+        attrs["_journal"] = parent._journal if parent is not None else _Journal()
 
     def __setattr__(self, name, value):
-        if name in {"_obj", "_path", "_data"}:
+        if name in _OWN_ATTRS:
             # set normally in own class
-            super().__setattr__(name, value)
+            object.__setattr__(self, name, value)
             return
 
-        # let it pass to wrapped obj
-        setattr(self._obj, name, value)
-
-        full_path = f"{self._path}.{name}" if self._path else name
-
-        # record change
-        self._update_data(full_path, value)
+        # let it pass to wrapped obj and record change
+        if self._node_epoch == self._journal.epoch:
+            # no checkpoint open and the cached node is still valid
+            setattr(self._obj, name, value)
+            self._node[name] = value
+        else:
+            self._write(self._obj, self._get_node(), name, value)
 
         if hasattr(value, "__dict__"):
             raise ValueError(
@@ -28,32 +85,196 @@ class TrackingProxy:
 
     def __getattr__(self, name):
         attr = getattr(self._obj, name)
-        if self._is_trackable(attr):
-            proxy = TrackingProxy(
-                attr,
-                data=self._data,
-                path=f"{self._path}.{name}" if self._path else name,
-            )
-            object.__setattr__(self, name, proxy)
+        # nested parameters get their own proxy, cached on this one
+        if (
+            hasattr(attr, "__dict__")
+            and not callable(attr)
+            and not isinstance(attr, TrackingProxy)
+        ):
+            proxy = TrackingProxy(attr, self._data, self._parts + (name,), self)
+            self.__dict__[name] = proxy
             return proxy
         return attr
 
+    def _write(self, obj: Any, node: dict, name: str, value: Any) -> None:
+        journal = self._journal
+        if journal.open:
+            journal.entries.append((
+                obj, node, name,
+                getattr(obj, name, _MISSING), node.get(name, _MISSING),
+            ))
+        setattr(obj, name, value)
+        node[name] = value
+
+    def _child_node(self, node: dict, name: str) -> dict:
+        if name not in node:
+            node[name] = {}
+            if self._journal.open:
+                self._journal.entries.append((None, node, name, _MISSING, _MISSING))
+        return node[name]
+
+    def _get_node(self) -> dict:
+        journal = self._journal
+        if self._node_epoch == journal.epoch:
+            return self._node
+
+        if self._parent is not None:
+            node = self._child_node(self._parent._get_node(), self._parts[-1])
+        else:
+            node = self._data
+            for part in self._parts:
+                node = self._child_node(node, part)
+        attrs = self.__dict__
+        attrs["_node"] = node
+        # while a checkpoint is open the epoch is not cached, so every
+        # write goes through _write and is journaled
+        attrs["_node_epoch"] = None if journal.open else journal.epoch
+        return node
+
+    def apply(self, overrides: dict[str, Any]) -> "TrackingProxy":
+        """
+        Sets, in place, each dotted path in overrides (relative to this
+        proxy) to its value, e.g. {"bs.load_probability": 0.5}.
+        Objects and dict nodes of paths sharing a prefix are looked up once.
+        Returns self, to allow chaining.
+        """
+        # prefix -> (object, dict node)
+        resolved = {(): (self._obj, self._get_node())}
+        # without an open checkpoint nothing needs to be journaled
+        journaled = bool(self._journal.open)
+
+        def resolve(prefix: tuple[str, ...]) -> tuple[Any, dict]:
+            found = resolved.get(prefix)
+            if found is None:
+                obj, node = resolve(prefix[:-1])
+                if journaled:
+                    node = self._child_node(node, prefix[-1])
+                else:
+                    node = node.setdefault(prefix[-1], {})
+                found = (getattr(obj, prefix[-1]), node)
+                resolved[prefix] = found
+            return found
+
+        for path, value in overrides.items():
+            if hasattr(value, "__dict__"):
+                raise ValueError(
+                    "Setting a property value that contains nested values is not supported!"
+                )
+            parts = tuple(path.split("."))
+            obj, node = resolve(parts[:-1])
+            if journaled:
+                self._write(obj, node, parts[-1], value)
+            else:
+                setattr(obj, parts[-1], value)
+                node[parts[-1]] = value
+
+        return self
+
+    def checkpoint(self) -> int:
+        """
+        Opens a checkpoint of the wrapped parameters and the recorded data.
+        Returns the token to pass to restore(). Checkpoints nest.
+        """
+        if self._parts:
+            raise ValueError(
+                "Checkpoints can only be taken from the root proxy"
+            )
+        journal = self._journal
+        journal.open.append(len(journal.entries))
+        journal.epoch += 1
+        return len(journal.open) - 1
+
+    def restore(self, checkpoint: int) -> None:
+        """
+        Undoes every write made since checkpoint and closes it, along with
+        the checkpoints opened after it.
+        """
+        journal = self._journal
+        if not 0 <= checkpoint < len(journal.open):
+            raise ValueError("Checkpoint is not open (already restored?)")
+
+        position = journal.open[checkpoint]
+        for obj, node, name, old_attr, old_value in reversed(journal.entries[position:]):
+            if obj is None:
+                del node[name]
+                continue
+            if old_attr is _MISSING:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, old_attr)
+            if old_value is _MISSING:
+                del node[name]
+            else:
+                node[name] = old_value
+
+        del journal.entries[position:]
+        del journal.open[checkpoint:]
+        # nodes created since the checkpoint are gone
+        journal.epoch += 1
+
+    @contextmanager
+    def branch(self):
+        """
+        with params.branch():
+            params.imt.bs.load_probability = 0.5
+            dump_parameters(file, params)
+        # everything set inside the block is undone here
+        """
+        checkpoint = self.checkpoint()
+        try:
+            yield self
+        finally:
+            self.restore(checkpoint)
+
     def get_data_dict(self):
         return self._data
 
-    def _update_data(self, path, value):
-        parts = path.split(".")
-        d = self._data
-        for part in parts[:-1]:
-            d = d.setdefault(part, {})
-        d[parts[-1]] = value
-
-    def _is_trackable(self, value):
-        return (
-            hasattr(value, "__dict__")
-            and not callable(value)
-            and not isinstance(value, TrackingProxy)
-        )
+    def variant(self, overrides: dict[str, Any]) -> "TrackingProxy":
+        """
+        Returns a new proxy with each dotted path in overrides set to its value,
+        e.g. {"imt.bs.load_probability": 0.5}
+
+        The base is left untouched. Only the objects and dicts along the
+        overridden paths are shallow copied, everything else is shared
+        with the base. Values are not validated again, so the base
+        should be built (and validated) once and variants stamped from it.
+
+        NOTE: since they are shared, the base must not be changed once
+        variants exist, or the change also shows up in the variants whose
+        overrides don't cover it (e.g. setting base.general.seed after
+        creating a variant changes the variant's seed too). This includes
+        temporary writes inside base.branch(). Change a variant instead, or
+        create the variants after the base is complete.
+        """
+        if self._parts:
+            raise ValueError(
+                "Variants can only be created from the root proxy"
+            )
+
+        obj = copy.copy(self._obj)
+        data = dict(self._data)
+        # nodes already copied for this variant
+        copied = set()
+
+        for path, value in overrides.items():
+            if hasattr(value, "__dict__"):
+                raise ValueError(
+                    "Setting a property value that contains nested values is not supported!"
+                )
+            parts = tuple(path.split("."))
+            o, d = obj, data
+            for i, part in enumerate(parts[:-1]):
+                if parts[:i + 1] not in copied:
+                    setattr(o, part, copy.copy(getattr(o, part)))
+                    d[part] = dict(d.get(part, {}))
+                    copied.add(parts[:i + 1])
+                o = getattr(o, part)
+                d = d[part]
+            setattr(o, parts[-1], value)
+            d[parts[-1]] = value
+
+        return TrackingProxy(obj, data)
+
 
 if __name__ == "__main__":
     prm: Parameters = TrackingProxy(Parameters(), {"opa": "teste"})
@@ -0,0 +1,371 @@
+"""
+Work queue to run one campaign from several hosts.
+
+Generated parameter files are published to a queue, and workers on any
+host that can see the queue (e.g. on a shared directory) claim them one
+at a time, run them and mark them as done or failed. While a simulation
+runs its worker sends heartbeats, and work claimed by a worker whose
+heartbeats stopped (crashed host, killed process) is put back in the
+queue for someone else.
+
+A worker that was only slow to send heartbeats can't stop its simulation
+once the task is requeued. The abandoned run keeps writing its output dir,
+and the rerun writes another one for the same output_dir_prefix (the next
+_NN suffix), so the scenario ends up with a duplicate result dir. Delete
+the older one before plotting, or set STALE_AFTER_S well above the
+heartbeat interval.
+
+SqliteWorkQueue keeps the queue in a SQLite file. SQLite locking relies on
+the file system, so the shared directory must support it (most NFS/SMB
+setups do, but without WAL, which is why the default journal is used).
+InMemoryWorkQueue has the same interface, for local runs and tests.
+
+Parameter files are stored relative to the queue file, so hosts may mount
+the shared directory at different paths.
+
+    python -m campaigns.utils.work_queue publish <queue.sqlite> <inputs dir>
+    python -m campaigns.utils.work_queue worker <queue.sqlite> [-w N]
+    python -m campaigns.utils.work_queue status <queue.sqlite>
+"""
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass
+from pathlib import Path
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from campaigns.utils.cost_estimator import estimate_costs
+from campaigns.utils.resumable_runner import file_hash, run_simulation
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+
+# defaults used by the workers
+HEARTBEAT_S = 30.0
+STALE_AFTER_S = 180.0
+POLL_S = 10.0
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class Task:
+    name: str
+    path: Path
+    attempts: int
+
+
+class InMemoryWorkQueue():
+    """Work queue kept in memory, shared by the threads of one process"""
+
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # name -> task row, as in SqliteWorkQueue
+        self._tasks: dict[str, dict] = {}
+
+    def publish(self, param_files: list[Path], priorities: list[float] | None = None) -> int:
+        """
+        Adds param_files to the queue, higher priority first. Files already
+        queued with the same contents are left as they are, changed ones
+        are queued again. Returns the number of files (re)queued.
+        """
+        if priorities is None:
+            priorities = [0.0] * len(param_files)
+        n = 0
+        with self._lock:
+            for param_file, priority in zip(param_files, priorities):
+                param_file = Path(param_file)
+                param_hash = file_hash(param_file)
+                task = self._tasks.get(param_file.name)
+                if task is not None and task["hash"] == param_hash:
+                    continue
+                self._tasks[param_file.name] = {
+                    "path": param_file, "hash": param_hash, "priority": priority,
+                    "state": PENDING, "worker": None, "heartbeat_at": None,
+                    "attempts": 0, "error": None,
+                }
+                n += 1
+        return n
+
+    def claim(self, worker_id: str) -> Task | None:
+        with self._lock:
+            pending = [(name, t) for name, t in self._tasks.items() if t["state"] == PENDING]
+            if not pending:
+                return None
+            name, task = max(pending, key=lambda x: x[1]["priority"])
+            task.update(state=CLAIMED, worker=worker_id, heartbeat_at=time.time())
+            task["attempts"] += 1
+            return Task(name, task["path"], task["attempts"])
+
+    def heartbeat(self, name: str, worker_id: str) -> bool:
+        """False if the task is no longer claimed by worker_id"""
+        with self._lock:
+            task = self._tasks[name]
+            if task["state"] != CLAIMED or task["worker"] != worker_id:
+                return False
+            task["heartbeat_at"] = time.time()
+            return True
+
+    def complete(self, name: str, worker_id: str) -> bool:
+        """False if the task is no longer claimed by worker_id"""
+        with self._lock:
+            task = self._tasks[name]
+            if task["state"] != CLAIMED or task["worker"] != worker_id:
+                return False
+            task.update(state=DONE, error=None)
+            return True
+
+    def fail(self, name: str, worker_id: str, error: str) -> None:
+        """Queues the task again, unless it already failed max_attempts times"""
+        with self._lock:
+            task = self._tasks[name]
+            if task["worker"] != worker_id:
+                return
+            state = FAILED if task["attempts"] >= self.max_attempts else PENDING
+            task.update(state=state, worker=None, error=error)
+
+    def requeue_stale(self, stale_after_s: float = STALE_AFTER_S) -> int:
+        """Queues again the claimed tasks without a recent heartbeat"""
+        limit = time.time() - stale_after_s
+        n = 0
+        with self._lock:
+            for task in self._tasks.values():
+                if task["state"] == CLAIMED and task["heartbeat_at"] < limit:
+                    task.update(state=PENDING, worker=None)
+                    n += 1
+        return n
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            counts = dict.fromkeys((PENDING, CLAIMED, DONE, FAILED), 0)
+            for task in self._tasks.values():
+                counts[task["state"]] += 1
+            return counts
+
+
+class SqliteWorkQueue():
+    """Work queue kept in a SQLite file, see the module docstring"""
+
+    def __init__(self, db_file: Path, max_attempts: int = MAX_ATTEMPTS, timeout_s: float = 60.0):
+        self.db_file = Path(db_file)
+        self.max_attempts = max_attempts
+        self._timeout_s = timeout_s
+        self._run(lambda con: con.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    name TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    priority REAL NOT NULL,
+                    state TEXT NOT NULL,
+                    worker TEXT,
+                    heartbeat_at REAL,
+                    attempts INTEGER NOT NULL,
+                    error TEXT
+                )
+            """))
+
+    def _connect(self) -> sqlite3.Connection:
+        # autocommit, transactions are opened explicitly with BEGIN IMMEDIATE
+        return sqlite3.connect(self.db_file, timeout=self._timeout_s, isolation_level=None)
+
+    def _run(self, fn):
+        """Runs fn(con) in a write transaction, returning its result"""
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            result = fn(con)
+            con.execute("COMMIT")
+            return result
+        except BaseException:
+            if con.in_transaction:
+                con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    def publish(self, param_files: list[Path], priorities: list[float] | None = None) -> int:
+        """See InMemoryWorkQueue.publish"""
+        if priorities is None:
+            priorities = [0.0] * len(param_files)
+        rows = []
+        for param_file, priority in zip(param_files, priorities):
+            param_file = Path(param_file)
+            rel_path = os.path.relpath(param_file.resolve(), self.db_file.resolve().parent)
+            rows.append((param_file.name, Path(rel_path).as_posix(), file_hash(param_file), priority))
+
+        def publish_rows(con):
+            n = 0
+            for name, rel_path, param_hash, priority in rows:
+                current = con.execute("SELECT hash FROM tasks WHERE name = ?", (name,)).fetchone()
+                if current is not None and current[0] == param_hash:
+                    continue
+                con.execute(
+                    "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, NULL, NULL, 0, NULL)",
+                    (name, rel_path, param_hash, priority, PENDING),
+                )
+                n += 1
+            return n
+
+        return self._run(publish_rows)
+
+    def claim(self, worker_id: str) -> Task | None:
+        def claim_next(con):
+            row = con.execute(
+                "SELECT name, path, attempts FROM tasks WHERE state = ? "
+                "ORDER BY priority DESC, name LIMIT 1",
+                (PENDING,),
+            ).fetchone()
+            if row is None:
+                return None
+            name, rel_path, attempts = row
+            con.execute(
+                "UPDATE tasks SET state = ?, worker = ?, heartbeat_at = ?, attempts = ? "
+                "WHERE name = ?",
+                (CLAIMED, worker_id, time.time(), attempts + 1, name),
+            )
+            return Task(name, self.db_file.resolve().parent / rel_path, attempts + 1)
+
+        return self._run(claim_next)
+
+    def heartbeat(self, name: str, worker_id: str) -> bool:
+        """False if the task is no longer claimed by worker_id"""
+        return self._run(lambda con: con.execute(
+            "UPDATE tasks SET heartbeat_at = ? WHERE name = ? AND state = ? AND worker = ?",
+            (time.time(), name, CLAIMED, worker_id),
+        ).rowcount == 1)
+
+    def complete(self, name: str, worker_id: str) -> bool:
+        """False if the task is no longer claimed by worker_id"""
+        return self._run(lambda con: con.execute(
+            "UPDATE tasks SET state = ?, error = NULL WHERE name = ? AND state = ? AND worker = ?",
+            (DONE, name, CLAIMED, worker_id),
+        ).rowcount == 1)
+
+    def fail(self, name: str, worker_id: str, error: str) -> None:
+        """Queues the task again, unless it already failed max_attempts times"""
+        self._run(lambda con: con.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "worker = NULL, error = ? WHERE name = ? AND worker = ?",
+            (self.max_attempts, FAILED, PENDING, error, name, worker_id),
+        ))
+
+    def requeue_stale(self, stale_after_s: float = STALE_AFTER_S) -> int:
+        """Queues again the claimed tasks without a recent heartbeat"""
+        return self._run(lambda con: con.execute(
+            "UPDATE tasks SET state = ?, worker = NULL WHERE state = ? AND heartbeat_at < ?",
+            (PENDING, CLAIMED, time.time() - stale_after_s),
+        ).rowcount)
+
+    def counts(self) -> dict[str, int]:
+        con = self._connect()
+        try:
+            counts = dict.fromkeys((PENDING, CLAIMED, DONE, FAILED), 0)
+            for state, n in con.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state"):
+                counts[state] = n
+            return counts
+        finally:
+            con.close()
+
+
+def publish_inputs(queue, inputs_dir: Path) -> int:
+    """Publishes the parameter files in inputs_dir, longest first (see cost_estimator)"""
+    param_files = sorted(Path(inputs_dir).glob("*.yaml"))
+    estimates = estimate_costs([(f, file_hash(f)) for f in param_files], {})
+    n = queue.publish([e.param_file for e in estimates], [e.seconds for e in estimates])
+    print(f"[INFO] Published {n} of {len(param_files)} parameter file(s), the rest were already queued")
+    return n
+
+
+def run_worker(
+    queue,
+    worker_id: str | None = None,
+    run_fn=run_simulation,
+    heartbeat_s: float = HEARTBEAT_S,
+    stale_after_s: float = STALE_AFTER_S,
+    poll_s: float = POLL_S,
+) -> int:
+    """
+    Claims and runs tasks until the queue has nothing pending or claimed.
+    run_fn(param_file) runs a task, raising if it fails.
+    Returns the number of tasks this worker completed.
+
+    NOTE: once a worker loses its claim on a task (its heartbeats were late
+    and the task was requeued), it moves on to the next task. The abandoned
+    run can't be interrupted and finishes in the background, its result is
+    not counted.
+    """
+    if worker_id is None:
+        worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    n_done = 0
+    while True:
+        queue.requeue_stale(stale_after_s)
+        task = queue.claim(worker_id)
+        if task is None:
+            counts = queue.counts()
+            if counts[PENDING] == 0 and counts[CLAIMED] == 0:
+                break
+            # others may still fail or die, leaving work behind
+            time.sleep(poll_s)
+            continue
+
+        print(f"[INFO] {worker_id} running '{task.name}' (attempt {task.attempts})")
+        # one executor per task, so a run left behind doesn't hold the next one
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(run_fn, task.path)
+        lost = False
+        try:
+            while True:
+                try:
+                    future.result(timeout=heartbeat_s)
+                    if queue.complete(task.name, worker_id):
+                        n_done += 1
+                    else:
+                        lost = True
+                    break
+                except TimeoutError:
+                    if not queue.heartbeat(task.name, worker_id):
+                        lost = True
+                        break
+                except Exception as e:
+                    print(f"[ERROR] {worker_id} failed '{task.name}': {e}")
+                    queue.fail(task.name, worker_id, f"{type(e).__name__}: {e}")
+                    break
+        finally:
+            executor.shutdown(wait=False)
+
+        if lost:
+            print(f"[WARN] {worker_id} lost its claim on '{task.name}', it was requeued")
+
+    print(f"[INFO] {worker_id} finished, {n_done} task(s) completed")
+    return n_done
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Campaign work queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("publish", help="Queue the parameter files of an inputs dir")
+    p.add_argument("queue_file", type=Path)
+    p.add_argument("inputs_dir", type=Path)
+    p = sub.add_parser("worker", help="Run queued scenarios until none are left")
+    p.add_argument("queue_file", type=Path)
+    p.add_argument("-w", "--workers", type=int, default=1, help="Workers in this process")
+    p = sub.add_parser("status", help="Number of tasks per state")
+    p.add_argument("queue_file", type=Path)
+    args = parser.parse_args()
+
+    queue = SqliteWorkQueue(args.queue_file)
+    if args.command == "publish":
+        publish_inputs(queue, args.inputs_dir)
+    elif args.command == "worker":
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(lambda _: run_worker(queue), range(args.workers)))
+    print(f"[INFO] Queue '{args.queue_file}': {queue.counts()}")